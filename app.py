@@ -3,16 +3,27 @@
 from __future__ import annotations
 
 import json
+from pathlib import Path
+
 import pandas as pd
 import streamlit as st
 
 from config import (
     ANIME_CLEANED_FILE,
     BANGUMI_APP_DATA_DIR,
+    DATA_FILES,
     DATA_METADATA_FILE,
     GAME_CLEANED_FILE,
+    HOME_SUMMARY_FILE,
+)
+from dataset_handle import file_stamp
+from home_summary import (
+    CATEGORY,
+    build_home_summary,
+    highlight_frame,
+    read_home_summary,
 )
-from ranking_ui import LINK, NAME_CN, RANK, SCORE, SCORE_TOTAL, load_from_path
+from ranking_ui import LINK, NAME_CN, RANK, SCORE, SCORE_TOTAL, load_from_path, with_links
 
 
 st.set_page_config(
@@ -47,39 +58,55 @@ def _try_load(file_name: str, date_name: str) -> pd.DataFrame | None:
         return None
 
 
-datasets = {
-    "动画": _try_load(ANIME_CLEANED_FILE, "开播日期"),
-    "游戏": _try_load(GAME_CLEANED_FILE, "发行日期"),
+@st.cache_data(show_spinner=False)
+def _read_summary(
+    summary_path: Path, workbooks: dict[str, Path], stamps: tuple[object, ...]
+) -> dict | None:
+    """``stamps`` 只用作缓存键：摘要或工作簿变化后重新校验。"""
+    return read_home_summary(summary_path, workbooks)
+
+
+def _summary_from_datasets() -> dict | None:
+    """摘要缺失或过期时加载完整榜单重新计算。"""
+    datasets = {
+        "动画": _try_load(ANIME_CLEANED_FILE, "开播日期"),
+        "游戏": _try_load(GAME_CLEANED_FILE, "发行日期"),
+    }
+    available = {name: data for name, data in datasets.items() if data is not None}
+    return build_home_summary(available) if available else None
+
+
+workbooks = {
+    category: BANGUMI_APP_DATA_DIR / file_name
+    for category, file_name in DATA_FILES.items()
+    if (BANGUMI_APP_DATA_DIR / file_name).is_file()
 }
-available = {name: data for name, data in datasets.items() if data is not None}
+summary = None
+if workbooks:
+    summary_path = BANGUMI_APP_DATA_DIR / HOME_SUMMARY_FILE
+    summary = _read_summary(
+        summary_path,
+        workbooks,
+        tuple(file_stamp(path) for path in (summary_path, *workbooks.values())),
+    )
+    if summary is None:
+        summary = _summary_from_datasets()
 
-if available:
-    total_items = sum(len(data) for data in available.values())
-    total_votes = sum(int(data[SCORE_TOTAL].sum()) for data in available.values())
+if summary is not None:
+    counts = summary["counts"]
     columns = st.columns(4)
-    columns[0].metric("收录作品", f"{total_items:,}")
-    columns[1].metric("动画", f"{len(available.get('动画', [])):,}")
-    columns[2].metric("游戏", f"{len(available.get('游戏', [])):,}")
-    columns[3].metric("累计评分人次", f"{total_votes:,}")
+    columns[0].metric("收录作品", f"{sum(counts.values()):,}")
+    columns[1].metric("动画", f"{counts.get('动画', 0):,}")
+    columns[2].metric("游戏", f"{counts.get('游戏', 0):,}")
+    columns[3].metric("累计评分人次", f"{sum(summary['votes'].values()):,}")
 
     st.subheader("高口碑作品速览")
     st.caption("至少 1,000 人评分，按评分与评分人数综合排序。")
-    candidates = []
-    for category, data in available.items():
-        qualified = data[data[SCORE_TOTAL] >= 1_000].copy()
-        qualified["类型"] = category
-        qualified["口碑指数"] = qualified[SCORE] * (
-            1 + qualified[SCORE_TOTAL].map(lambda value: min(value, 50_000) / 50_000)
-        )
-        candidates.append(qualified)
-    if candidates:
-        highlights = (
-            pd.concat(candidates, ignore_index=True)
-            .sort_values(["口碑指数", SCORE_TOTAL], ascending=False)
-            .head(12)
-        )
+    highlights = highlight_frame(summary)
+    if not highlights.empty:
+        highlights = with_links(highlights)
         st.dataframe(
-            highlights[["类型", RANK, NAME_CN, SCORE, SCORE_TOTAL, LINK]],
+            highlights[[CATEGORY, RANK, NAME_CN, SCORE, SCORE_TOTAL, LINK]],
             column_config={
                 LINK: st.column_config.LinkColumn("链接", display_text="打开 Bangumi"),
                 SCORE: st.column_config.NumberColumn(SCORE, format="%.1f"),
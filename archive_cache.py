@@ -0,0 +1,199 @@
+"""已下载 Bangumi Archive 的本地缓存。
+
+每个归档按 ``asset_id`` 和文件名保存在缓存目录中，清单 ``index.json`` 记录
+大小、修改时间、SHA-256 和最近使用时间。SHA-256 只在存入时计算一次；取用时
+核对大小和修改时间，二者变化（或传入 ``verify=True``）时才重新计算校验和，
+损坏的文件会被丢弃。总大小超过预算时按最近最少使用的顺序淘汰。
+"""
+
+from __future__ import annotations
+
+import argparse
+from contextlib import contextmanager
+import json
+from pathlib import Path, PurePosixPath
+import shutil
+import threading
+import time
+from typing import Any, BinaryIO, Iterator
+from zipfile import BadZipFile, ZipFile, ZipInfo
+
+from config import JSONL_FILE_NAME
+from get_source import file_sha256
+
+
+ARCHIVE_CACHE_VERSION = 1
+MANIFEST_NAME = "index.json"
+
+
+def cache_budget(value: str) -> int:
+    """argparse 类型：缓存预算是非负字节数，0 表示不缓存。"""
+    try:
+        budget = int(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"无效的缓存大小：{value}") from exc
+    if budget < 0:
+        raise argparse.ArgumentTypeError("缓存大小不能为负数")
+    return budget
+
+
+def _subject_member(archive: ZipFile) -> ZipInfo:
+    matches = [
+        item
+        for item in archive.infolist()
+        if not item.is_dir() and PurePosixPath(item.filename).name == JSONL_FILE_NAME
+    ]
+    if len(matches) != 1:
+        raise RuntimeError(
+            f"归档内应有且仅有一个 {JSONL_FILE_NAME}，实际找到 {len(matches)} 个"
+        )
+    return matches[0]
+
+
+@contextmanager
+def open_subject_jsonl(archive_path: Path) -> Iterator[BinaryIO]:
+    """以二进制流打开 zip 内的 subject.jsonlines，边解压边读取，不写入磁盘。"""
+    try:
+        with ZipFile(archive_path) as archive:
+            with archive.open(_subject_member(archive)) as source:
+                yield source
+    except BadZipFile as exc:
+        raise RuntimeError(f"下载文件不是有效 ZIP：{archive_path}") from exc
+
+
+class ArchiveCache:
+    """按字节预算保存归档的 LRU 缓存；``max_bytes`` 为 0 时不缓存。"""
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = directory.expanduser().resolve()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def _key(asset_id: int, name: str) -> str:
+        return f"{asset_id}-{name}"
+
+    def _manifest(self) -> dict[str, dict[str, Any]]:
+        try:
+            content = json.loads((self.directory / MANIFEST_NAME).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if content.get("version") != ARCHIVE_CACHE_VERSION:
+            return {}
+        entries = content.get("entries")
+        return entries if isinstance(entries, dict) else {}
+
+    def _write_manifest(self, entries: dict[str, dict[str, Any]]) -> None:
+        path = self.directory / MANIFEST_NAME
+        temporary = path.with_suffix(".json.tmp")
+        temporary.write_text(
+            json.dumps({"version": ARCHIVE_CACHE_VERSION, "entries": entries}, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        temporary.replace(path)
+
+    def _discard(self, entries: dict[str, dict[str, Any]], key: str) -> None:
+        entries.pop(key, None)
+        (self.directory / key).unlink(missing_ok=True)
+
+    def get(
+        self,
+        asset_id: int,
+        name: str,
+        size: int = 0,
+        sha256: str = "",
+        *,
+        verify: bool = False,
+    ) -> Path | None:
+        """返回已校验的缓存归档；未命中或校验失败时返回 None。
+
+        ``sha256`` 与存入时记录的校验和比较；文件的大小和修改时间都与记录一致时
+        不再读取文件内容，``verify`` 为真时总是重新计算。
+        """
+        if not self.enabled:
+            return None
+        key = self._key(asset_id, name)
+        with self._lock:
+            entries = self._manifest()
+            entry = entries.get(key)
+            path = self.directory / key
+            if entry is None or not path.is_file():
+                return None
+            recorded = entry.get("sha256", "")
+            expected = sha256 or recorded
+            stat = path.stat()
+            unchanged = stat.st_mtime_ns == entry.get("mtime_ns")
+            if (size and stat.st_size != size) or stat.st_size != entry.get("size"):
+                reason = "大小不一致"
+            elif sha256 and recorded and sha256 != recorded:
+                reason = "校验和不一致"
+            elif (verify or not unchanged) and expected and file_sha256(path) != expected:
+                reason = "校验和不一致"
+            else:
+                # 内容核对无误时记下新的修改时间，之后不再重复计算。
+                entry["mtime_ns"] = stat.st_mtime_ns
+                entry["last_used"] = time.time()
+                self._write_manifest(entries)
+                return path
+            print(f"[WARN] 缓存归档{reason}，已丢弃：{path}")
+            self._discard(entries, key)
+            self._write_manifest(entries)
+            return None
+
+    def store(self, source: Path, asset_id: int, name: str, sha256: str = "") -> Path:
+        """把下载好的归档移入缓存并按预算淘汰旧归档；返回归档的新位置。
+
+        缓存关闭时原样返回 ``source``。刚存入的归档即使单独超过预算也会保留，
+        保证本次运行可以使用。
+        """
+        if not self.enabled:
+            return source
+        actual = file_sha256(source)
+        if sha256 and actual != sha256:
+            raise RuntimeError(f"归档校验和不一致：预期 {sha256}，实际 {actual}")
+        key = self._key(asset_id, name)
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            entries = self._manifest()
+            path = self.directory / key
+            shutil.move(source, path)
+            entries[key] = {
+                "asset_id": asset_id,
+                "name": name,
+                "size": path.stat().st_size,
+                "mtime_ns": path.stat().st_mtime_ns,
+                "sha256": actual,
+                "last_used": time.time(),
+            }
+            self._evict(entries, keep=key)
+            self._write_manifest(entries)
+        return path
+
+    def _evict(self, entries: dict[str, dict[str, Any]], keep: str) -> None:
+        for key in [key for key in entries if not (self.directory / key).is_file()]:
+            entries.pop(key)
+        total = sum(int(entry.get("size", 0)) for entry in entries.values())
+        for key in sorted(entries, key=lambda item: entries[item].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= int(entries[key].get("size", 0))
+            print(f"已从缓存淘汰归档：{entries[key].get('name', key)}")
+            self._discard(entries, key)
+
+    def latest(self, *, verify: bool = False) -> Path | None:
+        """返回文件名时间戳最新、且通过校验的缓存归档。"""
+        with self._lock:
+            entries = self._manifest()
+        for entry in sorted(entries.values(), key=lambda item: item.get("name", ""), reverse=True):
+            path = self.get(
+                int(entry.get("asset_id", 0)), str(entry.get("name", "")), verify=verify
+            )
+            if path is not None:
+                return path
+        return None
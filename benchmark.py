@@ -0,0 +1,367 @@
+"""合成 Bangumi 归档与可复现的性能基准。
+
+生成器按真实 ``subject.jsonlines`` 的字段结构写出条目：类型比例、未排名与
+缺少日期的条目、标签分布和少量损坏行都接近真实归档，行长度也与真实数据
+相当。相同的 ``seed`` 和行数总是生成逐字节相同的文件。
+
+基准测试对同一份合成归档计时解析、生成榜单文件和页面筛选等步骤，结果写成
+JSON，可与之前保存的基准结果逐项比较：
+
+    python benchmark.py generate --lines 100000 --output data/synthetic.zip
+    python benchmark.py run --lines 100000 --output bench.json --baseline old.json
+"""
+
+from __future__ import annotations
+
+import argparse
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta, timezone
+import io
+import json
+from pathlib import Path
+import platform
+import random
+import statistics
+import tempfile
+import time
+from typing import Any, Callable, Iterator, Sequence
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import pandas as pd
+
+from config import JSONL_FILE_NAME
+from get_source import as_dataframe, process_subject_data
+from main import generate_files
+from ranking_data import available_tags, filter_dataframe, insight_counts, load_from_dataframe
+
+
+BENCHMARK_VERSION = 1
+MIN_LINES = 10_000
+MAX_LINES = 5_000_000
+DEFAULT_LINES = 100_000
+DATE_DISPLAY_NAME = "开播日期"
+
+# 1 书籍、2 动画、3 音乐、4 游戏、6 三次元，比例参照近年的归档。
+TYPE_WEIGHTS = {1: 0.40, 2: 0.12, 3: 0.20, 4: 0.14, 6: 0.14}
+RANKED_RATE = {1: 0.20, 2: 0.55, 3: 0.15, 4: 0.35, 6: 0.30}
+MISSING_DATE_RATE = 0.07
+EMPTY_NAME_CN_RATE = 0.25
+INVALID_LINE_RATE = 0.0005
+META_TAGS = {
+    1: ["小说", "漫画", "日本", "轻小说", "单行本", "连载", "画集", "百合", "恋爱", "奇幻"],
+    2: [
+        "TV", "日本", "原创", "漫画改", "轻小说改", "游戏改", "剧场版", "OVA", "WEB",
+        "搞笑", "恋爱", "科幻", "奇幻", "战斗", "日常", "校园", "百合", "悬疑", "运动",
+        "音乐", "机战", "治愈", "后宫", "美食", "中国",
+    ],
+    3: ["OST", "ED", "OP", "角色歌", "日本", "专辑", "单曲"],
+    4: [
+        "PC", "PS4", "PS5", "Switch", "NS", "iOS", "Android", "RPG", "ADV", "ACT",
+        "AVG", "SLG", "STG", "FPS", "Galgame", "独立游戏", "日本", "中国", "欧美",
+        "恋爱", "像素", "开放世界", "Roguelike",
+    ],
+    6: ["日剧", "美剧", "电影", "纪录片", "综艺", "日本", "美国", "中国"],
+}
+_SYLLABLES = [
+    "a", "ka", "sa", "ta", "na", "ha", "ma", "ya", "ra", "wa", "ki", "shi", "chi", "ni",
+    "ri", "ku", "su", "tsu", "mu", "ru", "ko", "so", "to", "no", "mo", "ro", "n",
+]
+_HANZI = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动"
+    "同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自"
+    "二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日"
+    "那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变"
+    "条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总"
+    "次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指"
+    "几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器"
+    "压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安"
+    "场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集"
+    "温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连"
+    "断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精"
+    "值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属"
+    "圆包火住调满县局照参红细引听该铁价严"
+)
+
+
+def _name(rng: random.Random) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 7))).capitalize()
+
+
+def _hanzi(rng: random.Random, low: int, high: int) -> str:
+    return "".join(rng.choices(_HANZI, k=rng.randint(low, high)))
+
+
+def _score_details(rng: random.Random, votes: int, score: float) -> dict[str, int]:
+    weights = [1 / (1 + (level - score) ** 2) for level in range(1, 11)]
+    counts = [0] * 10
+    for level in rng.choices(range(10), weights=weights, k=min(votes, 50)):
+        counts[level] += 1
+    scale = votes / max(sum(counts), 1)
+    return {str(level + 1): round(count * scale) for level, count in enumerate(counts)}
+
+
+def synthetic_subject(rng: random.Random, subject_id: int) -> dict[str, Any]:
+    """生成一个字段齐全、形状与真实归档一致的条目。"""
+    subject_type = rng.choices(list(TYPE_WEIGHTS), weights=list(TYPE_WEIGHTS.values()))[0]
+    ranked = rng.random() < RANKED_RATE[subject_type]
+    votes = int(rng.paretovariate(1.1) * 8) if ranked else rng.randint(0, 9)
+    score = round(min(max(rng.gauss(6.6, 1.0), 1.0), 9.9), 1) if votes else 0
+    if rng.random() < MISSING_DATE_RATE:
+        release = ""
+    else:
+        release = (date(1960, 1, 1) + timedelta(days=rng.randint(0, 66 * 365))).isoformat()
+    pool = META_TAGS[subject_type]
+    return {
+        "id": subject_id,
+        "type": subject_type,
+        "name": _name(rng),
+        "name_cn": "" if rng.random() < EMPTY_NAME_CN_RATE else _hanzi(rng, 2, 10),
+        "infobox": "{{Infobox animanga/TVAnime\r\n|中文名= \r\n|别名={\r\n}\r\n|话数= "
+        f"{rng.randint(1, 52)}\r\n|放送开始= {release}\r\n|官方网站= \r\n}}}}",
+        "platform": rng.choice([0, 1, 2, 1001, 4001]),
+        "summary": _hanzi(rng, 20, 300),
+        "nsfw": rng.random() < 0.02,
+        "tags": [
+            {"name": tag, "count": rng.randint(1, 2000)}
+            for tag in rng.sample(pool, k=min(3, len(pool)))
+        ],
+        "meta_tags": rng.sample(pool, k=rng.randint(0, min(5, len(pool)))),
+        "score": score,
+        "score_details": _score_details(rng, votes, score),
+        "rank": rng.randint(1, 30_000) if ranked else 0,
+        "date": release,
+        "favorite": {
+            "wish": rng.randint(0, votes + 1),
+            "done": votes,
+            "doing": rng.randint(0, votes // 4 + 1),
+            "on_hold": rng.randint(0, votes // 20 + 1),
+            "dropped": rng.randint(0, votes // 20 + 1),
+        },
+        "series": rng.random() < 0.05,
+    }
+
+
+def synthetic_lines(count: int, seed: int = 0) -> Iterator[str]:
+    """逐行生成合成归档；约万分之五的行被截断成无效 JSON。"""
+    rng = random.Random(seed)
+    for subject_id in range(1, count + 1):
+        line = json.dumps(synthetic_subject(rng, subject_id), ensure_ascii=False)
+        if rng.random() < INVALID_LINE_RATE:
+            line = line[: rng.randint(1, len(line) - 1)]
+        yield line + "\n"
+
+
+def write_synthetic_archive(path: Path, count: int, *, seed: int = 0) -> Path:
+    """写出合成归档；扩展名为 ``.zip`` 时与 Bangumi Archive 一样打包成 zip。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".zip":
+        with ZipFile(path, "w", compression=ZIP_DEFLATED) as archive:
+            with archive.open(JSONL_FILE_NAME, "w", force_zip64=True) as target:
+                for line in synthetic_lines(count, seed):
+                    target.write(line.encode("utf-8"))
+    else:
+        with path.open("w", encoding="utf-8", newline="\n") as target:
+            target.writelines(synthetic_lines(count, seed))
+    return path
+
+
+def line_count(value: str) -> int:
+    """argparse 类型：合成归档的行数。"""
+    try:
+        count = int(value.replace("_", ""))
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"无效的行数：{value}") from exc
+    if not MIN_LINES <= count <= MAX_LINES:
+        raise argparse.ArgumentTypeError(f"行数应在 {MIN_LINES:,} 到 {MAX_LINES:,} 之间")
+    return count
+
+
+def dataset_bytes(df: pd.DataFrame) -> int:
+    """榜单数据的内存占用；多列共用的分类类别只计一次，不含预计算索引。"""
+    total = 0
+    seen: set[int] = set()
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            total += values.cat.codes.nbytes
+            categories = values.cat.categories
+            if id(categories) not in seen:
+                seen.add(id(categories))
+                total += int(categories.memory_usage(deep=True))
+        else:
+            total += int(values.memory_usage(index=False, deep=True))
+    return total
+
+
+def _measure(action: Callable[[], Any], repeat: int) -> tuple[dict[str, Any], Any]:
+    """重复执行并返回耗时统计和最后一次的结果；执行期间的输出被丢弃。"""
+    runs: list[float] = []
+    result = None
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = action()
+            runs.append(time.perf_counter() - started)
+    timing = {
+        "best_seconds": round(min(runs), 4),
+        "median_seconds": round(statistics.median(runs), 4),
+        "runs": [round(value, 4) for value in runs],
+    }
+    return timing, result
+
+
+def run_benchmarks(
+    count: int,
+    *,
+    seed: int = 0,
+    repeat: int = 3,
+    workers: int = 1,
+    work_dir: Path | None = None,
+) -> dict[str, Any]:
+    """在临时目录中生成合成归档并计时各处理步骤。"""
+    with tempfile.TemporaryDirectory(prefix="bangumi-bench-", dir=work_dir) as temp:
+        root = Path(temp)
+        dump_dir = root / "dump"
+        jsonl_path = write_synthetic_archive(dump_dir / JSONL_FILE_NAME, count, seed=seed)
+        results: dict[str, dict[str, Any]] = {}
+
+        results["process_subject_data"], (anime, _) = _measure(
+            lambda: process_subject_data(jsonl_path, workers=workers), repeat
+        )
+        results["generate_files"], _ = _measure(
+            lambda: generate_files(dump_dir, root / "output", workers=workers), repeat
+        )
+        source = as_dataframe(anime)
+        results["load_from_dataframe"], display = _measure(
+            lambda: load_from_dataframe(source, DATE_DISPLAY_NAME), repeat
+        )
+        results["available_tags"], tags = _measure(lambda: available_tags(display), repeat)
+
+        dates = display[DATE_DISPLAY_NAME]
+        filters = {
+            "default": {},
+            "search": {"search_term": "ka"},
+            "tags": {"tags": tags[:2]},
+            "combined": {
+                "search_term": "a",
+                "start_date": dates.quantile(0.25),
+                "end_date": dates.quantile(0.75),
+                "score_range": (6.0, 9.0),
+                "minimum_votes": 20,
+                "tags": tags[:1],
+            },
+        }
+        filtered = {}
+        for label, options in filters.items():
+            results[f"filter_dataframe[{label}]"], filtered[label] = _measure(
+                lambda: filter_dataframe(display, date_column=DATE_DISPLAY_NAME, **options),
+                repeat,
+            )
+        for label in ("default", "combined"):
+            results[f"insight_counts[{label}]"], _ = _measure(
+                lambda: insight_counts(filtered[label], DATE_DISPLAY_NAME), repeat
+            )
+
+        archive_bytes = jsonl_path.stat().st_size
+        display_bytes = dataset_bytes(display)
+
+    return {
+        "version": BENCHMARK_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "lines": count,
+        "seed": seed,
+        "repeat": repeat,
+        "workers": workers,
+        "archive_bytes": archive_bytes,
+        "anime_rows": len(anime),
+        "dataset_bytes": display_bytes,
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "system": platform.system(),
+        },
+        "results": results,
+    }
+
+
+def compare_results(
+    current: dict[str, Any], baseline: dict[str, Any]
+) -> dict[str, float]:
+    """返回每一项最佳耗时相对基准的倍数；大于 1 表示变慢。"""
+    ratios: dict[str, float] = {}
+    for name, timing in current.get("results", {}).items():
+        previous = baseline.get("results", {}).get(name)
+        if previous and previous.get("best_seconds"):
+            ratios[name] = round(timing["best_seconds"] / previous["best_seconds"], 3)
+    return ratios
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="生成合成 Bangumi 归档并运行性能基准")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="写出合成 subject.jsonlines 或 zip 归档")
+    generate.add_argument("--output", type=Path, required=True, help="输出路径，.zip 结尾时打包")
+    generate.add_argument("--lines", type=line_count, default=DEFAULT_LINES, help="行数")
+    generate.add_argument("--seed", type=int, default=0, help="随机种子")
+
+    run_command = commands.add_parser("run", help="计时各处理步骤并保存 JSON 结果")
+    run_command.add_argument("--lines", type=line_count, default=DEFAULT_LINES, help="行数")
+    run_command.add_argument("--seed", type=int, default=0, help="随机种子")
+    run_command.add_argument("--repeat", type=int, default=3, help="每一项重复次数")
+    run_command.add_argument("--workers", type=int, default=1, help="解析进程数")
+    run_command.add_argument("--output", type=Path, help="保存结果的 JSON 文件")
+    run_command.add_argument("--baseline", type=Path, help="用于比较的历史结果")
+    run_command.add_argument(
+        "--max-slowdown",
+        type=float,
+        help="任一项比基准慢到该倍数以上时返回非零退出码，例如 1.2",
+    )
+    return parser
+
+
+def run(argv: Sequence[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "generate":
+        path = write_synthetic_archive(args.output, args.lines, seed=args.seed)
+        print(f"[OK] 已生成 {args.lines:,} 行合成归档：{path}")
+        return 0
+
+    baseline = None
+    if args.baseline is not None:
+        try:
+            baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as exc:
+            print(f"[ERROR] 无法读取基准结果：{exc}")
+            return 1
+        if baseline.get("lines") != args.lines or baseline.get("seed") != args.seed:
+            print("[WARN] 基准结果的行数或随机种子不同，比较结果仅供参考")
+
+    report = run_benchmarks(
+        args.lines, seed=args.seed, repeat=args.repeat, workers=args.workers
+    )
+    ratios = compare_results(report, baseline) if baseline is not None else {}
+    if baseline is not None:
+        report["baseline"] = {"created_at": baseline.get("created_at"), "ratios": ratios}
+    for name, timing in report["results"].items():
+        ratio = f"  ×{ratios[name]:.2f}" if name in ratios else ""
+        print(f"{name:<34} {timing['best_seconds']:>10.4f} s{ratio}")
+    print(f"{'dataset_bytes':<34} {report['dataset_bytes'] / 1024**2:>10.2f} MiB")
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(
+            json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+        )
+        print(f"[OK] 已保存基准结果：{args.output}")
+
+    if args.max_slowdown is not None:
+        slower = {name: ratio for name, ratio in ratios.items() if ratio > args.max_slowdown}
+        for name, ratio in slower.items():
+            print(f"[WARN] {name} 比基准慢 {ratio:.2f} 倍")
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
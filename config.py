@@ -41,11 +41,19 @@ def _configured_path(variable: str, default: Path) -> Path:
 
 BANGUMI_DUMP_DIR = _configured_path("BANGUMI_DUMP_DIR", PROJECT_ROOT / "data")
 BANGUMI_APP_DATA_DIR = _configured_path("BANGUMI_APP_DATA_DIR", PROJECT_ROOT)
+BANGUMI_ARCHIVE_CACHE_DIR = _configured_path(
+    "BANGUMI_ARCHIVE_CACHE_DIR", PROJECT_ROOT / ".archive_cache"
+)
+ARCHIVE_CACHE_MAX_BYTES = int(os.environ.get("BANGUMI_ARCHIVE_CACHE_BYTES", 2 * 1024**3))
+FILTER_CACHE_MAX_BYTES = int(os.environ.get("BANGUMI_FILTER_CACHE_BYTES", 256 * 1024**2))
 
 JSONL_FILE_NAME = "subject.jsonlines"
 ANIME_CLEANED_FILE = "anime_cleaned.xlsx"
 GAME_CLEANED_FILE = "game_cleaned.xlsx"
 DATA_METADATA_FILE = "data_metadata.json"
+HOME_SUMMARY_FILE = "home_summary.json"
+DATA_FINGERPRINTS_FILE = "data_fingerprints.json"
+GITHUB_API_CACHE_FILE = ".github_api_cache.json"
 
 DATA_FILES = {
     "动画": ANIME_CLEANED_FILE,
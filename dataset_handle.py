@@ -0,0 +1,98 @@
+"""所有会话共享、文件变化后在后台热更新的只读数据集句柄。
+
+``ranking_ui`` 通过 ``st.cache_resource`` 为每个数据文件保存一个
+``SharedDataset``。每次读取只比较被监视文件的修改时间和大小；发现变化后由
+后台线程计算工作簿的 SHA-256，内容或副本确实变化时才重新加载，完成后原子
+替换当前数据。重新加载期间和失败时继续返回旧数据，页面不会阻塞或出错。
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import threading
+from typing import Callable, Generic, Hashable, Sequence, TypeVar
+
+from get_source import file_sha256
+
+
+T = TypeVar("T")
+
+# 文件不存在时为 None，否则为 (修改时间, 大小)。
+FileStamp = tuple[int, int] | None
+
+
+def file_stamp(path: Path) -> FileStamp:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SharedDataset(Generic[T]):
+    """线程安全的数据集句柄；构造时同步完成首次加载，加载失败时直接抛出。
+
+    ``load`` 接收工作簿的 SHA-256 并返回数据。``sidecars`` 是由工作簿派生的副本，
+    它们变化时即使工作簿内容不变也会重新加载；``triggers`` 只触发检查，例如
+    更新器最后写入的 ``data_metadata.json``。返回的数据由所有会话共享，调用方
+    不得原地修改。
+    """
+
+    def __init__(
+        self,
+        source: Path,
+        load: Callable[[str], T],
+        *,
+        sidecars: Sequence[Path] = (),
+        triggers: Sequence[Path] = (),
+    ) -> None:
+        self.source = Path(source)
+        self.reloads = 0
+        self._load = load
+        self._sidecars = tuple(sidecars)
+        self._watched = (self.source, *self._sidecars, *triggers)
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._version: Hashable = None
+        stamps = self._stamps()
+        self._stamps_seen = stamps
+        self._version, self._value = self._read(stamps)
+
+    def _stamps(self) -> tuple[FileStamp, ...]:
+        return tuple(file_stamp(path) for path in self._watched)
+
+    def _read(self, stamps: tuple[FileStamp, ...]) -> tuple[Hashable, T]:
+        version = (file_sha256(self.source), stamps[1 : 1 + len(self._sidecars)])
+        if version == self._version:
+            return version, self._value
+        return version, self._load(version[0])
+
+    def _refresh(self, stamps: tuple[FileStamp, ...]) -> None:
+        try:
+            version, value = self._read(stamps)
+        except Exception as exc:  # 后台线程中只能记录，继续提供旧数据
+            print(f"[WARN] 重新加载 {self.source} 失败，继续使用旧数据：{exc}")
+            return
+        with self._lock:
+            if version != self._version:
+                self.reloads += 1
+            self._version, self._value = version, value
+
+    def get(self) -> T:
+        """返回当前数据；被监视的文件变化时在后台开始重新加载。"""
+        stamps = self._stamps()
+        with self._lock:
+            busy = self._worker is not None and self._worker.is_alive()
+            if stamps != self._stamps_seen and not busy and stamps[0] is not None:
+                self._stamps_seen = stamps
+                self._worker = threading.Thread(
+                    target=self._refresh, args=(stamps,), name="dataset-reload", daemon=True
+                )
+                self._worker.start()
+            return self._value
+
+    def wait(self, timeout: float | None = None) -> None:
+        """等待正在进行的后台加载完成。"""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
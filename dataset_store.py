@@ -0,0 +1,125 @@
+"""榜单数据的内存映射二进制副本。
+
+文件由 JSON 头和若干按 64 字节对齐的定长数组段组成，每一列一个段；字符串拆成
+偏移量数组和 UTF-8 字节堆。读取时整个文件以只读方式内存映射，返回的数组都是
+映射上的视图：同一台机器上的多个 Streamlit 进程共享同一份页面缓存，读取时不
+复制数据。与 Parquet 副本一样，文件头记录对应 xlsx 的 SHA-256，过期的副本不会
+被使用。
+
+所有列放在同一个文件中，更新时可以和 xlsx 一样原子替换；已经映射旧文件的进程
+不受影响，直到重新加载。
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import struct
+from typing import Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+
+STORE_SUFFIX = ".ranking"
+STORE_VERSION = 1
+MAGIC = b"BGMRANK\x00"
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sQ")
+
+
+def store_path(workbook_path: str | Path) -> Path:
+    """工作簿旁边的内存映射副本路径，例如 ``anime_cleaned.ranking``。"""
+    return Path(workbook_path).with_suffix(STORE_SUFFIX)
+
+
+def _aligned(size: int) -> int:
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def encode_strings(values: Iterable[object]) -> tuple[np.ndarray, np.ndarray]:
+    """编码为 ``(offsets, heap)``：第 i 个字符串是 ``heap[offsets[i]:offsets[i + 1]]``。"""
+    encoded = [str(value).encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def decode_strings(offsets: np.ndarray, heap: np.ndarray) -> pd.Index:
+    """还原为字符串 Index；安装了 pyarrow 时直接引用 ``heap`` 中的字节，不复制。"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        data = heap.tobytes()
+        bounds = zip(offsets[:-1].tolist(), offsets[1:].tolist())
+        return pd.Index([data[start:stop].decode("utf-8") for start, stop in bounds], dtype=object)
+    array = pa.LargeStringArray.from_buffers(
+        len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(heap)
+    )
+    return pd.Index(pd.arrays.ArrowStringArray(pa.chunked_array([array])))
+
+
+def write_store(path: str | Path, arrays: Mapping[str, np.ndarray], source_sha256: str) -> Path:
+    """原子写入副本；``arrays`` 只能包含定长类型（数值、布尔、datetime64）。"""
+    path = Path(path)
+    layout: dict[str, dict[str, object]] = {}
+    position = 0
+    contiguous: dict[str, np.ndarray] = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.kind not in "biufM":
+            raise ValueError(f"{name} 不是定长数组：{array.dtype}")
+        contiguous[name] = array
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": position}
+        position += _aligned(array.nbytes)
+
+    header = json.dumps(
+        {"version": STORE_VERSION, "source_sha256": source_sha256, "arrays": layout},
+        ensure_ascii=False,
+    ).encode("utf-8")
+    data_start = _aligned(_PREAMBLE.size + len(header))
+    temporary = path.with_name(path.name + ".tmp")
+    with temporary.open("wb") as target:
+        target.write(_PREAMBLE.pack(MAGIC, len(header)))
+        target.write(header)
+        for name, array in contiguous.items():
+            target.seek(data_start + int(layout[name]["offset"]))
+            target.write(array.tobytes())
+        target.truncate(data_start + position)
+    temporary.replace(path)
+    return path
+
+
+def read_store(
+    path: str | Path, source_sha256: str | None = None
+) -> dict[str, np.ndarray] | None:
+    """以只读内存映射打开副本并返回各数组的视图。
+
+    文件缺失、格式或版本不符、数据截断，或与 ``source_sha256`` 不一致时返回 None。
+    """
+    try:
+        raw = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, header_length = _PREAMBLE.unpack(raw[: _PREAMBLE.size].tobytes())
+        if magic != MAGIC:
+            return None
+        header = json.loads(
+            raw[_PREAMBLE.size : _PREAMBLE.size + header_length].tobytes().decode("utf-8")
+        )
+        if header.get("version") != STORE_VERSION:
+            return None
+        if source_sha256 is not None and header.get("source_sha256") != source_sha256:
+            return None
+        data_start = _aligned(_PREAMBLE.size + header_length)
+        arrays: dict[str, np.ndarray] = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            start = data_start + int(spec["offset"])
+            stop = start + int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+            if stop > len(raw):
+                return None
+            # 普通 ndarray 视图，映射经由 ``base`` 保持打开。
+            arrays[name] = raw[start:stop].view(dtype=dtype, type=np.ndarray).reshape(shape)
+        return arrays
+    except (OSError, ValueError, KeyError, TypeError, struct.error, json.JSONDecodeError):
+        return None
@@ -0,0 +1,111 @@
+"""榜单筛选结果的进程内 LRU 缓存。
+
+Streamlit 的所有会话运行在同一个进程中，``ranking_ui`` 通过
+``st.cache_resource`` 让它们共用一个 ``FilterCache``。键由数据版本和规范化后的
+筛选条件组成，同一查询的导出文件（bytes）也保存在这里；数据文件变化后版本随之
+改变，同一数据源的旧版本结果在首次遇到新版本时一并清除。总内存超过预算时按最近
+最少使用的顺序淘汰。
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import threading
+from typing import Any, Callable, Hashable
+
+import pandas as pd
+
+
+# (数据源, 版本标记)，例如 (文件路径, 工作簿 SHA-256)。
+DatasetVersion = tuple[str, Hashable]
+CachedValue = pd.DataFrame | bytes
+
+
+def _size_of(value: CachedValue) -> int:
+    if isinstance(value, bytes):
+        return len(value)
+    return int(value.memory_usage(index=True, deep=True).sum())
+
+
+class FilterCache:
+    """线程安全的筛选结果缓存；``max_bytes`` 为 0 时不缓存。
+
+    返回的 DataFrame 和 bytes 会在多个会话之间共享，调用方不得原地修改。
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+        self._entries: OrderedDict[tuple[DatasetVersion, Hashable], tuple[CachedValue, int]] = (
+            OrderedDict()
+        )
+        self._versions: dict[str, Hashable] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _forget_source(self, source: str) -> None:
+        for key in [key for key in self._entries if key[0][0] == source]:
+            self.size_bytes -= self._entries.pop(key)[1]
+
+    def get_or_compute(
+        self, version: DatasetVersion, query: Hashable, compute: Callable[[], CachedValue]
+    ) -> CachedValue:
+        """命中时返回缓存结果，否则调用 ``compute`` 并按预算保存结果。"""
+        if not self.enabled:
+            return compute()
+        source, stamp = version
+        key = (version, query)
+        with self._lock:
+            if self._versions.get(source, stamp) != stamp:
+                self._forget_source(source)
+            self._versions[source] = stamp
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # 在锁外计算，避免一个慢查询阻塞其他会话。
+        result = compute()
+        size = _size_of(result)
+        if size > self.max_bytes:
+            return result
+        with self._lock:
+            if self._versions.get(source) != stamp or key in self._entries:
+                return result
+            self._entries[key] = (result, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted
+                self.evictions += 1
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -2,17 +2,41 @@
 
 from __future__ import annotations
 
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+import hashlib
 import json
+import math
 from pathlib import Path
-from typing import Any
+import re
+from typing import Any, BinaryIO, Iterable, Iterator
+from zipfile import BadZipFile
 
+import numpy as np
 import pandas as pd
 
+from instrumentation import annotate, instrumented
+from subject_index import UTF8_BOM, line_subject_id, write_index
+
 
 TYPE_ANIME = 2
 TYPE_GAME = 4
 DATE_COLUMN_NAME = "date"
 EXCEL_DATE_FORMAT = "yyyy-mm-dd"
+STREAM_BATCH_LINES = 20_000
+COLUMNAR_SOURCE_KEY = b"bangumi_source_sha256"
+MISSING_INT = -(2**63)
+_INT64_MAX = 2**63 - 1
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_MIN_DATE_DAYS = pd.Timestamp.min.ceil("D").date().toordinal() - _EPOCH_ORDINAL
+_MAX_DATE_DAYS = pd.Timestamp.max.floor("D").date().toordinal() - _EPOCH_ORDINAL
+
+# 只匹配紧跟 JSON 分隔符的整数取值；浮点、字符串等写法交给完整解析。
+_TYPE_FIELD = re.compile(rb'"type"[ \t\r\n]*:[ \t\r\n]*(-?\d+)[ \t\r\n]*[,}]')
+_RANK_FIELD = re.compile(rb'"rank"[ \t\r\n]*:[ \t\r\n]*(-?\d+)[ \t\r\n]*[,}]')
 
 
 def _tag_name(tag: Any) -> str:
@@ -33,58 +57,378 @@ def _score_total(score_details: Any) -> int:
     return total
 
 
-def process_subject_data(jsonl_path: str | Path):
-    """流式读取归档，并返回动画与游戏两组清洗记录。"""
-    path = Path(jsonl_path)
-    anime_records: list[dict[str, Any]] = []
-    game_records: list[dict[str, Any]] = []
-    skipped_missing_date = 0
-    skipped_invalid_json = 0
+def _as_int(value: Any) -> int:
+    try:
+        number = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return MISSING_INT
+    return number if MISSING_INT < number <= _INT64_MAX else MISSING_INT
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _date_days(value: Any) -> int:
+    """把日期转换为 Unix 纪元以来的天数；无法解析或超出 pandas 范围时记为缺失。"""
+    parsed: date | None = None
+    if isinstance(value, str):
+        try:
+            parsed = date.fromisoformat(value)
+        except ValueError:
+            parsed = None
+    if parsed is None:
+        timestamp = pd.to_datetime(value, errors="coerce")
+        if pd.isna(timestamp):
+            return MISSING_INT
+        parsed = timestamp.date()
+    days = parsed.toordinal() - _EPOCH_ORDINAL
+    return days if _MIN_DATE_DAYS <= days <= _MAX_DATE_DAYS else MISSING_INT
+
+
+def _buffer(values: array, dtype: type[np.generic]) -> np.ndarray:
+    return np.frombuffer(values, dtype=dtype) if values else np.empty(0, dtype)
+
+
+def _int_column(values: array) -> np.ndarray | pd.arrays.IntegerArray:
+    data = _buffer(values, np.int64)
+    missing = data == MISSING_INT
+    if missing.any():
+        return pd.arrays.IntegerArray(data.copy(), missing)
+    return data
+
+
+@dataclass
+class SubjectColumns:
+    """按列累积的清洗记录。
+
+    数值与日期存放在紧凑的 ``array`` 中（日期为 Unix 纪元天数），文本列为
+    字符串列表；缺失值用 ``MISSING_INT`` / ``nan`` 表示。``to_dataframe``
+    直接把各列交给 pandas，不经过逐行字典。
+    """
+
+    ids: array = field(default_factory=lambda: array("q"))
+    names: list[str] = field(default_factory=list)
+    names_cn: list[str] = field(default_factory=list)
+    dates: array = field(default_factory=lambda: array("q"))
+    meta_tags: list[str] = field(default_factory=list)
+    scores: array = field(default_factory=lambda: array("d"))
+    score_totals: array = field(default_factory=lambda: array("q"))
+    ranks: array = field(default_factory=lambda: array("q"))
+
+    def append_subject(self, subject: dict[str, Any]) -> None:
+        """只取出导出所需的八个字段并追加为一行。"""
+        original_name = subject.get("name") or ""
+        raw_tags = subject.get("meta_tags") or []
+        if not isinstance(raw_tags, list):
+            raw_tags = [raw_tags]
+        tags = [name for tag in raw_tags if (name := _tag_name(tag))]
+        self.ids.append(_as_int(subject.get("id")))
+        self.names.append(str(original_name))
+        self.names_cn.append(str(subject.get("name_cn") or original_name))
+        self.dates.append(_date_days(subject.get("date")))
+        self.meta_tags.append(", ".join(tags))
+        self.scores.append(_as_float(subject.get("score")))
+        self.score_totals.append(_score_total(subject.get("score_details")))
+        self.ranks.append(_as_int(subject.get("rank")))
+
+    def extend(self, other: SubjectColumns) -> None:
+        self.ids.extend(other.ids)
+        self.names.extend(other.names)
+        self.names_cn.extend(other.names_cn)
+        self.dates.extend(other.dates)
+        self.meta_tags.extend(other.meta_tags)
+        self.scores.extend(other.scores)
+        self.score_totals.extend(other.score_totals)
+        self.ranks.extend(other.ranks)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> dict[str, Any]:
+        """按行返回字典，便于调试和测试；批量处理请使用 ``to_dataframe``。"""
+        if not -len(self) <= index < len(self):
+            raise IndexError("SubjectColumns 行号超出范围")
+
+        def optional(value: int) -> int | None:
+            return None if value == MISSING_INT else value
+
+        days = self.dates[index]
+        score = self.scores[index]
+        return {
+            "id": optional(self.ids[index]),
+            "name": self.names[index],
+            "name_cn": self.names_cn[index],
+            "date": (
+                None if days == MISSING_INT else date.fromordinal(days + _EPOCH_ORDINAL)
+            ),
+            "meta_tags": self.meta_tags[index],
+            "score": None if math.isnan(score) else score,
+            "score_total": self.score_totals[index],
+            "rank": optional(self.ranks[index]),
+        }
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        return (self[index] for index in range(len(self)))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "id": _int_column(self.ids),
+                "name": self.names,
+                "name_cn": self.names_cn,
+                # datetime64 的 NaT 与 MISSING_INT 同值，缺失日期直接成为 NaT。
+                "date": _buffer(self.dates, np.int64)
+                .astype("datetime64[D]")
+                .astype("datetime64[ns]"),
+                "meta_tags": self.meta_tags,
+                "score": _buffer(self.scores, np.float64),
+                "score_total": _int_column(self.score_totals),
+                "rank": _int_column(self.ranks),
+            }
+        )
+
+
+@dataclass
+class _ParsedShard:
+    """单个分片的解析结果；警告保留分片内行号，由主进程统一换算。"""
+
+    anime_records: SubjectColumns = field(default_factory=SubjectColumns)
+    game_records: SubjectColumns = field(default_factory=SubjectColumns)
+    skipped_missing_date: int = 0
+    skipped_invalid_json: int = 0
+    line_count: int = 0
+    byte_count: int = 0
+    warnings: list[tuple[int, str]] = field(default_factory=list)
+    index_ids: array = field(default_factory=lambda: array("q"))
+    index_offsets: array = field(default_factory=lambda: array("q"))
+    index_lengths: array = field(default_factory=lambda: array("q"))
+
+
+def _prefilter_rejects(line: bytes) -> bool:
+    """解码前判断原始字节行是否一定不会保留；无法确定时返回 False。
+
+    只有 ``"type"`` / ``"rank"`` 在整行中恰好出现一次时才采信其取值，
+    嵌套对象或字符串里出现同名键时一律按完整解析的结果判断。被判定丢弃的行
+    仍要解析一次确认是有效 JSON，损坏行照常计入 ``skipped_invalid_json``。
+    """
+    if line.count(b'"type"') == 1:
+        match = _TYPE_FIELD.search(line)
+        if match is not None and int(match.group(1)) not in (TYPE_ANIME, TYPE_GAME):
+            return True
+    if line.count(b'"rank"') == 1:
+        match = _RANK_FIELD.search(line)
+        if match is not None and int(match.group(1)) == 0:
+            return True
+    return False
+
+
+def _parse_lines(
+    lines: Iterable[bytes], *, start_offset: int = 0, build_index: bool = False
+) -> _ParsedShard:
+    """解析一段原始字节行；串行与并行模式共用同一套规则。
+
+    ``start_offset`` 是首行在文件中的字节位置：为 0 时与 ``utf-8-sig`` 文本
+    模式一致，去掉首行开头的 BOM。``build_index`` 为真时顺带记录每行的
+    ``(id, offset, length)``。
+    """
+    result = _ParsedShard()
+    position = start_offset
+    for line_number, raw_line in enumerate(lines, 1):
+        result.line_count = line_number
+        line_start = position
+        position += len(raw_line)
+        if line_start == 0:
+            raw_line = raw_line.removeprefix(UTF8_BOM)
+        rejected = _prefilter_rejects(raw_line)
+        try:
+            subject = json.loads(raw_line.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            result.skipped_invalid_json += 1
+            result.warnings.append((line_number, f" JSON 无效：{exc}"))
+            if build_index:
+                _record_index(result, raw_line, None, line_start, position)
+            continue
+
+        if not isinstance(subject, dict):
+            result.skipped_invalid_json += 1
+            result.warnings.append((line_number, "不是 JSON 对象，已跳过"))
+            continue
+        if build_index:
+            _record_index(result, raw_line, subject, line_start, position)
+        if rejected:
+            continue
+
+        subject_type = subject.get("type")
+        if subject_type not in (TYPE_ANIME, TYPE_GAME) or subject.get("rank") == 0:
+            continue
+        if not subject.get("date"):
+            result.skipped_missing_date += 1
+            continue
+
+        target = result.anime_records if subject_type == TYPE_ANIME else result.game_records
+        target.append_subject(subject)
+    result.byte_count = position - start_offset
+    return result
+
+
+def _record_index(
+    result: _ParsedShard, line: bytes, subject: Any, start: int, end: int
+) -> None:
+    subject_id = line_subject_id(line, subject)
+    if subject_id is not None:
+        result.index_ids.append(subject_id)
+        result.index_offsets.append(start)
+        result.index_lengths.append(end - start)
+
 
-    print(f"正在读取：{path}")
+def _shard_ranges(path: Path, shards: int) -> list[tuple[int, int]]:
+    """把文件切成按换行对齐的字节区间，保证每行只属于一个分片。"""
+    size = path.stat().st_size
+    boundaries = [0]
+    with path.open("rb") as source:
+        for index in range(1, shards):
+            source.seek(max(size * index // shards - 1, boundaries[-1]))
+            source.readline()
+            boundaries.append(min(source.tell(), size))
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+def _iter_range_lines(source: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+    source.seek(start)
+    position = start
+    while position < end:
+        line = source.readline()
+        if not line:
+            return
+        position += len(line)
+        yield line
+
+
+def _parse_shard(path: str, start: int, end: int, build_index: bool) -> _ParsedShard:
+    """进程池入口：只读取 ``[start, end)`` 字节区间。"""
+    with open(path, "rb") as source:
+        return _parse_lines(
+            _iter_range_lines(source, start, end),
+            start_offset=start,
+            build_index=build_index,
+        )
+
+
+def _parse_parallel(path: Path, workers: int, build_index: bool) -> list[_ParsedShard]:
+    ranges = _shard_ranges(path, workers)
+    if len(ranges) <= 1:
+        with path.open("rb") as source:
+            return [_parse_lines(source, build_index=build_index)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+        return list(
+            executor.map(
+                _parse_shard,
+                [str(path)] * len(ranges),
+                [start for start, _ in ranges],
+                [end for _, end in ranges],
+                [build_index] * len(ranges),
+            )
+        )
+
+
+def _line_batches(lines: Iterable[bytes], size: int) -> Iterator[list[bytes]]:
+    batch: list[bytes] = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _parse_stream_parallel(
+    source: BinaryIO, workers: int, build_index: bool
+) -> list[_ParsedShard]:
+    """不可随机访问的流（如 zip 成员）按行分批交给进程池，在途批次有上限。"""
+    shards: list[_ParsedShard] = []
+    pending: deque[Future[_ParsedShard]] = deque()
+    offset = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in _line_batches(source, STREAM_BATCH_LINES):
+            pending.append(
+                executor.submit(
+                    _parse_lines, batch, start_offset=offset, build_index=build_index
+                )
+            )
+            offset += sum(map(len, batch))
+            if len(pending) >= 2 * workers:
+                shards.append(pending.popleft().result())
+        shards.extend(future.result() for future in pending)
+    return shards
+
+
+@instrumented()
+def process_subject_data(
+    source: str | Path | BinaryIO,
+    *,
+    workers: int = 1,
+    index_path: str | Path | None = None,
+):
+    """流式读取归档，并返回动画与游戏两组清洗记录。
+
+    ``source`` 可以是文件路径，也可以是已打开的二进制流（例如
+    ``ZipFile.open()`` 返回的成员），后者边解压边解析，不落盘。
+    ``workers`` 大于 1 时并行解析：文件按换行对齐的字节区间分片，流按行分批；
+    结果按原始顺序合并，与串行模式完全一致。
+    传入 ``index_path`` 时顺带写出 ``subject_index`` 字节偏移索引；对流而言
+    偏移指解压后的内容。
+    """
+    build_index = index_path is not None
+    is_stream = hasattr(source, "read")
+    label = getattr(source, "name", "<stream>") if is_stream else Path(source)
+    print(f"正在读取：{label}")
     try:
-        with path.open("r", encoding="utf-8-sig") as source:
-            for line_number, line in enumerate(source, 1):
-                try:
-                    subject = json.loads(line)
-                except json.JSONDecodeError as exc:
-                    skipped_invalid_json += 1
-                    print(f"[WARN] 第 {line_number} 行 JSON 无效：{exc}")
-                    continue
-
-                if not isinstance(subject, dict):
-                    skipped_invalid_json += 1
-                    print(f"[WARN] 第 {line_number} 行不是 JSON 对象，已跳过")
-                    continue
-
-                subject_type = subject.get("type")
-                if subject_type not in (TYPE_ANIME, TYPE_GAME) or subject.get("rank") == 0:
-                    continue
-                if not subject.get("date"):
-                    skipped_missing_date += 1
-                    continue
-
-                original_name = subject.get("name") or ""
-                raw_tags = subject.get("meta_tags") or []
-                if not isinstance(raw_tags, list):
-                    raw_tags = [raw_tags]
-                tags = [name for tag in raw_tags if (name := _tag_name(tag))]
-                record = {
-                    "id": subject.get("id"),
-                    "name": original_name,
-                    "name_cn": subject.get("name_cn") or original_name,
-                    "date": subject.get("date"),
-                    "meta_tags": ", ".join(tags),
-                    "score": subject.get("score"),
-                    "score_total": _score_total(subject.get("score_details")),
-                    "rank": subject.get("rank"),
-                }
-                target = anime_records if subject_type == TYPE_ANIME else game_records
-                target.append(record)
-    except (OSError, UnicodeError) as exc:
+        if is_stream:
+            if workers > 1:
+                shards = _parse_stream_parallel(source, workers, build_index)
+            else:
+                shards = [_parse_lines(source, build_index=build_index)]
+        elif workers > 1:
+            shards = _parse_parallel(Path(source), workers, build_index)
+        else:
+            with Path(source).open("rb") as stream:
+                shards = [_parse_lines(stream, build_index=build_index)]
+    except (OSError, UnicodeError, EOFError, BadZipFile) as exc:
         print(f"[ERROR] 无法读取归档：{exc}")
         return None, None
 
+    anime_records = SubjectColumns()
+    game_records = SubjectColumns()
+    skipped_missing_date = 0
+    skipped_invalid_json = 0
+    line_offset = 0
+    for shard in shards:
+        for line_number, message in shard.warnings:
+            print(f"[WARN] 第 {line_offset + line_number} 行{message}")
+        anime_records.extend(shard.anime_records)
+        game_records.extend(shard.game_records)
+        skipped_missing_date += shard.skipped_missing_date
+        skipped_invalid_json += shard.skipped_invalid_json
+        line_offset += shard.line_count
+    annotate(lines=line_offset, bytes=sum(shard.byte_count for shard in shards))
+
+    if index_path is not None:
+        try:
+            ids, offsets, lengths = array("q"), array("q"), array("q")
+            for shard in shards:
+                ids.extend(shard.index_ids)
+                offsets.extend(shard.index_offsets)
+                lengths.extend(shard.index_lengths)
+            write_index(ids, offsets, lengths, index_path)
+            print(f"[OK] 已写入字节偏移索引：{index_path}")
+        except OSError as exc:
+            print(f"[WARN] 无法写入字节偏移索引：{exc}")
     print(
         f"处理完成：动画 {len(anime_records):,} 条，游戏 {len(game_records):,} 条；"
         f"跳过无日期 {skipped_missing_date:,} 条、无效 JSON {skipped_invalid_json:,} 条。"
@@ -92,27 +436,141 @@ def process_subject_data(jsonl_path: str | Path):
     return anime_records, game_records
 
 
-def export_to_excel(data_list, output_path: str | Path, sheet_name: str) -> bool:
-    """把记录写入 Excel。"""
+def as_dataframe(
+    data_list: SubjectColumns | pd.DataFrame | list[dict[str, Any]],
+) -> pd.DataFrame:
+    """把任意一种记录形式转换为新的 DataFrame，调用方可以放心修改。"""
+    if isinstance(data_list, SubjectColumns):
+        return data_list.to_dataframe()
+    if isinstance(data_list, pd.DataFrame):
+        return data_list.copy()
+    return pd.DataFrame(data_list)
+
+
+@instrumented()
+def export_to_excel(
+    data_list: SubjectColumns | pd.DataFrame | list[dict[str, Any]],
+    output_path: str | Path,
+    sheet_name: str,
+) -> bool:
+    """一次写入 Excel，日期列直接以真正的日期和 ``EXCEL_DATE_FORMAT`` 格式输出。
+
+    ``SubjectColumns`` 按列直接转换，不经过逐行字典。
+    """
     path = Path(output_path)
-    if not data_list:
+    if data_list is None or len(data_list) == 0:
         print(f"[WARN] {sheet_name} 没有可导出的数据")
         return False
     try:
         path.parent.mkdir(parents=True, exist_ok=True)
-        pd.DataFrame(data_list).to_excel(
-            path, index=False, sheet_name=sheet_name, engine="xlsxwriter"
-        )
+        frame = as_dataframe(data_list)
+        if DATE_COLUMN_NAME in frame.columns:
+            frame[DATE_COLUMN_NAME] = pd.to_datetime(frame[DATE_COLUMN_NAME], errors="coerce")
+        with pd.ExcelWriter(
+            path,
+            engine="xlsxwriter",
+            datetime_format=EXCEL_DATE_FORMAT,
+            date_format=EXCEL_DATE_FORMAT,
+        ) as writer:
+            frame.to_excel(writer, index=False, sheet_name=sheet_name)
+        annotate(lines=len(frame), bytes=path.stat().st_size)
         return True
     except (OSError, ValueError) as exc:
         print(f"[ERROR] 无法导出 {path}：{exc}")
         return False
 
 
+def file_sha256(path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as source:
+        while chunk := source.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def columnar_path(workbook_path: str | Path) -> Path:
+    """工作簿旁边的列式副本路径，例如 ``anime_cleaned.parquet``。"""
+    return Path(workbook_path).with_suffix(".parquet")
+
+
+def export_columnar(
+    data: pd.DataFrame, workbook_path: str | Path, *, sha256: str | None = None
+) -> bool:
+    """在工作簿旁写入类型化的 Parquet 副本，并记录对应工作簿的 SHA-256。
+
+    ``sha256`` 默认由 ``workbook_path`` 计算；为别处已有的工作簿生成副本时直接
+    传入其校验值。副本只是加速读取的缓存；缺少 pyarrow 或写入失败时返回
+    False，不影响 xlsx。
+    """
+    workbook = Path(workbook_path)
+    path = columnar_path(workbook)
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("[WARN] 未安装 pyarrow，跳过列式副本")
+        return False
+    try:
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        metadata = {
+            **(table.schema.metadata or {}),
+            COLUMNAR_SOURCE_KEY: (sha256 or file_sha256(workbook)).encode("ascii"),
+        }
+        temporary = path.with_suffix(".parquet.tmp")
+        pq.write_table(table.replace_schema_metadata(metadata), temporary)
+        temporary.replace(path)
+        return True
+    except (OSError, ValueError, pa.ArrowException) as exc:
+        print(f"[WARN] 无法写入列式副本 {path}：{exc}")
+        return False
+
+
+def columnar_source_sha256(workbook_path: str | Path) -> str | None:
+    """只读取 Parquet 副本的元数据，返回其记录的工作簿 SHA-256；副本缺失或不可读时返回 None。"""
+    path = columnar_path(workbook_path)
+    if not path.is_file():
+        return None
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    try:
+        recorded = (pq.read_schema(path).metadata or {}).get(COLUMNAR_SOURCE_KEY)
+    except (OSError, ValueError, pa.ArrowException):
+        return None
+    return None if recorded is None else recorded.decode("ascii")
+
+
+def read_columnar(workbook_path: str | Path) -> pd.DataFrame | None:
+    """读取与工作簿内容一致的 Parquet 副本；副本缺失、过期或不可读时返回 None。"""
+    workbook = Path(workbook_path)
+    path = columnar_path(workbook)
+    if not path.is_file() or not workbook.is_file():
+        return None
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    try:
+        table = pq.read_table(path)
+        recorded = (table.schema.metadata or {}).get(COLUMNAR_SOURCE_KEY)
+        if recorded is None or recorded.decode("ascii") != file_sha256(workbook):
+            return None
+        return table.to_pandas()
+    except (OSError, ValueError, pa.ArrowException):
+        return None
+
+
+@instrumented()
 def apply_excel_date_format(
     file_path: str | Path, column_name: str, date_format: str
 ) -> bool:
-    """把指定列转换为真正的 Excel 日期，并保留原工作表名称。"""
+    """把已有工作簿的指定列转换为真正的 Excel 日期，并保留原工作表名称。
+
+    ``export_to_excel`` 已经直接写出日期格式，此函数仅用于修复旧文件。
+    """
     path = Path(file_path)
     if not path.is_file():
         print(f"[ERROR] 文件不存在：{path}")
@@ -129,6 +587,7 @@ def apply_excel_date_format(
             path, engine="xlsxwriter", datetime_format=date_format
         ) as writer:
             data.to_excel(writer, index=False, sheet_name=sheet_name)
+        annotate(lines=len(data), bytes=path.stat().st_size)
         return True
     except (OSError, ValueError) as exc:
         print(f"[ERROR] 无法格式化 {path}：{exc}")
@@ -0,0 +1,100 @@
+"""首页概览的预计算摘要。
+
+数据生成流程在输出目录写入 ``home_summary.json``：各类别的作品数、评分人次和
+“高口碑作品速览”表，并记录生成时每个工作簿的 SHA-256。首页只读这个几 KB 的
+文件即可渲染；摘要缺失或与工作簿不一致时才回退到加载完整榜单。
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Mapping
+
+import pandas as pd
+
+from get_source import file_sha256
+from ranking_data import NAME_CN, RANK, SCORE, SCORE_TOTAL, SUBJECT_ID
+
+
+SUMMARY_VERSION = 1
+CATEGORY = "类型"
+HIGHLIGHT_MIN_VOTES = 1_000
+HIGHLIGHT_COUNT = 12
+# 评分人数达到该值后口碑指数不再增加。
+_VOTE_SATURATION = 50_000
+HIGHLIGHT_COLUMNS = [CATEGORY, RANK, NAME_CN, SCORE, SCORE_TOTAL, SUBJECT_ID]
+
+
+def highlight_table(datasets: Mapping[str, pd.DataFrame]) -> pd.DataFrame:
+    """至少 1,000 人评分的作品按口碑指数（评分 ×（1 + 封顶的评分人数占比））排序取前 12。"""
+    candidates = []
+    for category, data in datasets.items():
+        qualified = data.loc[data[SCORE_TOTAL] >= HIGHLIGHT_MIN_VOTES, HIGHLIGHT_COLUMNS[1:]]
+        index = qualified[SCORE].astype("float64") * (
+            1 + qualified[SCORE_TOTAL].clip(upper=_VOTE_SATURATION) / _VOTE_SATURATION
+        )
+        # 保持原始行序，与对全部候选稳定排序的结果一致。
+        top = index.nlargest(HIGHLIGHT_COUNT, keep="all").index.sort_values()
+        if top.empty:
+            continue
+        candidates.append(
+            qualified.loc[top].assign(**{CATEGORY: category, "口碑指数": index.loc[top]})
+        )
+    if not candidates:
+        return pd.DataFrame(columns=HIGHLIGHT_COLUMNS)
+    return (
+        pd.concat(candidates, ignore_index=True)
+        .sort_values(["口碑指数", SCORE_TOTAL], ascending=False, kind="stable")
+        .head(HIGHLIGHT_COUNT)[HIGHLIGHT_COLUMNS]
+        .reset_index(drop=True)
+    )
+
+
+def build_home_summary(datasets: Mapping[str, pd.DataFrame]) -> dict[str, Any]:
+    """由 ``load_from_dataframe`` 返回的各类别榜单计算首页摘要。"""
+    highlights = highlight_table(datasets)
+    # float32 评分按最短十进制表示写入，避免 JSON 中出现 8.399999618530273。
+    highlights[SCORE] = highlights[SCORE].astype(str).astype(float)
+    return {
+        "counts": {category: len(data) for category, data in datasets.items()},
+        "votes": {category: int(data[SCORE_TOTAL].sum()) for category, data in datasets.items()},
+        "highlights": json.loads(highlights.to_json(orient="records", force_ascii=False)),
+    }
+
+
+def highlight_frame(summary: Mapping[str, Any]) -> pd.DataFrame:
+    """把摘要中的速览表还原为 DataFrame。"""
+    return pd.DataFrame(summary["highlights"], columns=HIGHLIGHT_COLUMNS)
+
+
+def write_home_summary(
+    path: Path, datasets: Mapping[str, pd.DataFrame], workbooks: Mapping[str, Path]
+) -> Path:
+    """原子写入摘要；``workbooks`` 是每个类别最终就位的工作簿，用于记录校验值。"""
+    summary = {
+        "version": SUMMARY_VERSION,
+        "sources": {category: file_sha256(workbook) for category, workbook in workbooks.items()},
+        **build_home_summary(datasets),
+    }
+    temporary = path.with_name(path.name + ".tmp")
+    temporary.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    temporary.replace(path)
+    return path
+
+
+def read_home_summary(path: Path, workbooks: Mapping[str, Path]) -> dict[str, Any] | None:
+    """读取与 ``workbooks`` 内容一致的摘要；缺失、损坏或过期时返回 None。"""
+    try:
+        summary = json.loads(path.read_text(encoding="utf-8"))
+        if summary.get("version") != SUMMARY_VERSION:
+            return None
+        sources = summary["sources"]
+        if set(sources) != set(workbooks) or any(
+            sources[category] != file_sha256(workbook)
+            for category, workbook in workbooks.items()
+        ):
+            return None
+        return summary
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
@@ -0,0 +1,164 @@
+"""数据处理步骤的耗时、吞吐量与内存峰值统计。
+
+用 ``@instrumented()`` 标记需要统计的函数，函数内部用 ``annotate`` 补充处理的
+字节数和行数。只有在 ``recording()`` 范围内调用时才会记录，其余情况下几乎
+没有开销。峰值内存取自 ``getrusage``，是进程启动以来的最高值：
+``peak_rss_bytes`` 只含主进程，``peak_child_rss_bytes`` 是已结束子进程（例如
+``--workers`` 的解析进程）中最大的一个。Windows 等没有 ``resource`` 模块的
+平台记为 None。
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import functools
+import json
+from pathlib import Path
+import sys
+import time
+from typing import Any, Callable, Iterator, TypeVar
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+_Function = TypeVar("_Function", bound=Callable[..., Any])
+
+
+def _max_rss(who: int) -> int | None:
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux 以 KiB 为单位，macOS 以字节为单位。
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def peak_rss_bytes() -> int | None:
+    """主进程的内存峰值，不含子进程。"""
+    return None if resource is None else _max_rss(resource.RUSAGE_SELF)
+
+
+def peak_child_rss_bytes() -> int | None:
+    """已结束的子进程中内存峰值最高的一个；没有子进程时为 0。"""
+    return None if resource is None else _max_rss(resource.RUSAGE_CHILDREN)
+
+
+def _cpu_seconds() -> float:
+    """本进程与已结束子进程（并行解析的进程池）的 CPU 时间之和。"""
+    if resource is None:
+        return time.process_time()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def _rate(amount: Any, seconds: float) -> float | None:
+    if not isinstance(amount, (int, float)) or seconds <= 0:
+        return None
+    return round(amount / seconds, 1)
+
+
+class RunStats:
+    """一次运行中收集的统计事件；传入 ``event_log`` 时每个事件追加一行 JSON。"""
+
+    def __init__(self, event_log: Path | None = None) -> None:
+        self.event_log = event_log
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.events: list[dict[str, Any]] = []
+        self._started = time.perf_counter()
+
+    def add(self, event: dict[str, Any]) -> None:
+        self.events.append(event)
+        if self.event_log is not None:
+            self.event_log.parent.mkdir(parents=True, exist_ok=True)
+            with self.event_log.open("a", encoding="utf-8") as target:
+                line = {"run_started_at": self.started_at, **event}
+                target.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+    def summary(self) -> dict[str, Any]:
+        """按函数名汇总，用于写入 ``data_metadata.json`` 的 ``run_stats``。"""
+        calls: dict[str, dict[str, Any]] = {}
+        for event in self.events:
+            total = calls.setdefault(
+                event["event"],
+                {"count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "bytes": 0, "lines": 0},
+            )
+            total["count"] += 1
+            total["wall_seconds"] += event["wall_seconds"]
+            total["cpu_seconds"] += event["cpu_seconds"]
+            total["bytes"] += event.get("bytes") or 0
+            total["lines"] += event.get("lines") or 0
+            total["peak_rss_bytes"] = event["peak_rss_bytes"]
+            total["peak_child_rss_bytes"] = event["peak_child_rss_bytes"]
+        for total in calls.values():
+            total["wall_seconds"] = round(total["wall_seconds"], 3)
+            total["cpu_seconds"] = round(total["cpu_seconds"], 3)
+            total["bytes_per_second"] = _rate(total["bytes"] or None, total["wall_seconds"])
+            total["lines_per_second"] = _rate(total["lines"] or None, total["wall_seconds"])
+        return {
+            "started_at": self.started_at,
+            "wall_seconds": round(time.perf_counter() - self._started, 3),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "peak_child_rss_bytes": peak_child_rss_bytes(),
+            "calls": calls,
+        }
+
+
+_recorder: ContextVar[RunStats | None] = ContextVar("_recorder", default=None)
+_event: ContextVar[dict[str, Any] | None] = ContextVar("_event", default=None)
+
+
+@contextmanager
+def recording(event_log: Path | None = None) -> Iterator[RunStats]:
+    """在该范围内调用的 ``@instrumented`` 函数都会记录到返回的 ``RunStats``。"""
+    stats = RunStats(event_log)
+    token = _recorder.set(stats)
+    try:
+        yield stats
+    finally:
+        _recorder.reset(token)
+
+
+def annotate(**fields: Any) -> None:
+    """给当前正在统计的调用补充字段，例如 ``bytes``、``lines``。"""
+    event = _event.get()
+    if event is not None:
+        event.update(fields)
+
+
+def instrumented(name: str | None = None) -> Callable[[_Function], _Function]:
+    def decorate(function: _Function) -> _Function:
+        event_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            stats = _recorder.get()
+            if stats is None:
+                return function(*args, **kwargs)
+            event: dict[str, Any] = {
+                "event": event_name,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+            }
+            token = _event.set(event)
+            wall = time.perf_counter()
+            cpu = _cpu_seconds()
+            try:
+                return function(*args, **kwargs)
+            except BaseException as exc:
+                event["error"] = type(exc).__name__
+                raise
+            finally:
+                _event.reset(token)
+                elapsed = time.perf_counter() - wall
+                event["wall_seconds"] = round(elapsed, 3)
+                event["cpu_seconds"] = round(_cpu_seconds() - cpu, 3)
+                event["peak_rss_bytes"] = peak_rss_bytes()
+                event["peak_child_rss_bytes"] = peak_child_rss_bytes()
+                event["bytes_per_second"] = _rate(event.get("bytes"), elapsed)
+                event["lines_per_second"] = _rate(event.get("lines"), elapsed)
+                stats.add(event)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
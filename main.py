@@ -9,30 +9,54 @@ from __future__ import annotations
 import argparse
 import subprocess
 from pathlib import Path
-from typing import Sequence
+from typing import Collection, Sequence
 
 import pandas as pd
 
+from archive_cache import ArchiveCache, open_subject_jsonl
 from config import (
     ANIME_CLEANED_FILE,
+    ARCHIVE_CACHE_MAX_BYTES,
     BANGUMI_APP_DATA_DIR,
+    BANGUMI_ARCHIVE_CACHE_DIR,
     BANGUMI_DUMP_DIR,
+    DATA_FILES,
     GAME_CLEANED_FILE,
+    HOME_SUMMARY_FILE,
     JSONL_FILE_NAME,
     PROJECT_ROOT,
 )
+from dataset_store import read_store, store_path
 from get_source import (
     DATE_COLUMN_NAME,
-    EXCEL_DATE_FORMAT,
-    apply_excel_date_format,
+    as_dataframe,
+    columnar_path,
+    columnar_source_sha256,
+    export_columnar,
     export_to_excel,
+    file_sha256,
     process_subject_data,
 )
+from home_summary import write_home_summary
+from instrumentation import annotate, instrumented, recording
+from ranking_data import load_from_dataframe, write_ranking_store
+from subject_index import index_path_for
 
 
 REQUIRED_COLUMNS = {"id", "name", "name_cn", "date", "score", "score_total", "rank"}
 
 
+def worker_count(value: str) -> int:
+    """argparse 类型：解析进程数必须是正整数。"""
+    try:
+        count = int(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"无效的进程数：{value}") from exc
+    if count < 1:
+        raise argparse.ArgumentTypeError("进程数至少为 1")
+    return count
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="从 Bangumi Archive 生成榜单 Excel")
     parser.add_argument(
@@ -52,6 +76,33 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="同时把生成文件写入归档目录",
     )
+    parser.add_argument(
+        "--workers",
+        type=worker_count,
+        default=1,
+        help="并行解析 subject.jsonlines 的进程数（默认 1，即串行）",
+    )
+    parser.add_argument(
+        "--paranoid-validate",
+        action="store_true",
+        help="写入后重新读取每个工作簿核对字段和行数，并重新计算缓存归档的校验和（较慢）",
+    )
+    parser.add_argument(
+        "--build-index",
+        action="store_true",
+        help="解析时顺带在归档旁生成按 ID 查询的字节偏移索引",
+    )
+    parser.add_argument(
+        "--archive-cache",
+        type=Path,
+        default=BANGUMI_ARCHIVE_CACHE_DIR,
+        help="归档目录中没有 subject.jsonlines 时，改用该缓存中最新的 zip 归档",
+    )
+    parser.add_argument(
+        "--event-log",
+        type=Path,
+        help="把解析、导出和校验的耗时、吞吐量和内存峰值追加到该 JSON Lines 文件",
+    )
     parser.add_argument(
         "--publish",
         action="store_true",
@@ -67,16 +118,25 @@ def build_parser() -> argparse.ArgumentParser:
     return parser
 
 
-def validate_workbook(path: Path) -> None:
-    """确认生成文件可读、非空且包含页面依赖的所有字段。"""
-    data = pd.read_excel(path, engine="openpyxl")
+def validate_frame(data: pd.DataFrame, name: str) -> None:
+    """确认待写入的数据非空且包含页面依赖的所有字段。"""
     missing = REQUIRED_COLUMNS - set(data.columns)
     if missing:
-        raise ValueError(f"{path.name} 缺少字段：{', '.join(sorted(missing))}")
+        raise ValueError(f"{name} 缺少字段：{', '.join(sorted(missing))}")
     if data.empty:
-        raise ValueError(f"{path.name} 没有数据行")
+        raise ValueError(f"{name} 没有数据行")
     if pd.to_datetime(data[DATE_COLUMN_NAME], errors="coerce").isna().all():
-        raise ValueError(f"{path.name} 的日期列全部无效")
+        raise ValueError(f"{name} 的日期列全部无效")
+
+
+@instrumented()
+def validate_workbook(path: Path, expected_rows: int | None = None) -> None:
+    """重新读取生成文件，确认可读且与内存中的数据行数一致。"""
+    data = pd.read_excel(path, engine="openpyxl")
+    annotate(lines=len(data), bytes=path.stat().st_size)
+    validate_frame(data, path.name)
+    if expected_rows is not None and len(data) != expected_rows:
+        raise ValueError(f"{path.name} 行数不一致：预期 {expected_rows}，实际 {len(data)}")
 
 
 def _run_git(arguments: Sequence[str]) -> subprocess.CompletedProcess[str]:
@@ -124,51 +184,146 @@ def publish_files(
     return True
 
 
-def generate_files(
-    dump_dir: Path, output_dir: Path, *, also_save_to_dump: bool = False
+def export_datasets(
+    anime_data,
+    game_data,
+    output_directories: Sequence[Path],
+    *,
+    paranoid_validate: bool = False,
+    skip: Collection[str] = (),
+    reused_dir: Path | None = None,
 ) -> list[Path]:
-    dump_dir = dump_dir.expanduser().resolve()
-    output_dir = output_dir.expanduser().resolve()
-    jsonl_path = dump_dir / JSONL_FILE_NAME
-    if not jsonl_path.is_file():
-        raise FileNotFoundError(f"未找到 {jsonl_path}")
+    """把解析结果写入每个输出目录，并在每个工作簿旁写入 Parquet 副本。
 
-    print(f"读取归档：{jsonl_path}")
-    anime_data, game_data = process_subject_data(jsonl_path)
+    写入前直接校验内存中的数据；只有 ``paranoid_validate`` 为真时才重新读取
+    生成的工作簿核对字段和行数。``skip`` 中的文件名只校验、不重写工作簿，首页
+    摘要记录的是它们在 ``reused_dir``（默认为各输出目录）中的现有工作簿；这些
+    工作簿的 Parquet 与内存映射副本缺失或过期时，按现有工作簿的校验值重新写入
+    输出目录。
+    """
     if anime_data is None or game_data is None:
         raise RuntimeError("归档读取失败")
-    if not anime_data or not game_data:
+    if len(anime_data) == 0 or len(game_data) == 0:
         raise ValueError("动画或游戏数据为空，已停止写入")
 
-    output_directories = [output_dir]
-    if also_save_to_dump and dump_dir != output_dir:
-        output_directories.append(dump_dir)
+    datasets = []
+    for records, file_name, sheet_name in (
+        (anime_data, ANIME_CLEANED_FILE, "Anime_Subjects"),
+        (game_data, GAME_CLEANED_FILE, "Game_Subjects"),
+    ):
+        frame = as_dataframe(records)
+        frame[DATE_COLUMN_NAME] = pd.to_datetime(frame[DATE_COLUMN_NAME], errors="coerce")
+        validate_frame(frame, file_name)
+        ranking = load_from_dataframe(frame, DATE_COLUMN_NAME)
+        datasets.append((frame, ranking, file_name, sheet_name))
+    categories = {file_name: category for category, file_name in DATA_FILES.items()}
 
     generated: list[Path] = []
     for directory in output_directories:
-        targets = (
-            (anime_data, directory / ANIME_CLEANED_FILE, "Anime_Subjects"),
-            (game_data, directory / GAME_CLEANED_FILE, "Game_Subjects"),
-        )
-        for records, path, sheet_name in targets:
-            if not export_to_excel(records, path, sheet_name):
+        directory.mkdir(parents=True, exist_ok=True)
+        existing_dir = reused_dir or directory
+        for frame, ranking, file_name, sheet_name in datasets:
+            path = directory / file_name
+            if file_name in skip:
+                existing = existing_dir / file_name
+                digest = file_sha256(existing)
+                if columnar_source_sha256(existing) != digest and export_columnar(
+                    frame, path, sha256=digest
+                ):
+                    generated.append(columnar_path(path))
+                if read_store(store_path(existing), digest) is None and write_ranking_store(
+                    ranking, DATE_COLUMN_NAME, path, sha256=digest
+                ):
+                    generated.append(store_path(path))
+                continue
+            if not export_to_excel(frame, path, sheet_name):
                 raise RuntimeError(f"写入失败：{path}")
-            if not apply_excel_date_format(path, DATE_COLUMN_NAME, EXCEL_DATE_FORMAT):
-                raise RuntimeError(f"日期格式化失败：{path}")
-            validate_workbook(path)
+            if paranoid_validate:
+                validate_workbook(path, expected_rows=len(frame))
+                print(f"[OK] 已重新读取并验证：{path}")
+            else:
+                print(f"[OK] 已写入：{path}")
             generated.append(path)
-            print(f"[OK] 已验证：{path}")
+            if export_columnar(frame, path):
+                generated.append(columnar_path(path))
+            if write_ranking_store(ranking, DATE_COLUMN_NAME, path):
+                generated.append(store_path(path))
+
+        workbooks = {
+            categories[file_name]: (existing_dir if file_name in skip else directory) / file_name
+            for _, _, file_name, _ in datasets
+        }
+        summary_path = directory / HOME_SUMMARY_FILE
+        try:
+            write_home_summary(
+                summary_path,
+                {categories[file_name]: ranking for _, ranking, file_name, _ in datasets},
+                workbooks,
+            )
+            generated.append(summary_path)
+        except OSError as exc:
+            print(f"[WARN] 无法写入首页摘要 {summary_path}：{exc}")
     return generated
 
 
+def generate_files(
+    dump_dir: Path,
+    output_dir: Path,
+    *,
+    also_save_to_dump: bool = False,
+    workers: int = 1,
+    paranoid_validate: bool = False,
+    build_index: bool = False,
+    archive_cache: ArchiveCache | None = None,
+) -> list[Path]:
+    """解析归档并写入榜单。
+
+    ``dump_dir`` 中没有 subject.jsonlines 时，如果传入了 ``archive_cache``，
+    改为从缓存中最新的 zip 归档流式解析，不访问网络。
+    """
+    dump_dir = dump_dir.expanduser().resolve()
+    output_dir = output_dir.expanduser().resolve()
+    jsonl_path = dump_dir / JSONL_FILE_NAME
+    if jsonl_path.is_file():
+        print(f"读取归档：{jsonl_path}")
+        anime_data, game_data = process_subject_data(
+            jsonl_path,
+            workers=workers,
+            index_path=index_path_for(jsonl_path) if build_index else None,
+        )
+    else:
+        archive_path = None
+        if archive_cache is not None:
+            archive_path = archive_cache.latest(verify=paranoid_validate)
+        if archive_path is None:
+            raise FileNotFoundError(f"未找到 {jsonl_path}")
+        print(f"未找到 {jsonl_path}，改用缓存归档：{archive_path}")
+        if build_index:
+            print("[WARN] 从 zip 归档解析时无法生成字节偏移索引，已跳过 --build-index")
+        with open_subject_jsonl(archive_path) as source:
+            anime_data, game_data = process_subject_data(source, workers=workers)
+
+    output_directories = [output_dir]
+    if also_save_to_dump and dump_dir != output_dir:
+        output_directories.append(dump_dir)
+    return export_datasets(
+        anime_data, game_data, output_directories, paranoid_validate=paranoid_validate
+    )
+
+
 def run(argv: Sequence[str] | None = None) -> int:
     args = build_parser().parse_args(argv)
     try:
-        generated = generate_files(
-            args.dump_dir,
-            args.output_dir,
-            also_save_to_dump=args.also_save_to_dump,
-        )
+        with recording(args.event_log):
+            generated = generate_files(
+                args.dump_dir,
+                args.output_dir,
+                also_save_to_dump=args.also_save_to_dump,
+                workers=args.workers,
+                paranoid_validate=args.paranoid_validate,
+                build_index=args.build_index,
+                archive_cache=ArchiveCache(args.archive_cache, ARCHIVE_CACHE_MAX_BYTES),
+            )
         if args.publish:
             primary_output = args.output_dir.expanduser().resolve()
             publish_files(
@@ -41,4 +41,10 @@ filtered = apply_sidebar_filters(
 )
 render_overview(original, filtered, DATE_COLUMN)
 render_insights(filtered, DATE_COLUMN)
-render_table(filtered, DATE_COLUMN, unit="部", download_name="bangumi_anime_filtered.csv")
+render_table(
+    filtered,
+    DATE_COLUMN,
+    unit="部",
+    download_name="bangumi_anime_filtered.csv",
+    key_prefix="anime_",
+)
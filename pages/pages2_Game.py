@@ -41,4 +41,10 @@ filtered = apply_sidebar_filters(
 )
 render_overview(original, filtered, DATE_COLUMN)
 render_insights(filtered, DATE_COLUMN)
-render_table(filtered, DATE_COLUMN, unit="款", download_name="bangumi_game_filtered.csv")
+render_table(
+    filtered,
+    DATE_COLUMN,
+    unit="款",
+    download_name="bangumi_game_filtered.csv",
+    key_prefix="game_",
+)
@@ -0,0 +1,500 @@
+"""榜单数据的规范化、预计算索引、内存映射副本读写和与界面无关的筛选。
+
+本模块不依赖 Streamlit，``main.py``、``update_data.py`` 和 ``benchmark.py``
+直接使用；``ranking_ui`` 在此基础上提供共享缓存和页面组件，并重新导出这里的
+公开名称。
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from pathlib import Path
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  Streamlit 本身依赖 pyarrow；只运行数据流程时可能没有
+except ImportError:
+    _STRING_DTYPE: object = object
+else:
+    _STRING_DTYPE = "string[pyarrow]"
+
+from dataset_store import decode_strings, encode_strings, store_path, write_store
+from get_source import file_sha256
+from ranking_index import (
+    INSIGHT_CUBE_ATTR,
+    NAME_INDEX_ATTR,
+    SORT_INDEX_ATTR,
+    TAG_INDEX_ATTR,
+    InsightCube,
+    NameIndex,
+    SortIndex,
+    TagIndex,
+    in_range,
+    tag_tokens,
+)
+
+
+REQUIRED_SOURCE_COLUMNS = {
+    "id",
+    "name",
+    "name_cn",
+    "date",
+    "score",
+    "score_total",
+    "rank",
+}
+
+NAME_CN = "中文名"
+NAME = "原名"
+SCORE = "评分"
+SCORE_TOTAL = "评分人数"
+RANK = "Bangumi排名"
+LINK = "Bangumi链接"
+SUBJECT_ID = "条目ID"
+TAGS = "标签"
+
+# filter_dataframe 在结果上记录的筛选条件：(范围条件, 名称搜索词, 标签)。
+FILTER_QUERY_ATTR = "filter_query"
+
+# 洞察聚合中数值列的分档宽度，与侧边栏评分滑块、评分人数输入框的步长一致。
+_INSIGHT_WIDTHS = {SCORE: 0.1, SCORE_TOTAL: 100}
+
+# 结果行数至少为全部数据的 1/_PRESORTED_MIN_SHARE 时使用预排序排列。
+_PRESORTED_MIN_SHARE = 8
+
+_BASE_RENAME = {
+    "name": NAME,
+    "name_cn": NAME_CN,
+    "score": SCORE,
+    "score_total": SCORE_TOTAL,
+    "rank": RANK,
+    "id": SUBJECT_ID,
+    "meta_tags": TAGS,
+}
+
+
+def _normalize_tags(values: pd.Series) -> pd.Categorical:
+    """只对去重后的标签字符串做拆分和清洗，再按编号映射回每一行。"""
+    codes, uniques = pd.factorize(values)
+    # 缺失值的编号 -1 取到末尾追加的空字符串。
+    normalized = [", ".join(tag_tokens(value)) for value in uniques] + [""]
+    # 相同的标签组合共用一个类别；类别按首次出现排序，热门标签的并列顺序不变。
+    recoded, categories = pd.factorize(np.asarray(normalized, dtype=object))
+    return pd.Categorical.from_codes(
+        recoded[codes], categories=pd.Index(categories, dtype=_STRING_DTYPE)
+    )
+
+
+def load_from_dataframe(df: pd.DataFrame, date_display_name: str) -> pd.DataFrame:
+    """校验并将归档 DataFrame 转换为榜单展示结构。
+
+    整数列保存为 int32、评分保存为 float32，名称和标签保存为分类类型（安装了
+    pyarrow 时类别是 Arrow 字符串）；链接不预先生成，展示或导出时由
+    ``with_links`` 根据条目 ID 补上。
+    """
+    missing = REQUIRED_SOURCE_COLUMNS - set(df.columns)
+    if missing:
+        missing_text = "、".join(sorted(missing))
+        raise ValueError(f"数据缺少必要列：{missing_text}")
+
+    source_columns = sorted(REQUIRED_SOURCE_COLUMNS)
+    if "meta_tags" in df.columns:
+        source_columns.append("meta_tags")
+    data = df[source_columns].copy()
+    data["name"] = data["name"].fillna("")
+    name_cn = data["name_cn"]
+    blank = name_cn.isna() | name_cn.astype("string").str.strip().eq("").fillna(False)
+    data["name_cn"] = name_cn.mask(blank, data["name"])
+    data["date"] = pd.to_datetime(data["date"], errors="coerce")
+    for column in ("id", "score", "score_total", "rank"):
+        data[column] = pd.to_numeric(data[column], errors="coerce")
+    data = data.dropna(subset=["date", "score", "score_total", "rank", "id"])
+
+    data["id"] = data["id"].astype("int32")
+    data["score"] = data["score"].astype("float32")
+    data["score_total"] = data["score_total"].clip(lower=0).astype("int32")
+    data["rank"] = data["rank"].astype("int32")
+
+    if "meta_tags" in data.columns:
+        data["meta_tags"] = _normalize_tags(data["meta_tags"])
+
+    # 两个名称列共用一组类别，名称搜索只需对去重后的名称建一次索引。
+    for column in ("name_cn", "name"):
+        data[column] = data[column].astype(_STRING_DTYPE)
+    names = pd.Categorical(pd.concat([data["name_cn"], data["name"]], ignore_index=True))
+    for column in ("name_cn", "name"):
+        data[column] = pd.Categorical(data[column], categories=names.categories)
+
+    rename = {**_BASE_RENAME, "date": date_display_name}
+    data = data.rename(columns=rename)
+    columns = [NAME_CN, NAME, date_display_name, SCORE, SCORE_TOTAL, RANK, SUBJECT_ID]
+    if TAGS in data.columns:
+        columns.append(TAGS)
+    result = data[columns].reset_index(drop=True)
+    tag_index = TagIndex(result[TAGS].cat.categories) if TAGS in result.columns else None
+    return _with_indexes(result, date_display_name, tag_index)
+
+
+def _with_indexes(
+    data: pd.DataFrame, date_display_name: str, tag_index: TagIndex | None
+) -> pd.DataFrame:
+    data.attrs[NAME_INDEX_ATTR] = NameIndex(data[NAME].cat.categories)
+    data.attrs[SORT_INDEX_ATTR] = SortIndex(data, (date_display_name, SCORE, SCORE_TOTAL, RANK))
+    if tag_index is not None:
+        data.attrs[TAG_INDEX_ATTR] = tag_index
+    data.attrs[INSIGHT_CUBE_ATTR] = InsightCube(
+        data,
+        date_display_name,
+        _INSIGHT_WIDTHS,
+        TAGS if tag_index is not None else None,
+        tag_index,
+    )
+    return data
+
+
+# 内存映射副本中的数值列：(DataFrame 列, 副本中的数组名)。
+_STORE_NUMBERS = (
+    (SCORE, "score"),
+    (SCORE_TOTAL, "score_total"),
+    (RANK, "rank"),
+    (SUBJECT_ID, "id"),
+)
+
+
+def write_ranking_store(
+    data: pd.DataFrame,
+    date_column: str,
+    workbook_path: str | Path,
+    *,
+    sha256: str | None = None,
+) -> bool:
+    """在工作簿旁写入内存映射副本，内容即 ``load_from_dataframe`` 的结果和标签索引。
+
+    ``data`` 是 ``load_from_dataframe`` 返回的榜单，``date_column`` 为其日期列名；
+    ``sha256`` 默认由 ``workbook_path`` 计算。副本只是加速读取的缓存；写入失败时
+    返回 False，不影响 xlsx。
+    """
+    workbook = Path(workbook_path)
+    path = store_path(workbook)
+    arrays: dict[str, np.ndarray] = {"date": data[date_column].to_numpy()}
+    for column, name in _STORE_NUMBERS:
+        arrays[name] = data[column].to_numpy()
+    arrays["names.offsets"], arrays["names.heap"] = encode_strings(data[NAME].cat.categories)
+    arrays["name_cn.codes"] = data[NAME_CN].cat.codes.to_numpy()
+    arrays["name.codes"] = data[NAME].cat.codes.to_numpy()
+    tag_index = _tag_index(data)
+    if tag_index is not None:
+        arrays["tags.offsets"], arrays["tags.heap"] = encode_strings(data[TAGS].cat.categories)
+        arrays["tags.codes"] = data[TAGS].cat.codes.to_numpy()
+        arrays["tag_vocabulary.offsets"], arrays["tag_vocabulary.heap"] = encode_strings(
+            tag_index.vocabulary
+        )
+        for name, array in tag_index.parts().items():
+            arrays[f"tag_index.{name}"] = array
+    try:
+        write_store(path, arrays, sha256 or file_sha256(workbook))
+        return True
+    except (OSError, ValueError) as exc:
+        print(f"[WARN] 无法写入内存映射副本 {path}：{exc}")
+        return False
+
+
+def _frame_from_store(arrays: dict[str, np.ndarray], date_display_name: str) -> pd.DataFrame:
+    """直接用映射上的数组组装 DataFrame，数值列和分类编号都不复制。"""
+    names = pd.CategoricalDtype(decode_strings(arrays["names.offsets"], arrays["names.heap"]))
+    columns: dict[str, object] = {
+        NAME_CN: pd.Categorical.from_codes(arrays["name_cn.codes"], dtype=names),
+        NAME: pd.Categorical.from_codes(arrays["name.codes"], dtype=names),
+        date_display_name: arrays["date"],
+    }
+    for column, name in _STORE_NUMBERS:
+        columns[column] = arrays[name]
+    tag_index = None
+    if "tags.codes" in arrays:
+        tags = pd.CategoricalDtype(decode_strings(arrays["tags.offsets"], arrays["tags.heap"]))
+        columns[TAGS] = pd.Categorical.from_codes(arrays["tags.codes"], dtype=tags)
+        vocabulary = decode_strings(
+            arrays["tag_vocabulary.offsets"], arrays["tag_vocabulary.heap"]
+        ).tolist()
+        parts = {
+            name.removeprefix("tag_index."): array
+            for name, array in arrays.items()
+            if name.startswith("tag_index.")
+        }
+        tag_index = TagIndex.from_parts(tags.categories, vocabulary, parts)
+    data = pd.DataFrame(columns, copy=False)
+    return _with_indexes(data, date_display_name, tag_index)
+
+
+def with_links(df: pd.DataFrame) -> pd.DataFrame:
+    """返回补上 Bangumi 链接列（紧跟条目 ID）的副本，用于展示和导出。"""
+    linked = df.copy()
+    if SUBJECT_ID in linked.columns and LINK not in linked.columns:
+        links = "https://bgm.tv/subject/" + linked[SUBJECT_ID].astype(str)
+        linked.insert(linked.columns.get_loc(SUBJECT_ID) + 1, LINK, links)
+    return linked
+
+
+def _attached_index(df: pd.DataFrame, attr: str, columns: Sequence[str]):
+    """返回与 ``columns`` 类别一致的预计算索引；手工构造的数据没有索引时返回 None。"""
+    index = df.attrs.get(attr)
+    if index is None or not all(
+        column in df.columns and index.matches(df[column]) for column in columns
+    ):
+        return None
+    return index
+
+
+def _tag_index(df: pd.DataFrame) -> TagIndex | None:
+    return _attached_index(df, TAG_INDEX_ATTR, (TAGS,))
+
+
+def tag_frequencies(df: pd.DataFrame) -> list[tuple[str, int]]:
+    """按出现次数从高到低返回 ``df`` 中的标签及作品数。"""
+    if TAGS not in df.columns:
+        return []
+    index = _tag_index(df)
+    if index is not None:
+        return index.frequencies(df[TAGS])
+    counts: dict[str, int] = {}
+    for value in df[TAGS]:
+        for tag in tag_tokens(value):
+            counts[tag] = counts.get(tag, 0) + 1
+    return sorted(counts.items(), key=lambda item: item[1], reverse=True)
+
+
+def available_tags(df: pd.DataFrame, limit: int = 80) -> list[str]:
+    """按出现频率返回可用于快捷筛选的标签。"""
+    return [tag for tag, _ in tag_frequencies(df)[:limit]]
+
+
+_Bound = tuple[str, object, object, bool]
+
+
+def _range_bounds(
+    *,
+    date_column: str,
+    start_date: date | pd.Timestamp | None,
+    end_date: date | pd.Timestamp | None,
+    score_range: tuple[float, float] | None,
+    minimum_votes: int,
+) -> list[_Bound]:
+    """把数值和日期条件整理为 ``(列, 下界, 上界, 是否包含上界)``，缺省的界为 None。"""
+    bounds: list[_Bound] = [(SCORE_TOTAL, minimum_votes, None, True)]
+    if start_date is not None or end_date is not None:
+        lower = None if start_date is None else pd.Timestamp(start_date).to_datetime64()
+        upper = None
+        if end_date is not None:
+            inclusive_end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+            upper = inclusive_end.to_datetime64()
+        bounds.append((date_column, lower, upper, False))
+    if score_range is not None:
+        bounds.append((SCORE, score_range[0], score_range[1], True))
+    return bounds
+
+
+def _as_column_type(bound: object, dtype: np.dtype) -> object:
+    """浮点界转换为列的精度，float32 列中的 8.1 才会等于界 8.1。"""
+    if bound is None or dtype.kind != "f":
+        return bound
+    return dtype.type(bound)
+
+
+def _typed_bounds(df: pd.DataFrame, bounds: list[_Bound]) -> list[_Bound]:
+    return [
+        (
+            column,
+            _as_column_type(lower, df[column].dtype),
+            _as_column_type(upper, df[column].dtype),
+            upper_inclusive,
+        )
+        for column, lower, upper, upper_inclusive in bounds
+    ]
+
+
+def _range_positions(df: pd.DataFrame, bounds: list[_Bound], index: SortIndex | None) -> np.ndarray:
+    """返回满足全部范围条件的行号（升序），``bounds`` 须已转换为列的类型。
+
+    有排序索引时，每个条件先在排好序的值上 ``searchsorted`` 得到一段行号，取最短
+    的一段作为候选，其余条件只在候选行上检查；否则逐列比较整列。
+    """
+    if index is None or not all(index.covers(df, column) for column, *_ in bounds):
+        mask = np.ones(len(df), dtype=bool)
+        for column, lower, upper, upper_inclusive in bounds:
+            mask &= in_range(df[column].to_numpy(), lower, upper, upper_inclusive)
+        return np.flatnonzero(mask)
+
+    matches = [
+        index.rows_in_range(column, lower, upper, upper_inclusive=upper_inclusive)
+        for column, lower, upper, upper_inclusive in bounds
+    ]
+    narrowest = min(range(len(bounds)), key=lambda item: len(matches[item]))
+    if len(matches[narrowest]) == len(df):
+        return np.arange(len(df))
+    positions = np.sort(matches[narrowest])
+    for item, (column, lower, upper, upper_inclusive) in enumerate(bounds):
+        if item != narrowest and len(matches[item]) < len(df):
+            values = df[column].to_numpy()[positions]
+            positions = positions[in_range(values, lower, upper, upper_inclusive)]
+    return positions
+
+
+def _name_matches(df: pd.DataFrame, positions: np.ndarray, query: str) -> np.ndarray:
+    """只在候选行上做不区分大小写、非正则的子串匹配。"""
+    index: NameIndex | None = _attached_index(df, NAME_INDEX_ATTR, (NAME_CN, NAME))
+    if index is not None:
+        table = index.lookup(query)
+        return table[df[NAME_CN].cat.codes.to_numpy()[positions]] | table[
+            df[NAME].cat.codes.to_numpy()[positions]
+        ]
+    matched = np.zeros(len(positions), dtype=bool)
+    for column in (NAME_CN, NAME):
+        names = df[column].iloc[positions].astype(str)
+        matched |= names.str.contains(query, case=False, na=False, regex=False).to_numpy()
+    return matched
+
+
+def filter_dataframe(
+    df: pd.DataFrame,
+    *,
+    date_column: str,
+    search_term: str = "",
+    start_date: date | pd.Timestamp | None = None,
+    end_date: date | pd.Timestamp | None = None,
+    score_range: tuple[float, float] | None = None,
+    minimum_votes: int = 0,
+    tags: Iterable[str] = (),
+    sort_by: str = SCORE,
+    ascending: bool = False,
+) -> pd.DataFrame:
+    """执行与 UI 无关的筛选，便于单元测试和后续 API 复用。
+
+    传入的 DataFrame 不会被复制或修改：先按数值和日期条件得到候选行号，名称
+    搜索和标签只在候选行上检查，最后按排好序的行号一次性取出结果。由
+    ``load_from_dataframe`` 加载的数据带有预计算索引：范围条件用二分查找，
+    名称和标签按类别编号查表，排序直接取预排序的排列。
+    """
+    if sort_by not in df.columns:
+        raise ValueError(f"无法按不存在的列排序：{sort_by}")
+
+    sort_index = df.attrs.get(SORT_INDEX_ATTR)
+    if not isinstance(sort_index, SortIndex):
+        sort_index = None
+    bounds = _typed_bounds(
+        df,
+        _range_bounds(
+            date_column=date_column,
+            start_date=start_date,
+            end_date=end_date,
+            score_range=score_range,
+            minimum_votes=minimum_votes,
+        ),
+    )
+    positions = _range_positions(df, bounds, sort_index)
+
+    query = search_term.strip()
+    if query and len(positions):
+        positions = positions[_name_matches(df, positions, query)]
+
+    selected_tags = {tag.strip() for tag in tags if tag.strip()} if TAGS in df.columns else set()
+    if selected_tags and len(positions):
+        row_tags = df[TAGS].iloc[positions]
+        index = _tag_index(df)
+        if index is not None:
+            keep = index.rows_with_all(row_tags, selected_tags)
+        else:
+            keep = np.asarray(
+                [selected_tags.issubset(tag_tokens(value)) for value in row_tags], dtype=bool
+            )
+        positions = positions[keep]
+
+    # 结果占比较大时，从预排序的排列中按掩码取出候选行比重新排序更快。
+    if (
+        sort_index is not None
+        and len(positions) * _PRESORTED_MIN_SHARE >= len(df)
+        and sort_index.covers(df, sort_by)
+    ):
+        order = sort_index.order(sort_by, ascending)
+        if len(positions) < len(df):
+            selected = np.zeros(len(df), dtype=bool)
+            selected[positions] = True
+            order = order[selected[order]]
+    else:
+        keys = df[sort_by].iloc[positions].reset_index(drop=True)
+        order = positions[keys.sort_values(ascending=ascending, kind="stable").index.to_numpy()]
+    result = df.take(order).reset_index(drop=True)
+    result.attrs[FILTER_QUERY_ATTR] = (bounds, query, frozenset(selected_tags))
+    return result
+
+
+def filter_key(
+    *,
+    date_column: str,
+    search_term: str = "",
+    start_date: date | pd.Timestamp | None = None,
+    end_date: date | pd.Timestamp | None = None,
+    score_range: tuple[float, float] | None = None,
+    minimum_votes: int = 0,
+    tags: Iterable[str] = (),
+    sort_by: str = SCORE,
+    ascending: bool = False,
+) -> tuple:
+    """把 ``filter_dataframe`` 的参数规范化为缓存键，结果相同的条件得到相同的键。"""
+    return (
+        date_column,
+        search_term.strip().upper(),
+        None if start_date is None else pd.Timestamp(start_date),
+        None if end_date is None else pd.Timestamp(end_date).normalize(),
+        None if score_range is None else tuple(float(value) for value in score_range),
+        int(minimum_votes),
+        frozenset(tag.strip() for tag in tags if tag.strip()),
+        sort_by,
+        bool(ascending),
+    )
+
+
+def _cube_counts(
+    df: pd.DataFrame, date_column: str
+) -> tuple[np.ndarray, np.ndarray, list[tuple[str, int]]] | None:
+    """由加载时构建的聚合数据汇总 ``df`` 的年份和标签计数；无法汇总时返回 None。"""
+    cube = df.attrs.get(INSIGHT_CUBE_ATTR)
+    if not isinstance(cube, InsightCube) or cube.date_column != date_column:
+        return None
+    if TAGS in df.columns and (cube.tag_index is None or not cube.tag_index.matches(df[TAGS])):
+        return None
+    # 没有记录筛选条件的是完整数据，相当于不设条件。
+    bounds, search_term, tags = df.attrs.get(FILTER_QUERY_ATTR, ([], "", frozenset()))
+    if search_term or tags:
+        return None
+    counts = cube.counts(bounds)
+    # 行数不一致说明 df 不是由这份数据按记录的条件筛选得到的，例如又手工取了子集。
+    if counts is None or counts[0].sum() != len(df):
+        return None
+    per_year, tag_counts = counts
+    return cube.years, per_year, tag_counts
+
+
+def insight_counts(
+    df: pd.DataFrame, date_column: str
+) -> tuple[pd.DataFrame, list[tuple[str, int]]]:
+    """返回 ``df`` 每年的作品数（``年份``、``作品数`` 两列）和标签频次。
+
+    完整数据以及只按日期、评分和评分人数筛选的结果直接由预聚合的
+    ``InsightCube`` 汇总，耗时与结果行数无关；含名称搜索、标签条件或条件切开了
+    某一档时，按结果的年份和标签编号 ``bincount``。
+    """
+    rolled = _cube_counts(df, date_column)
+    if rolled is not None:
+        years, per_year, tags = rolled
+    else:
+        values = df[date_column].dropna().to_numpy().astype("datetime64[Y]").astype(np.int64)
+        first = int(values.min()) if len(values) else 0
+        per_year = np.bincount(values - first)
+        years = np.arange(len(per_year)) + first + 1970
+        tags = tag_frequencies(df)
+    present = per_year > 0
+    yearly = pd.DataFrame({"年份": years[present], "作品数": per_year[present]})
+    return yearly, tags
@@ -0,0 +1,402 @@
+"""榜单筛选用的预计算索引。
+
+索引由 ``ranking_data.load_from_dataframe`` 构建一次，保存在 DataFrame 的
+``attrs`` 中，随 ``load_from_path`` 的缓存一起序列化。索引对象构建后不再
+修改；pandas 派生新 DataFrame 时会深拷贝 ``attrs``，因此 ``__deepcopy__``
+直接返回自身，筛选时不会复制索引。
+"""
+
+from __future__ import annotations
+
+import operator
+from typing import Any, Iterable, Mapping, Sequence
+import weakref
+
+import numpy as np
+import pandas as pd
+
+
+TAG_INDEX_ATTR = "tag_index"
+NAME_INDEX_ATTR = "name_index"
+SORT_INDEX_ATTR = "sort_index"
+INSIGHT_CUBE_ATTR = "insight_cube"
+
+
+def tag_tokens(value: object) -> list[str]:
+    if pd.isna(value):
+        return []
+    return [tag.strip() for tag in str(value).split(",") if tag.strip()]
+
+
+def _postings(keys: Sequence[int], codes: Sequence[int], key_count: int) -> tuple[np.ndarray, np.ndarray]:
+    """把 (键, 类别编号) 对整理为按键分组、组内有序的编号数组和每组的起止位置。"""
+    key_array = np.asarray(keys, dtype=np.int32)
+    code_array = np.asarray(codes, dtype=np.int32)
+    order = np.lexsort((code_array, key_array))
+    offsets = np.searchsorted(key_array[order], np.arange(key_count + 1, dtype=np.int32))
+    return code_array[order], offsets
+
+
+def in_range(values: np.ndarray, lower: Any, upper: Any, upper_inclusive: bool) -> np.ndarray:
+    """``lower <= values``，且 ``values <= upper``（或 ``< upper``）的掩码；None 表示不限。"""
+    mask = np.ones(len(values), dtype=bool)
+    if lower is not None:
+        mask &= values >= lower
+    if upper is not None:
+        mask &= (values <= upper) if upper_inclusive else (values < upper)
+    return mask
+
+
+def _intersect(arrays: Iterable[np.ndarray]) -> np.ndarray | None:
+    """有序数组求交，从最短的开始；没有数组时返回 None。"""
+    result = None
+    for codes in sorted(arrays, key=len):
+        result = codes if result is None else np.intersect1d(result, codes, True)
+        if len(result) == 0:
+            break
+    return result
+
+
+class _CategoryIndex:
+    """建立在分类列类别之上的索引。
+
+    索引只记录类别编号，不记录行号，所以对原始数据和筛选、重排后的任意子集都
+    适用：只要子集的类别与索引一致，就能用行的类别编号查表。
+    """
+
+    def __init__(self, categories: pd.Index) -> None:
+        self.categories = categories
+
+    def __deepcopy__(self, memo: dict) -> _CategoryIndex:
+        return self
+
+    def matches(self, column: pd.Series) -> bool:
+        """列是否使用与索引相同的类别。"""
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            return False
+        categories = column.cat.categories
+        return categories is self.categories or categories.equals(self.categories)
+
+
+class TagIndex(_CategoryIndex):
+    """“标签”列的倒排索引。
+
+    标签列以分类类型保存，每种不同的标签组合是一个类别。索引按标签记录它出现
+    在哪些类别中，筛选和统计时不必再逐行拆分字符串。
+    """
+
+    def __init__(self, categories: pd.Index) -> None:
+        super().__init__(categories)
+        ids: dict[str, int] = {}
+        pair_tags: list[int] = []
+        pair_codes: list[int] = []
+        for code, value in enumerate(categories.to_numpy(dtype=object)):
+            for tag in tag_tokens(value):
+                pair_tags.append(ids.setdefault(tag, len(ids)))
+                pair_codes.append(code)
+        self.vocabulary = list(ids)
+        self._ids = ids
+        self._pair_tags = np.asarray(pair_tags, dtype=np.int32)
+        self._pair_codes = np.asarray(pair_codes, dtype=np.int32)
+        self._codes_by_tag, self._offsets = _postings(pair_tags, pair_codes, len(ids))
+
+    @classmethod
+    def from_parts(
+        cls, categories: pd.Index, vocabulary: Sequence[str], arrays: Mapping[str, np.ndarray]
+    ) -> TagIndex:
+        """用 ``parts()`` 保存的数组重建索引，数组可以是内存映射上的只读视图。"""
+        index = cls.__new__(cls)
+        _CategoryIndex.__init__(index, categories)
+        index.vocabulary = list(vocabulary)
+        index._ids = {tag: tag_id for tag_id, tag in enumerate(index.vocabulary)}
+        for name in ("pair_tags", "pair_codes", "codes_by_tag", "offsets"):
+            setattr(index, f"_{name}", arrays[name])
+        return index
+
+    def parts(self) -> dict[str, np.ndarray]:
+        """索引的定长数组部分，用于写入 ``dataset_store``。"""
+        return {
+            "pair_tags": self._pair_tags,
+            "pair_codes": self._pair_codes,
+            "codes_by_tag": self._codes_by_tag,
+            "offsets": self._offsets,
+        }
+
+    def _categories_with(self, tag: str) -> np.ndarray:
+        tag_id = self._ids.get(tag)
+        if tag_id is None:
+            return self._codes_by_tag[:0]
+        return self._codes_by_tag[self._offsets[tag_id] : self._offsets[tag_id + 1]]
+
+    def rows_with_all(self, column: pd.Series, tags: Iterable[str]) -> np.ndarray:
+        """返回 ``column`` 中同时包含全部 ``tags`` 的行的布尔掩码。"""
+        allowed = _intersect(self._categories_with(tag) for tag in tags)
+        # 多留一格给缺失值的编号 -1，它总是不匹配。
+        lookup = np.zeros(len(self.categories) + 1, dtype=bool)
+        if allowed is not None:
+            lookup[allowed] = True
+        return lookup[column.cat.codes.to_numpy()]
+
+    def tag_pairs(self, codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """把类别编号展开为 ``(在 codes 中的位置, 标签编号)`` 对。"""
+        starts = np.searchsorted(self._pair_codes, codes, side="left")
+        lengths = np.searchsorted(self._pair_codes, codes, side="right") - starts
+        owners = np.repeat(np.arange(len(codes)), lengths)
+        within = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return owners, self._pair_tags[np.repeat(starts, lengths) + within]
+
+    def ranking(self, per_tag: np.ndarray) -> list[tuple[str, int]]:
+        """按次数从高到低列出标签编号计数；次数相同按在完整数据中首次出现的顺序。"""
+        order = np.argsort(-per_tag, kind="stable")
+        return [(self.vocabulary[tag], int(per_tag[tag])) for tag in order if per_tag[tag] > 0]
+
+    def frequencies(self, column: pd.Series) -> list[tuple[str, int]]:
+        """按出现次数从高到低返回 ``column`` 中的标签；次数相同按在完整数据中首次出现的顺序。"""
+        codes = column.cat.codes.to_numpy()
+        per_category = np.bincount(codes[codes >= 0], minlength=len(self.categories))
+        per_tag = np.bincount(
+            self._pair_tags,
+            weights=per_category[self._pair_codes],
+            minlength=len(self.vocabulary),
+        )
+        return self.ranking(per_tag)
+
+
+class NameIndex(_CategoryIndex):
+    """“中文名”“原名”两列共用的字符二元组（bigram）索引。
+
+    与 pandas 的 ``str.contains(case=False, regex=False)`` 一致，名称和查询词都
+    先转为大写再比较。包含查询词的名称一定包含查询词的全部二元组，因此先按
+    索引求交缩小候选，再逐个确认子串，结果与逐行扫描完全相同。不足两个字符的
+    查询词没有二元组，改为扫描去重后的名称。
+    """
+
+    def __init__(self, categories: pd.Index) -> None:
+        super().__init__(categories)
+        grams: list[str] = []
+        counts = np.zeros(len(categories), dtype=np.int64)
+        for code, value in enumerate(categories.to_numpy(dtype=object)):
+            name = str(value).upper()
+            unique = set(map(operator.add, name, name[1:]))
+            grams.extend(unique)
+            counts[code] = len(unique)
+        pair_grams, vocabulary = pd.factorize(np.asarray(grams, dtype=object))
+        pair_codes = np.repeat(np.arange(len(categories)), counts)
+        self._ids = {gram: gram_id for gram_id, gram in enumerate(vocabulary)}
+        self._codes_by_gram, self._offsets = _postings(pair_grams, pair_codes, len(vocabulary))
+
+    def _candidates(self, query: str) -> np.ndarray:
+        grams = {query[start : start + 2] for start in range(len(query) - 1)}
+        if not grams:
+            return np.arange(len(self.categories))
+        if any(gram not in self._ids for gram in grams):
+            return self._codes_by_gram[:0]
+        return _intersect(
+            self._codes_by_gram[self._offsets[gram_id] : self._offsets[gram_id + 1]]
+            for gram_id in map(self._ids.__getitem__, grams)
+        )
+
+    def lookup(self, query: str) -> np.ndarray:
+        """返回按类别编号查询的布尔表：名称包含 ``query`` 的类别为 True。
+
+        表比类别数多一格，对应缺失值的编号 -1，它总是不匹配。
+        """
+        upper = query.upper()
+        codes = self._candidates(upper)
+        names = self.categories.take(codes).to_numpy(dtype=object)
+        table = np.zeros(len(self.categories) + 1, dtype=bool)
+        table[codes[[upper in str(name).upper() for name in names]]] = True
+        return table
+
+
+def _stable_order(values: np.ndarray, ascending: bool) -> np.ndarray:
+    """与 ``sort_values(kind="stable")`` 相同的排列：降序时并列的行也保持原有顺序。"""
+    if ascending:
+        return np.argsort(values, kind="stable")
+    last = len(values) - 1
+    return (last - np.argsort(values[::-1], kind="stable"))[::-1]
+
+
+class SortIndex:
+    """按行号的预排序索引：每个可排序列的升序、降序稳定排列和排好序的值。
+
+    与类别索引不同，行号只对构建索引的那份数据有效。``covers`` 会先确认升序
+    排列仍是该列唯一的稳定排列（按它取出的值有序，并列的行号递增），之后才用于
+    排序和范围查询；同一个 DataFrame 对象每列只确认一次，之后假定它不会被原地
+    修改。含缺失值的列不建索引。
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Iterable[str]) -> None:
+        self.row_count = len(df)
+        self._ascending: dict[str, np.ndarray] = {}
+        self._descending: dict[str, np.ndarray] = {}
+        self._sorted: dict[str, np.ndarray] = {}
+        self._verified: dict[str, weakref.ref] = {}
+        for column in columns:
+            if column not in df.columns or df[column].isna().any():
+                continue
+            values = df[column].to_numpy()
+            ascending = _stable_order(values, True).astype(np.int32)
+            self._ascending[column] = ascending
+            self._descending[column] = _stable_order(values, False).astype(np.int32)
+            self._sorted[column] = values[ascending]
+
+    def __deepcopy__(self, memo: dict) -> SortIndex:
+        return self
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {**self.__dict__, "_verified": {}}
+
+    def covers(self, df: pd.DataFrame, column: str) -> bool:
+        """索引能否用于 ``df`` 的 ``column`` 列。"""
+        ascending = self._ascending.get(column)
+        if ascending is None or column not in df.columns or len(df) != self.row_count:
+            return False
+        verified = self._verified.get(column)
+        if verified is not None and verified() is df:
+            return True
+        expected = self._sorted[column]
+        ties = expected[1:] == expected[:-1]
+        if not (
+            np.array_equal(df[column].to_numpy()[ascending], expected)
+            and np.all(ascending[1:][ties] > ascending[:-1][ties])
+        ):
+            return False
+        self._verified[column] = weakref.ref(df)
+        return True
+
+    def order(self, column: str, ascending: bool) -> np.ndarray:
+        return self._ascending[column] if ascending else self._descending[column]
+
+    def rows_in_range(
+        self, column: str, lower: Any = None, upper: Any = None, *, upper_inclusive: bool = True
+    ) -> np.ndarray:
+        """返回值不小于 ``lower``、不大于（或小于）``upper`` 的行号，按该列升序排列。"""
+        expected = self._sorted[column]
+        start = 0 if lower is None else int(np.searchsorted(expected, lower, side="left"))
+        stop = (
+            len(expected)
+            if upper is None
+            else int(np.searchsorted(expected, upper, side="right" if upper_inclusive else "left"))
+        )
+        return self._ascending[column][start:max(start, stop)]
+
+
+class InsightCube:
+    """年份 × 各数值列分档的预聚合计数，用于“数据洞察”图表。
+
+    每一行按日期所在年份和各数值列的分档落入一个格子，构建时记录每个格子的
+    作品数和其中各标签的作品数，以及每一档取值的最小值和最大值。范围条件只要
+    不切开任何一档（档内最小值和最大值同时满足或同时不满足），按格子汇总就与
+    逐行统计完全相同，耗时只取决于格子数；否则 ``counts`` 返回 None。与
+    ``SortIndex`` 不同，格子只有计数、没有行号。
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        date_column: str,
+        widths: Mapping[str, float],
+        tag_column: str | None = None,
+        tag_index: TagIndex | None = None,
+    ) -> None:
+        self.date_column = date_column
+        self.row_count = len(df)
+        self.tag_index = tag_index if tag_column is not None else None
+        dates = df[date_column].to_numpy()
+        axes = [(date_column, dates.astype("datetime64[Y]").astype(np.int64), dates)]
+        for column, width in widths.items():
+            values = df[column].to_numpy()
+            # 先舍入再取整，float32 的 8.7 / 0.1 = 86.99999… 仍落在第 87 档。
+            keys = np.floor(np.round(values.astype(np.float64) / width, 4)).astype(np.int64)
+            axes.append((column, keys, values))
+
+        self._ranges: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        sizes: dict[str, int] = {}
+        cell_keys = np.zeros(len(df), dtype=np.int64)
+        for column, keys, values in axes:
+            labels, codes = np.unique(keys, return_inverse=True)
+            order = np.argsort(codes, kind="stable")
+            starts = np.searchsorted(codes[order], np.arange(len(labels)))
+            ordered = values[order]
+            self._ranges[column] = (
+                np.minimum.reduceat(ordered, starts),
+                np.maximum.reduceat(ordered, starts),
+            )
+            sizes[column] = len(labels)
+            cell_keys = cell_keys * len(labels) + codes
+            if column == date_column:
+                self.years = (labels + 1970).astype(np.int32)
+
+        cells, cell_of_row, counts = np.unique(cell_keys, return_inverse=True, return_counts=True)
+        self._cell_counts = counts
+        self._cell_codes: dict[str, np.ndarray] = {}
+        for column in reversed(list(sizes)):
+            cells, self._cell_codes[column] = np.divmod(cells, sizes[column])
+
+        if self.tag_index is not None:
+            codes = df[tag_column].cat.codes.to_numpy().astype(np.int64)
+            known = codes >= 0
+            category_count = max(len(tag_index.categories), 1)
+            pairs, pair_counts = np.unique(
+                cell_of_row[known] * category_count + codes[known], return_counts=True
+            )
+            pair_cells, pair_codes = np.divmod(pairs, category_count)
+            owners, tags = tag_index.tag_pairs(pair_codes)
+            tag_count = max(len(tag_index.vocabulary), 1)
+            keys, inverse = np.unique(pair_cells[owners] * tag_count + tags, return_inverse=True)
+            self._tag_cells, self._tag_ids = np.divmod(keys, tag_count)
+            self._tag_counts = np.bincount(
+                inverse, weights=pair_counts[owners], minlength=len(keys)
+            ).astype(np.int64)
+
+    def __deepcopy__(self, memo: dict) -> InsightCube:
+        return self
+
+    def _selected_cells(self, bounds: Iterable[tuple[str, Any, Any, bool]]) -> np.ndarray | None:
+        selected = np.ones(len(self._cell_counts), dtype=bool)
+        for column, lower, upper, upper_inclusive in bounds:
+            if lower is None and upper is None:
+                continue
+            if column not in self._ranges:
+                return None
+            low, high = self._ranges[column]
+            inside = in_range(low, lower, upper, upper_inclusive) & in_range(
+                high, lower, upper, upper_inclusive
+            )
+            outside = np.zeros(len(low), dtype=bool)
+            if lower is not None:
+                outside |= high < lower
+            if upper is not None:
+                outside |= (low > upper) if upper_inclusive else (low >= upper)
+            if not np.all(inside | outside):
+                return None
+            selected &= inside[self._cell_codes[column]]
+        return selected
+
+    def counts(
+        self, bounds: Iterable[tuple[str, Any, Any, bool]]
+    ) -> tuple[np.ndarray, list[tuple[str, int]]] | None:
+        """按 ``(列, 下界, 上界, 是否包含上界)`` 条件汇总每年的作品数和标签频次。
+
+        界须已转换为列的类型。条件涉及未分档的列或切开了某一档时返回 None。
+        """
+        selected = self._selected_cells(bounds)
+        if selected is None:
+            return None
+        per_year = np.bincount(
+            self._cell_codes[self.date_column][selected],
+            weights=self._cell_counts[selected],
+            minlength=len(self.years),
+        ).astype(np.int64)
+        tags: list[tuple[str, int]] = []
+        if self.tag_index is not None:
+            chosen = selected[self._tag_cells]
+            tags = self.tag_index.ranking(
+                np.bincount(
+                    self._tag_ids[chosen],
+                    weights=self._tag_counts[chosen],
+                    minlength=len(self.tag_index.vocabulary),
+                )
+            )
+        return per_year, tags
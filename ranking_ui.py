@@ -1,142 +1,142 @@
-"""动画与游戏榜单共用的数据处理和 Streamlit 界面组件。"""
+"""动画与游戏榜单共用的 Streamlit 界面组件。
+
+数据规范化、索引和筛选逻辑在不依赖 Streamlit 的 ``ranking_data`` 中，这里
+重新导出其公开名称，页面只需从本模块导入。
+"""
 
 from __future__ import annotations
 
-from collections import Counter
-from datetime import date
+from functools import partial
+import io
 from pathlib import Path
-from typing import Iterable, Sequence
+from typing import Callable, Hashable, Iterator, Sequence
+import weakref
 
 import pandas as pd
 import streamlit as st
 
-
-REQUIRED_SOURCE_COLUMNS = {
-    "id",
-    "name",
-    "name_cn",
-    "date",
-    "score",
-    "score_total",
-    "rank",
+from config import DATA_METADATA_FILE, FILTER_CACHE_MAX_BYTES
+from dataset_handle import SharedDataset
+from dataset_store import read_store, store_path
+from filter_cache import FilterCache
+from get_source import EXCEL_DATE_FORMAT, columnar_path, read_columnar
+from ranking_data import (  # noqa: F401  重新导出供页面和测试使用
+    FILTER_QUERY_ATTR,
+    LINK,
+    NAME,
+    NAME_CN,
+    RANK,
+    REQUIRED_SOURCE_COLUMNS,
+    SCORE,
+    SCORE_TOTAL,
+    SUBJECT_ID,
+    TAGS,
+    _frame_from_store,
+    available_tags,
+    filter_dataframe,
+    filter_key,
+    insight_counts,
+    load_from_dataframe,
+    tag_frequencies,
+    with_links,
+    write_ranking_store,
+)
+
+
+# load_from_path 记录的数据版本：(文件绝对路径, 工作簿 SHA-256)。
+DATASET_VERSION_ATTR = "dataset_version"
+
+# cached_filter_dataframe 在结果上记录的 ResultKey，用于按查询缓存导出文件。
+RESULT_KEY_ATTR = "result_key"
+
+PAGE_SIZES = (50, 100, 200, 500)
+DEFAULT_PAGE_SIZE = 100
+
+# 导出格式：扩展名 -> (按钮上的名称, MIME 类型)。
+EXPORT_FORMATS = {
+    "csv": ("CSV", "text/csv"),
+    "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "jsonl": ("JSON Lines", "application/jsonl"),
 }
+_EXPORT_CHUNK_ROWS = 20_000
 
-NAME_CN = "中文名"
-NAME = "原名"
-SCORE = "评分"
-SCORE_TOTAL = "评分人数"
-RANK = "Bangumi排名"
-LINK = "Bangumi链接"
-TAGS = "标签"
-
-_BASE_RENAME = {
-    "name": NAME,
-    "name_cn": NAME_CN,
-    "score": SCORE,
-    "score_total": SCORE_TOTAL,
-    "rank": RANK,
-    "meta_tags": TAGS,
-}
 
+def _read_dataset(path: Path, date_display_name: str, sha256: str) -> pd.DataFrame:
+    """读取内容与 ``sha256`` 一致的数据：依次尝试内存映射副本、Parquet 副本和 xlsx。"""
+    arrays = read_store(store_path(path), sha256)
+    if arrays is not None:
+        data = _frame_from_store(arrays, date_display_name)
+    else:
+        source = read_columnar(path)
+        if source is None:
+            source = pd.read_excel(path, engine="openpyxl")
+        data = load_from_dataframe(source, date_display_name)
+    data.attrs[DATASET_VERSION_ATTR] = (str(path), sha256)
+    return data
 
-def _tag_tokens(value: object) -> list[str]:
-    if pd.isna(value):
-        return []
-    return [tag.strip() for tag in str(value).split(",") if tag.strip()]
 
+@st.cache_resource(show_spinner="正在读取榜单数据…", max_entries=8)
+def _shared_dataset(file_path: str, date_display_name: str) -> SharedDataset[pd.DataFrame]:
+    path = Path(file_path)
+    return SharedDataset(
+        path,
+        partial(_read_dataset, path, date_display_name),
+        sidecars=(store_path(path), columnar_path(path)),
+        triggers=(path.parent / DATA_METADATA_FILE,),
+    )
 
-def load_from_dataframe(df: pd.DataFrame, date_display_name: str) -> pd.DataFrame:
-    """校验并将归档 DataFrame 转换为榜单展示结构。"""
-    missing = REQUIRED_SOURCE_COLUMNS - set(df.columns)
-    if missing:
-        missing_text = "、".join(sorted(missing))
-        raise ValueError(f"数据缺少必要列：{missing_text}")
 
-    data = df.copy()
-    data["name_cn"] = data["name_cn"].fillna(data["name"])
-    data["name_cn"] = data["name_cn"].replace(r"^\s*$", pd.NA, regex=True).fillna(data["name"])
-    data["date"] = pd.to_datetime(data["date"], errors="coerce")
-    data["id"] = pd.to_numeric(data["id"], errors="coerce")
-    data["score"] = pd.to_numeric(data["score"], errors="coerce")
-    data["score_total"] = pd.to_numeric(data["score_total"], errors="coerce")
-    data["rank"] = pd.to_numeric(data["rank"], errors="coerce")
-    data = data.dropna(subset=["date", "score", "score_total", "rank", "id"])
+def load_from_path(file_path: str, date_display_name: str) -> pd.DataFrame:
+    """加载并规范化榜单数据。
 
-    data["score_total"] = data["score_total"].clip(lower=0).astype("int64")
-    data["rank"] = data["rank"].astype("int64")
-    data[LINK] = data["id"].map(lambda item: f"https://bgm.tv/subject/{int(item)}")
+    数据由所有会话共享且不按次复制，调用方不得原地修改；有内存映射副本时还是
+    映射上的只读视图。工作簿、副本或 ``data_metadata.json`` 变化后在后台重新
+    加载，完成前继续返回旧数据。
+    """
+    return _shared_dataset(str(Path(file_path).resolve()), date_display_name).get()
 
-    if "meta_tags" in data.columns:
-        data["meta_tags"] = data["meta_tags"].map(lambda value: ", ".join(_tag_tokens(value)))
 
-    rename = {**_BASE_RENAME, "date": date_display_name}
-    data = data.rename(columns=rename)
-    columns = [NAME_CN, NAME, date_display_name, SCORE, SCORE_TOTAL, RANK, LINK]
-    if TAGS in data.columns:
-        columns.append(TAGS)
-    return data[columns].reset_index(drop=True)
+@st.cache_resource
+def shared_filter_cache() -> FilterCache:
+    """所有会话共用的筛选结果缓存。"""
+    return FilterCache(FILTER_CACHE_MAX_BYTES)
 
 
-@st.cache_data(show_spinner="正在读取榜单数据…")
-def load_from_path(file_path: str, date_display_name: str) -> pd.DataFrame:
-    """从 Excel 文件加载并规范化榜单数据。"""
-    source = pd.read_excel(file_path, engine="openpyxl")
-    return load_from_dataframe(source, date_display_name)
+class ResultKey:
+    """筛选结果对应的 (数据版本, 查询)，只对记录它的那个 DataFrame 对象有效。
 
+    pandas 派生新 DataFrame 时会复制 ``attrs``，``describes`` 据此排除派生出的
+    子集或重排，避免把它们的导出文件当成原结果的缓存。
+    """
 
-def available_tags(df: pd.DataFrame, limit: int = 80) -> list[str]:
-    """按出现频率返回可用于快捷筛选的标签。"""
-    if TAGS not in df.columns:
-        return []
-    counter = Counter(tag for value in df[TAGS] for tag in _tag_tokens(value))
-    return [tag for tag, _ in counter.most_common(limit)]
+    def __init__(self, frame: pd.DataFrame, version: Hashable, query: Hashable) -> None:
+        self.version = version
+        self.query = query
+        self._frame: weakref.ref | None = weakref.ref(frame)
 
+    def __deepcopy__(self, memo: dict) -> ResultKey:
+        return self
 
-def filter_dataframe(
-    df: pd.DataFrame,
-    *,
-    date_column: str,
-    search_term: str = "",
-    start_date: date | pd.Timestamp | None = None,
-    end_date: date | pd.Timestamp | None = None,
-    score_range: tuple[float, float] | None = None,
-    minimum_votes: int = 0,
-    tags: Iterable[str] = (),
-    sort_by: str = SCORE,
-    ascending: bool = False,
-) -> pd.DataFrame:
-    """执行与 UI 无关的筛选，便于单元测试和后续 API 复用。"""
-    result = df.copy()
+    def __getstate__(self) -> dict:
+        return {**self.__dict__, "_frame": None}
 
-    query = search_term.strip()
-    if query:
-        name_mask = result[NAME_CN].astype(str).str.contains(
-            query, case=False, na=False, regex=False
-        )
-        original_name_mask = result[NAME].astype(str).str.contains(
-            query, case=False, na=False, regex=False
-        )
-        result = result[name_mask | original_name_mask]
+    def describes(self, frame: pd.DataFrame) -> bool:
+        return self._frame is not None and self._frame() is frame
 
-    if start_date is not None:
-        result = result[result[date_column] >= pd.Timestamp(start_date)]
-    if end_date is not None:
-        inclusive_end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
-        result = result[result[date_column] < inclusive_end]
 
-    if score_range is not None:
-        result = result[result[SCORE].between(*score_range, inclusive="both")]
-    result = result[result[SCORE_TOTAL] >= minimum_votes]
+def cached_filter_dataframe(df: pd.DataFrame, **filters) -> pd.DataFrame:
+    """经由共享缓存执行 ``filter_dataframe``；上传等没有数据版本的数据不缓存。"""
+    version = df.attrs.get(DATASET_VERSION_ATTR)
+    if version is None:
+        return filter_dataframe(df, **filters)
+    query = filter_key(**filters)
 
-    selected_tags = {tag.strip() for tag in tags if tag.strip()}
-    if selected_tags and TAGS in result.columns:
-        result = result[
-            result[TAGS].map(lambda value: selected_tags.issubset(set(_tag_tokens(value))))
-        ]
+    def compute() -> pd.DataFrame:
+        result = filter_dataframe(df, **filters)
+        result.attrs[RESULT_KEY_ATTR] = ResultKey(result, version, query)
+        return result
 
-    if sort_by not in result.columns:
-        raise ValueError(f"无法按不存在的列排序：{sort_by}")
-    return result.sort_values(sort_by, ascending=ascending, kind="stable").reset_index(drop=True)
+    return shared_filter_cache().get_or_compute(version, query, compute)
 
 
 def apply_sidebar_filters(
@@ -167,8 +167,9 @@ def apply_sidebar_filters(
     else:
         start_date = end_date = selected_dates
 
-    minimum_score = float(df_original[SCORE].min())
-    maximum_score = float(df_original[SCORE].max())
+    # 评分列是 float32，取整到一位小数，滑块步进才能与 1.3 这样的分值对齐。
+    minimum_score = round(float(df_original[SCORE].min()), 1)
+    maximum_score = round(float(df_original[SCORE].max()), 1)
     score_range = st.sidebar.slider(
         "评分范围",
         minimum_score,
@@ -177,6 +178,7 @@ def apply_sidebar_filters(
         step=0.1,
         key=f"{k}score",
     )
+    score_range = tuple(round(value, 1) for value in score_range)
     minimum_votes = st.sidebar.number_input(
         "最少评分人数",
         min_value=0,
@@ -207,7 +209,7 @@ def apply_sidebar_filters(
         == "升序"
     )
 
-    return filter_dataframe(
+    return cached_filter_dataframe(
         df_original,
         date_column=date_column,
         search_term=search_term,
@@ -254,20 +256,11 @@ def render_insights(df_filtered: pd.DataFrame, date_column: str) -> None:
 
     with st.expander("数据洞察", expanded=False):
         left, right = st.columns(2)
-        yearly = (
-            df_filtered.assign(年份=df_filtered[date_column].dt.year)
-            .groupby("年份", as_index=False)
-            .size()
-            .rename(columns={"size": "作品数"})
-            .tail(50)
-        )
+        yearly, tags = insight_counts(df_filtered, date_column)
         left.caption("近 50 个有数据年份的作品数量")
-        left.bar_chart(yearly, x="年份", y="作品数", width="stretch", height=300)
+        left.bar_chart(yearly.tail(50), x="年份", y="作品数", width="stretch", height=300)
 
-        tag_counter = Counter(
-            tag for value in df_filtered.get(TAGS, pd.Series(dtype=str)) for tag in _tag_tokens(value)
-        )
-        tag_data = pd.DataFrame(tag_counter.most_common(12), columns=["标签", "作品数"])
+        tag_data = pd.DataFrame(tags[:12], columns=["标签", "作品数"])
         right.caption("当前结果中的热门标签")
         if tag_data.empty:
             right.info("当前数据没有标签信息。")
@@ -275,24 +268,121 @@ def render_insights(df_filtered: pd.DataFrame, date_column: str) -> None:
             right.bar_chart(tag_data, x="标签", y="作品数", width="stretch", height=300)
 
 
+def table_page(df_sorted: pd.DataFrame, date_column: str, start: int, size: int) -> pd.DataFrame:
+    """取出排好序的结果中从 ``start`` 起的 ``size`` 行，只为这些行生成链接和日期文本。"""
+    page = with_links(df_sorted.iloc[start : start + size])
+    page[date_column] = page[date_column].dt.strftime("%Y-%m-%d")
+    # 索引对象无法序列化，发送给浏览器前去掉。
+    page.attrs = {}
+    return page
+
+
+def _export_chunks(df: pd.DataFrame, date_column: str, text_dates: bool) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), _EXPORT_CHUNK_ROWS):
+        chunk = with_links(df.iloc[start : start + _EXPORT_CHUNK_ROWS])
+        # float32 评分在 xlsx 和 JSON 中会写成 8.399999618530273，先还原为一位小数。
+        chunk[SCORE] = chunk[SCORE].astype("float64").round(1)
+        if text_dates:
+            chunk[date_column] = chunk[date_column].dt.strftime("%Y-%m-%d")
+        yield chunk
+
+
+def export_bytes(df: pd.DataFrame, date_column: str, file_format: str) -> bytes:
+    """把结果导出为 ``EXPORT_FORMATS`` 中的格式，包含链接列。
+
+    按块生成，每次只为一块行补链接和格式化日期：CSV（带 BOM，便于 Excel 识别
+    UTF-8）和 JSON Lines 的日期为 ``YYYY-MM-DD`` 文本，xlsx 逐块写入真正的日期。
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式：{file_format}")
+    buffer = io.BytesIO()
+    if file_format == "xlsx":
+        with pd.ExcelWriter(
+            buffer,
+            engine="xlsxwriter",
+            datetime_format=EXCEL_DATE_FORMAT,
+            date_format=EXCEL_DATE_FORMAT,
+            # 每个工作表最多 65,530 个超链接，链接统一按文本写入。
+            engine_kwargs={"options": {"strings_to_urls": False}},
+        ) as writer:
+            row = 0
+            for chunk in _export_chunks(df, date_column, text_dates=False):
+                chunk.to_excel(
+                    writer, sheet_name="Ranking", index=False, header=row == 0, startrow=row
+                )
+                row += len(chunk) + (row == 0)
+            if row == 0:
+                with_links(df).to_excel(writer, sheet_name="Ranking", index=False)
+        return buffer.getvalue()
+
+    text = io.TextIOWrapper(buffer, encoding="utf-8-sig" if file_format == "csv" else "utf-8")
+    header = True
+    for chunk in _export_chunks(df, date_column, text_dates=True):
+        if file_format == "csv":
+            chunk.to_csv(text, index=False, header=header, lineterminator="\n")
+        else:
+            records = chunk.to_json(orient="records", lines=True, force_ascii=False)
+            # pandas 总是把 "/" 转义为 "\/"，还原后链接可直接阅读，解析结果不变。
+            text.write(records.replace("\\/", "/"))
+        header = False
+    if header and file_format == "csv":
+        with_links(df).to_csv(text, index=False, lineterminator="\n")
+    text.flush()
+    return buffer.getvalue()
+
+
+def _lazy_export(df: pd.DataFrame, date_column: str, file_format: str) -> Callable[[], bytes]:
+    """返回点击下载时才生成文件的函数；``cached_filter_dataframe`` 的结果按查询缓存文件。"""
+    result_key = df.attrs.get(RESULT_KEY_ATTR)
+    if not isinstance(result_key, ResultKey) or not result_key.describes(df):
+        return partial(export_bytes, df, date_column, file_format)
+    # 下载回调在另一个线程中执行，缓存对象需要在脚本线程中先取出。
+    cache = shared_filter_cache()
+    return partial(
+        cache.get_or_compute,
+        result_key.version,
+        ("export", file_format, result_key.query),
+        partial(export_bytes, df, date_column, file_format),
+    )
+
+
 def render_table(
     df_sorted: pd.DataFrame,
     date_column: str,
     unit: str = "部",
     download_name: str = "bangumi_ranking.csv",
+    key_prefix: str = "",
 ) -> None:
-    """展示筛选结果，并提供 CSV 下载。"""
+    """分页展示筛选结果，并提供 CSV、Excel 和 JSON Lines 下载。
+
+    只有当前页的行会格式化并发送到浏览器；下载文件在点击时才生成。同一页面
+    渲染多个表格时用不同的 ``key_prefix`` 区分控件状态。
+    """
+    k = key_prefix
     if df_sorted.empty:
         st.info("没有符合当前条件的作品，请放宽筛选条件。")
         return
 
     display_columns = [RANK, NAME_CN, NAME, date_column, SCORE, SCORE_TOTAL, TAGS, LINK]
-    display = df_sorted.copy()
-    display[date_column] = display[date_column].dt.strftime("%Y-%m-%d")
+    st.subheader(f"筛选结果（{len(df_sorted):,} {unit}）")
+    left, right, _ = st.columns([1, 1, 3])
+    page_size = left.selectbox(
+        "每页行数",
+        PAGE_SIZES,
+        index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE),
+        key=f"{k}page_size",
+    )
+    page_count = -(-len(df_sorted) // page_size)
+    page_number = int(
+        right.number_input(
+            "页码", min_value=1, max_value=page_count, value=1, step=1, key=f"{k}page"
+        )
+    )
+    start = (page_number - 1) * page_size
+    page = table_page(df_sorted, date_column, start, page_size)
 
-    st.subheader(f"筛选结果（{len(display):,} {unit}）")
     st.dataframe(
-        display[[column for column in display_columns if column in display.columns]],
+        page[[column for column in display_columns if column in page.columns]],
         column_config={
             LINK: st.column_config.LinkColumn("链接", display_text="打开 Bangumi"),
             SCORE: st.column_config.NumberColumn(SCORE, format="%.1f"),
@@ -300,14 +390,20 @@ def render_table(
         },
         hide_index=True,
         width="stretch",
-        height=620,
-    )
-    st.download_button(
-        "下载当前结果（CSV）",
-        data=display.to_csv(index=False).encode("utf-8-sig"),
-        file_name=download_name,
-        mime="text/csv",
+        height=min(620, 38 + 35 * len(page)),
     )
+    st.caption(f"第 {start + 1:,}–{start + len(page):,} 行，共 {page_count:,} 页")
+
+    stem = Path(download_name).stem
+    buttons = st.columns(len(EXPORT_FORMATS))
+    for column, (file_format, (label, mime)) in zip(buttons, EXPORT_FORMATS.items()):
+        column.download_button(
+            f"下载当前结果（{label}）",
+            data=_lazy_export(df_sorted, date_column, file_format),
+            file_name=f"{stem}.{file_format}",
+            mime=mime,
+            key=f"{k}download_{file_format}",
+        )
 
 
 def load_data_or_upload(
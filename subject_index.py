@@ -0,0 +1,178 @@
+"""subject.jsonlines 的字节偏移索引：按条目 ID 直接定位原始行。
+
+索引在 ``process_subject_data`` 解析归档时顺带生成，保存在归档旁的
+``subject.jsonlines.idx.npy``；查询时以只读内存映射打开，二分定位后直接
+``seek`` 到对应行，无需线性扫描整个文件。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import re
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+
+from config import BANGUMI_DUMP_DIR, JSONL_FILE_NAME
+
+
+INDEX_SUFFIX = ".idx.npy"
+INDEX_DTYPE = np.dtype([("id", "<i8"), ("offset", "<i8"), ("length", "<i8")])
+UTF8_BOM = b"\xef\xbb\xbf"
+
+_ID_FIELD = re.compile(rb'"id"[ \t\r\n]*:[ \t\r\n]*(\d+)[ \t\r\n]*[,}]')
+
+
+def index_path_for(jsonl_path: str | Path) -> Path:
+    path = Path(jsonl_path)
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def line_subject_id(line: bytes, subject: Any = None) -> int | None:
+    """取出一行的条目 ID；``"id"`` 只出现一次时直接匹配字节，否则回退到 JSON 解析。"""
+    if line.count(b'"id"') == 1:
+        match = _ID_FIELD.search(line)
+        if match is not None:
+            return int(match.group(1))
+    if subject is None:
+        try:
+            subject = json.loads(line.removeprefix(UTF8_BOM))
+        except (json.JSONDecodeError, UnicodeError):
+            return None
+    value = subject.get("id") if isinstance(subject, dict) else None
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def write_index(
+    ids: Sequence[int], offsets: Sequence[int], lengths: Sequence[int], path: str | Path
+) -> Path:
+    """按 ID 排序后原子写入索引；重复 ID 保留文件中最后出现的一行。"""
+    path = Path(path)
+    entries = np.empty(0, dtype=INDEX_DTYPE)
+    id_array = np.asarray(ids, dtype=np.int64)
+    if id_array.size:
+        entries = np.empty(id_array.size, dtype=INDEX_DTYPE)
+        entries["id"] = id_array
+        entries["offset"] = np.asarray(offsets, dtype=np.int64)
+        entries["length"] = np.asarray(lengths, dtype=np.int64)
+        entries = entries[np.argsort(entries["id"], kind="stable")]
+        last = np.append(entries["id"][1:] != entries["id"][:-1], True)
+        entries = entries[last]
+    temporary = path.with_name(path.name + ".tmp")
+    with temporary.open("wb") as target:
+        np.save(target, entries)
+    temporary.replace(path)
+    return path
+
+
+def build_index(jsonl_path: str | Path, index_path: str | Path | None = None) -> Path:
+    """单独扫描归档生成索引，用于没有经过 ``main.py --build-index`` 的旧归档。"""
+    ids: list[int] = []
+    offsets: list[int] = []
+    lengths: list[int] = []
+    position = 0
+    with Path(jsonl_path).open("rb") as source:
+        for line in source:
+            subject_id = line_subject_id(line)
+            if subject_id is not None:
+                ids.append(subject_id)
+                offsets.append(position)
+                lengths.append(len(line))
+            position += len(line)
+    return write_index(ids, offsets, lengths, index_path or index_path_for(jsonl_path))
+
+
+class SubjectIndex:
+    """只读的 ID → 原始行查询器。"""
+
+    def __init__(self, jsonl_path: str | Path, index_path: str | Path | None = None):
+        self.jsonl_path = Path(jsonl_path)
+        self.index_path = Path(index_path or index_path_for(self.jsonl_path))
+        if not self.index_path.is_file():
+            raise FileNotFoundError(f"未找到索引：{self.index_path}")
+        self._entries = np.load(self.index_path, mmap_mode="r")
+        self._ids = self._entries["id"]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def locate(self, subject_id: int) -> tuple[int, int] | None:
+        """返回 ``(offset, length)``；ID 不在索引中时返回 None。"""
+        position = int(np.searchsorted(self._ids, subject_id))
+        if position >= len(self._ids) or int(self._ids[position]) != subject_id:
+            return None
+        entry = self._entries[position]
+        return int(entry["offset"]), int(entry["length"])
+
+    def lookup(self, subject_id: int) -> dict[str, Any] | bytes | None:
+        return self.lookup_many([subject_id]).get(subject_id)
+
+    def lookup_many(self, subject_ids: Iterable[int]) -> dict[int, dict[str, Any] | bytes]:
+        """批量查询；按文件偏移顺序读取，减少随机寻道。
+
+        归档中无法解析为 JSON 的损坏行同样会被索引，此时对应 ID 返回该行的原始
+        字节，不影响同批其他条目。只有行内 ID 与索引不符时才视为索引过期。
+        """
+        wanted = np.unique(np.asarray(list(subject_ids), dtype=np.int64))
+        if wanted.size == 0 or len(self._ids) == 0:
+            return {}
+        positions = np.searchsorted(self._ids, wanted)
+        positions = positions[positions < len(self._ids)]
+        positions = positions[np.isin(self._ids[positions], wanted)]
+        entries = np.sort(self._entries[positions], order="offset")
+
+        found: dict[int, dict[str, Any] | bytes] = {}
+        with self.jsonl_path.open("rb") as source:
+            for subject_id, offset, length in entries.tolist():
+                source.seek(offset)
+                line = source.read(length)
+                try:
+                    subject = json.loads(line.removeprefix(UTF8_BOM))
+                except (json.JSONDecodeError, UnicodeError):
+                    subject = None
+                # 偏移错位时读到的片段会跨行，据此与行内容损坏区分开。
+                misaligned = len(line) != length or b"\n" in line[:-1]
+                if misaligned or line_subject_id(line, subject) != subject_id:
+                    raise RuntimeError(f"索引已过期，请重新生成：{self.index_path}")
+                found[subject_id] = line if subject is None else subject
+        return found
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="按条目 ID 从 subject.jsonlines 查询原始数据")
+    parser.add_argument("ids", nargs="*", type=int, help="要查询的条目 ID，可一次查询多个")
+    parser.add_argument(
+        "--jsonl",
+        type=Path,
+        default=BANGUMI_DUMP_DIR / JSONL_FILE_NAME,
+        help="subject.jsonlines 路径（默认读取 BANGUMI_DUMP_DIR）",
+    )
+    parser.add_argument("--build", action="store_true", help="先扫描归档重新生成索引")
+    return parser
+
+
+def run(argv: Sequence[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        if args.build or not index_path_for(args.jsonl).is_file():
+            print(f"[OK] 已生成索引：{build_index(args.jsonl)}")
+        found = SubjectIndex(args.jsonl).lookup_many(args.ids)
+    except (OSError, ValueError, RuntimeError) as exc:
+        print(f"[ERROR] {exc}")
+        return 1
+
+    for subject_id in args.ids:
+        subject = found.get(subject_id)
+        if subject is None:
+            print(f"[WARN] 索引中没有条目 {subject_id}")
+        elif isinstance(subject, bytes):
+            print(f"[WARN] 条目 {subject_id} 的原始行无法解析：{subject!r}")
+        else:
+            print(json.dumps(subject, ensure_ascii=False, indent=4))
+    return 0 if all(isinstance(found.get(subject_id), dict) for subject_id in args.ids) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
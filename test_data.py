@@ -1,6 +1,7 @@
 import json
 
 from config import BANGUMI_DUMP_DIR, JSONL_FILE_NAME
+from subject_index import SubjectIndex, index_path_for
 
 # 数据目录：可通过环境变量 BANGUMI_DUMP_DIR 覆盖
 JSONL_PATH = BANGUMI_DUMP_DIR / JSONL_FILE_NAME
@@ -9,38 +10,54 @@ JSONL_PATH = BANGUMI_DUMP_DIR / JSONL_FILE_NAME
 TARGET_SUBJECT_ID = 326
 
 
-def find_subject_data(jsonl_path, subject_id):
-    """
-    在 JSON Lines 文件中查找并打印指定 ID 的条目的完整原始 JSON 内容。
-    """
-    print(f"--- 1. 正在尝试从文件 {jsonl_path.name} 中查找条目 ID: {subject_id} ---")
-    print(f"完整路径: {jsonl_path}")
-
-    found_data = None
-
+def _scan_subject(jsonl_path, subject_id):
+    """逐行扫描查找条目；读取失败时返回 False。"""
     try:
         with open(jsonl_path, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
+            for line in f:
                 try:
                     subject = json.loads(line)
-
-                    # 注意: JSON 文件中的 id 通常是数字，但 subject.get() 可能会返回 None
-                    current_id = subject.get('id')
-
-                    if current_id == subject_id:
-                        found_data = subject
-                        break  # 找到后立即停止读取文件
-
                 except json.JSONDecodeError:
                     # 忽略无法解析的行
                     continue
-
+                # 注意: JSON 文件中的 id 通常是数字，但 subject.get() 可能会返回 None
+                if subject.get('id') == subject_id:
+                    return subject  # 找到后立即停止读取文件
     except FileNotFoundError:
         print(f"\n❌ 严重错误: 文件未找到在 {jsonl_path}")
-        return None
+        return False
     except Exception as e:
         print(f"\n❌ 读取文件时发生错误: {e}")
-        return None
+        return False
+    return None
+
+
+def find_subject_data(jsonl_path, subject_id):
+    """
+    在 JSON Lines 文件中查找并打印指定 ID 的条目的完整原始 JSON 内容。
+    """
+    print(f"--- 1. 正在尝试从文件 {jsonl_path.name} 中查找条目 ID: {subject_id} ---")
+    print(f"完整路径: {jsonl_path}")
+
+    found_data = None
+
+    if index_path_for(jsonl_path).is_file():
+        # 有字节偏移索引（main.py --build-index 或 subject_index.py 生成）时直接定位
+        try:
+            found_data = SubjectIndex(jsonl_path).lookup(subject_id)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"索引不可用，改为逐行扫描: {e}")
+        else:
+            print(f"已通过索引 {index_path_for(jsonl_path).name} 定位")
+            if isinstance(found_data, bytes):
+                print(f"\n❌ 条目 ID {subject_id} 的原始行已损坏，无法解析为 JSON：")
+                print(found_data.decode("utf-8", errors="replace"))
+                return None
+
+    if found_data is None:
+        found_data = _scan_subject(jsonl_path, subject_id)
+        if found_data is False:
+            return None
 
     if found_data:
         print("\n=======================================================")
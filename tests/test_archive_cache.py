@@ -0,0 +1,111 @@
+import json
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+from unittest.mock import patch
+from zipfile import ZipFile
+
+import pandas as pd
+
+from archive_cache import ArchiveCache
+from get_source import file_sha256
+from main import generate_files
+
+
+class ArchiveCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.root = Path(self.directory.name)
+        self.cache = ArchiveCache(self.root / "cache", max_bytes=250)
+
+    def download(self, name, size=100):
+        path = self.root / name
+        path.write_bytes(name.encode()[:1] * size)
+        return path
+
+    def test_store_and_verified_lookup(self):
+        source = self.download("dump-2026-07-21.210441Z.zip")
+        digest = file_sha256(source)
+        stored = self.cache.store(source, 1, source.name, digest)
+        self.assertFalse(source.exists())
+        self.assertEqual(self.cache.get(1, "dump-2026-07-21.210441Z.zip", 100, digest), stored)
+        self.assertIsNone(self.cache.get(1, "dump-2026-07-21.210441Z.zip", 99))
+        self.assertIsNone(self.cache.get(1, "dump-2026-07-21.210441Z.zip"))
+        self.assertFalse(stored.exists())
+
+    def test_corrupted_archive_is_discarded(self):
+        stored = self.cache.store(self.download("dump-2026-07-21.210441Z.zip"), 1, "a.zip")
+        stored.write_bytes(b"x" * 100)
+        self.assertIsNone(self.cache.get(1, "a.zip", 100, verify=True))
+        self.assertFalse(stored.exists())
+
+    def test_lookup_hashes_only_after_the_file_changed(self):
+        stored = self.cache.store(self.download("a.zip"), 1, "a.zip")
+        with patch("archive_cache.file_sha256", wraps=file_sha256) as digest:
+            self.assertEqual(self.cache.get(1, "a.zip", 100), stored)
+            self.assertEqual(self.cache.latest(), stored)
+            self.assertEqual(digest.call_count, 0)
+            self.assertEqual(self.cache.get(1, "a.zip", verify=True), stored)
+            self.assertEqual(digest.call_count, 1)
+
+            # 修改时间变化但内容未变时重新计算一次，并记下新的修改时间。
+            os.utime(stored, ns=(0, 10**9))
+            self.assertEqual(self.cache.get(1, "a.zip"), stored)
+            self.assertEqual(self.cache.get(1, "a.zip"), stored)
+            self.assertEqual(digest.call_count, 2)
+
+            stored.write_bytes(b"x" * 100)
+            os.utime(stored, ns=(0, 2 * 10**9))
+            self.assertIsNone(self.cache.get(1, "a.zip"))
+        self.assertFalse(stored.exists())
+
+    def test_evicts_least_recently_used_archives(self):
+        self.cache.store(self.download("a.zip"), 1, "a.zip")
+        self.cache.store(self.download("b.zip"), 2, "b.zip")
+        self.assertIsNotNone(self.cache.get(1, "a.zip"))
+        self.cache.store(self.download("c.zip"), 3, "c.zip")
+        self.assertIsNotNone(self.cache.get(1, "a.zip"))
+        self.assertIsNone(self.cache.get(2, "b.zip"))
+        # 超出预算的新归档仍会保留给本次运行使用。
+        self.cache.store(self.download("d.zip", size=400), 4, "d.zip")
+        self.assertIsNotNone(self.cache.get(4, "d.zip"))
+        self.assertEqual(sorted(path.name for path in self.cache.directory.iterdir()),
+                         ["4-d.zip", "index.json"])
+
+    def test_disabled_cache_leaves_download_in_place(self):
+        cache = ArchiveCache(self.root / "disabled", max_bytes=0)
+        source = self.download("a.zip")
+        self.assertEqual(cache.store(source, 1, "a.zip"), source)
+        self.assertIsNone(cache.get(1, "a.zip"))
+        self.assertFalse(cache.directory.exists())
+
+    def test_main_falls_back_to_latest_cached_archive(self):
+        rows = [
+            {"id": 1, "type": 2, "rank": 5, "name": "A", "date": "2024-01-01", "score": 8},
+            {"id": 2, "type": 4, "rank": 6, "name": "G", "date": "2023-05-01", "score": 7},
+        ]
+        names = ["dump-2026-07-28.210449Z.zip", "dump-2026-07-21.210441Z.zip"]
+        for asset_id, name in enumerate(names, start=1):
+            archive = self.root / name
+            with ZipFile(archive, "w") as target:
+                target.writestr(
+                    "dump/subject.jsonlines",
+                    "\n".join(json.dumps({**row, "name": name}) for row in rows) + "\n",
+                )
+            ArchiveCache(self.root / "cache", max_bytes=10**6).store(archive, asset_id, name)
+
+        output = self.root / "output"
+        output.mkdir()
+        cache = ArchiveCache(self.root / "cache", max_bytes=10**6)
+        generated = generate_files(self.root / "empty", output, archive_cache=cache)
+        self.assertIn(output / "anime_cleaned.xlsx", generated)
+        anime = pd.read_excel(output / "anime_cleaned.xlsx")
+        self.assertEqual(anime["name"].tolist(), [names[0]])
+        with self.assertRaises(FileNotFoundError):
+            generate_files(self.root / "empty", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import argparse
+from contextlib import redirect_stdout
+import io
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from archive_cache import open_subject_jsonl
+from benchmark import (
+    compare_results,
+    line_count,
+    run_benchmarks,
+    synthetic_lines,
+    write_synthetic_archive,
+)
+from get_source import process_subject_data
+
+
+class SyntheticArchiveTests(unittest.TestCase):
+    def test_generation_is_reproducible_and_realistic(self):
+        self.assertEqual(list(synthetic_lines(200, seed=3)), list(synthetic_lines(200, seed=3)))
+        self.assertNotEqual(list(synthetic_lines(50, seed=3)), list(synthetic_lines(50, seed=4)))
+        with TemporaryDirectory() as directory:
+            root = Path(directory)
+            plain = write_synthetic_archive(root / "subject.jsonlines", 3000, seed=1)
+            archive = write_synthetic_archive(root / "dump.zip", 3000, seed=1)
+            output = io.StringIO()
+            with redirect_stdout(output):
+                anime, games = process_subject_data(plain)
+                with open_subject_jsonl(archive) as source:
+                    streamed = process_subject_data(source)
+        self.assertEqual(streamed, (anime, games))
+        self.assertGreater(len(anime), 100)
+        self.assertGreater(len(games), 100)
+        self.assertIn("JSON 无效", output.getvalue())
+        self.assertNotIn("跳过无日期 0 条", output.getvalue())
+
+    def test_runner_reports_every_step_and_compares_with_baseline(self):
+        with redirect_stdout(io.StringIO()):
+            report = run_benchmarks(2000, repeat=1)
+        expected = {
+            "process_subject_data",
+            "generate_files",
+            "load_from_dataframe",
+            "available_tags",
+            "filter_dataframe[default]",
+            "filter_dataframe[combined]",
+            "insight_counts[default]",
+        }
+        self.assertTrue(expected <= set(report["results"]))
+        self.assertGreater(report["dataset_bytes"], 0)
+        previous = report["results"]["generate_files"]["best_seconds"] / 2
+        baseline = {"results": {"generate_files": {"best_seconds": previous}}}
+        self.assertEqual(compare_results(report, baseline), {"generate_files": 2.0})
+
+    def test_line_count_bounds(self):
+        self.assertEqual(line_count("10_000"), 10_000)
+        for value in ("9999", "5000001", "many"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                line_count(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from dataset_handle import SharedDataset
+
+
+def _touch(path: Path, content: str, mtime_ns: int) -> None:
+    path.write_text(content, encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class SharedDatasetTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.source = self.root / "anime_cleaned.xlsx"
+        self.sidecar = self.root / "anime_cleaned.ranking"
+        self.metadata = self.root / "data_metadata.json"
+        _touch(self.source, "v1", 10**18)
+        self.loads = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _handle(self) -> SharedDataset:
+        def load(sha256):
+            self.loads.append(sha256)
+            return self.source.read_text(encoding="utf-8")
+
+        return SharedDataset(
+            self.source, load, sidecars=(self.sidecar,), triggers=(self.metadata,)
+        )
+
+    def _settled(self, handle: SharedDataset) -> str:
+        handle.get()
+        handle.wait()
+        return handle.get()
+
+    def test_reloads_in_background_when_content_changes(self):
+        handle = self._handle()
+        self.assertEqual(handle.get(), "v1")
+
+        _touch(self.source, "v2", 2 * 10**18)
+        self.assertEqual(self._settled(handle), "v2")
+        self.assertEqual((handle.reloads, len(self.loads)), (1, 2))
+
+    def test_touching_files_without_new_content_keeps_data(self):
+        handle = self._handle()
+        first = handle.get()
+
+        _touch(self.source, "v1", 2 * 10**18)
+        _touch(self.metadata, "{}", 2 * 10**18)
+        self.assertIs(self._settled(handle), first)
+        self.assertEqual(len(self.loads), 1)
+
+        _touch(self.sidecar, "store", 2 * 10**18)
+        self._settled(handle)
+        self.assertEqual(len(self.loads), 2)
+
+    def test_failed_reload_keeps_serving_old_data(self):
+        handle = self._handle()
+        self.source.unlink()
+        self.assertEqual(self._settled(handle), "v1")
+
+        _touch(self.source, "v3", 3 * 10**18)
+        handle._load = lambda sha256: 1 / 0
+        self.assertEqual(self._settled(handle), "v1")
+        self.assertEqual(handle.reloads, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
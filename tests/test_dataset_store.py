@@ -0,0 +1,56 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+import numpy as np
+
+from dataset_store import decode_strings, encode_strings, read_store, store_path, write_store
+
+
+class DatasetStoreTests(unittest.TestCase):
+    def test_round_trip_returns_read_only_views(self):
+        offsets, heap = encode_strings(["Alpha", "", "硬科幻"])
+        arrays = {
+            "date": np.array(["2024-01-15", "NaT"], dtype="datetime64[ns]"),
+            "score": np.array([8.4, 7.6], dtype=np.float32),
+            "rank": np.array([120, 0], dtype=np.int32),
+            "names.offsets": offsets,
+            "names.heap": heap,
+            "empty.heap": np.array([], dtype=np.uint8),
+        }
+        with TemporaryDirectory() as directory:
+            path = store_path(Path(directory) / "anime_cleaned.xlsx")
+            write_store(path, arrays, "abc")
+            loaded = read_store(path, "abc")
+
+            self.assertEqual(set(loaded), set(arrays))
+            for name, array in arrays.items():
+                np.testing.assert_array_equal(loaded[name], array)
+                self.assertEqual(loaded[name].dtype, array.dtype)
+            self.assertFalse(loaded["rank"].flags.writeable)
+            self.assertEqual(
+                decode_strings(loaded["names.offsets"], loaded["names.heap"]).tolist(),
+                ["Alpha", "", "硬科幻"],
+            )
+            del loaded
+
+    def test_stale_or_corrupt_store_is_ignored(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "data.ranking"
+            write_store(path, {"rank": np.arange(3, dtype=np.int32)}, "abc")
+            self.assertIsNone(read_store(path, "def"))
+            self.assertIsNone(read_store(Path(directory) / "missing.ranking"))
+
+            path.write_bytes(b"NOTASTORE" + path.read_bytes()[9:])
+            self.assertIsNone(read_store(path))
+
+    def test_rejects_object_arrays(self):
+        with TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                write_store(
+                    Path(directory) / "data.ranking", {"names": np.array(["a"], dtype=object)}, ""
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+import pandas as pd
+
+from filter_cache import FilterCache
+from ranking_data import filter_key
+
+
+def _frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({"value": range(rows)})
+
+
+class FilterCacheTests(unittest.TestCase):
+    def test_counts_hits_and_misses(self):
+        cache = FilterCache(10**6)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return _frame(3)
+
+        first = cache.get_or_compute(("anime.xlsx", 1), ("q",), compute)
+        second = cache.get_or_compute(("anime.xlsx", 1), ("q",), compute)
+
+        self.assertIs(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (1, 1))
+
+    def test_evicts_least_recently_used_by_memory(self):
+        size = int(_frame(100).memory_usage(index=True, deep=True).sum())
+        cache = FilterCache(size * 2)
+        for query in ("a", "b"):
+            cache.get_or_compute(("anime.xlsx", 1), query, lambda: _frame(100))
+        cache.get_or_compute(("anime.xlsx", 1), "a", lambda: _frame(100))
+        cache.get_or_compute(("anime.xlsx", 1), "c", lambda: _frame(100))
+
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertLessEqual(cache.size_bytes, cache.max_bytes)
+        cache.get_or_compute(("anime.xlsx", 1), "a", lambda: _frame(100))
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_new_dataset_version_drops_old_results(self):
+        cache = FilterCache(10**6)
+        cache.get_or_compute(("anime.xlsx", 1), "q", lambda: _frame(3))
+        cache.get_or_compute(("game.xlsx", 1), "q", lambda: _frame(3))
+        refreshed = cache.get_or_compute(("anime.xlsx", 2), "q", lambda: _frame(5))
+
+        self.assertEqual(len(refreshed), 5)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_disabled_cache_and_oversized_results_are_not_stored(self):
+        self.assertEqual(len(FilterCache(0).get_or_compute(("a", 1), "q", lambda: _frame(3))), 3)
+        cache = FilterCache(10)
+        cache.get_or_compute(("anime.xlsx", 1), "q", lambda: _frame(100))
+        self.assertEqual(len(cache), 0)
+
+    def test_exported_bytes_are_sized_by_length(self):
+        cache = FilterCache(100)
+        cache.get_or_compute(("anime.xlsx", 1), ("export", "csv"), lambda: b"x" * 60)
+        self.assertEqual(cache.size_bytes, 60)
+        cache.get_or_compute(("anime.xlsx", 1), ("export", "jsonl"), lambda: b"x" * 60)
+        self.assertEqual((len(cache), cache.stats()["evictions"]), (1, 1))
+
+    def test_filter_key_normalises_equivalent_queries(self):
+        self.assertEqual(
+            filter_key(date_column="日期", search_term=" alpha ", tags=["科幻", "原创 "]),
+            filter_key(date_column="日期", search_term="ALPHA", tags=["原创", "科幻", ""]),
+        )
+        self.assertNotEqual(
+            filter_key(date_column="日期", ascending=True),
+            filter_key(date_column="日期", ascending=False),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,13 +2,20 @@ import json
 from pathlib import Path
 from tempfile import TemporaryDirectory
 import unittest
+from unittest.mock import patch
 
+from openpyxl import load_workbook
 import pandas as pd
 
 from get_source import (
+    SubjectColumns,
+    _prefilter_rejects,
     apply_excel_date_format,
+    columnar_path,
+    export_columnar,
     export_to_excel,
     process_subject_data,
+    read_columnar,
 )
 
 
@@ -36,11 +43,124 @@ class ArchiveProcessingTests(unittest.TestCase):
             anime, games = process_subject_data(path)
 
         self.assertEqual(len(anime), 1)
-        self.assertEqual(games, [])
+        self.assertEqual(len(games), 0)
         self.assertEqual(anime[0]["name_cn"], "Anime")
         self.assertEqual(anime[0]["score_total"], 5)
         self.assertEqual(anime[0]["meta_tags"], "原创, 科幻")
 
+        frame = anime.to_dataframe()
+        self.assertEqual(
+            frame.columns.tolist(),
+            ["id", "name", "name_cn", "date", "meta_tags", "score", "score_total", "rank"],
+        )
+        self.assertEqual(str(frame["id"].dtype), "int64")
+        self.assertEqual(frame.loc[0, "date"], pd.Timestamp("2024-01-01"))
+
+    def test_parallel_shards_match_serial_output(self):
+        rows = []
+        for index in range(1, 41):
+            rows.append(
+                json.dumps(
+                    {
+                        "id": index,
+                        "type": 2 if index % 2 else 4,
+                        "rank": index,
+                        "name": f"条目 {index}",
+                        "date": "2024-01-01" if index % 7 else "",
+                        "score": 7.5,
+                        "score_details": {"8": index},
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        rows.insert(30, "{invalid")
+        rows.insert(10, '{"id": 99, "type": 1, "rank": 3, "name": "截')
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "subject.jsonlines"
+            path.write_bytes(b"\xef\xbb\xbf" + "\n".join(rows).encode("utf-8") + b"\n")
+            serial = process_subject_data(path)
+            with patch("builtins.print") as printed:
+                parallel = process_subject_data(path, workers=3)
+
+        self.assertEqual(parallel, serial)
+        self.assertEqual([row["id"] for row in parallel[0]][:3], [1, 3, 5])
+        messages = [call.args[0] for call in printed.call_args_list]
+        self.assertTrue(any(message.startswith("[WARN] 第 32 行") for message in messages))
+        self.assertIn("跳过无日期 5 条、无效 JSON 2 条", messages[-1])
+
+    def test_prefilter_rejects_only_decidable_lines(self):
+        self.assertTrue(_prefilter_rejects(b'{"id":1,"type":1,"rank":3}\n'))
+        self.assertTrue(_prefilter_rejects(b'{"id":1,"type": 2,"rank": 0}\n'))
+        self.assertFalse(_prefilter_rejects(b'{"id":1,"type":2,"rank":3}\n'))
+        self.assertFalse(_prefilter_rejects(b'{"type":2.0,"rank":3}\n'))
+        nested = {"id": 1, "type": 2, "rank": 5, "extra": {"type": 1, "rank": 0}}
+        self.assertFalse(_prefilter_rejects(json.dumps(nested).encode("utf-8")))
+
+        lines = [
+            json.dumps({"id": 1, "type": 1, "rank": 9, "date": "2024-01-01"}),
+            json.dumps({**nested, "name": "Nested", "date": "2024-01-01"}),
+            json.dumps({"id": 2, "type": 4, "rank": 0, "date": "2024-01-01"}),
+            # 预筛选会判定丢弃的损坏行：以 } 结尾，字符串中含未转义的控制字符。
+            '{"id": 3, "type": 1, "rank": 2, "name": "坏\x01"}',
+        ]
+        self.assertTrue(_prefilter_rejects(lines[-1].encode("utf-8")))
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "subject.jsonlines"
+            path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            with patch("builtins.print") as printed:
+                anime, games = process_subject_data(path)
+        self.assertEqual([row["name"] for row in anime], ["Nested"])
+        self.assertEqual(len(games), 0)
+        messages = [call.args[0] for call in printed.call_args_list]
+        self.assertTrue(any(message.startswith("[WARN] 第 4 行") for message in messages))
+        self.assertIn("无效 JSON 1 条", messages[-1])
+
+    def test_columns_keep_missing_values_as_nulls(self):
+        columns = SubjectColumns()
+        columns.append_subject(
+            {"id": 7, "name": "A", "date": "2024-13-40", "score": None, "rank": None}
+        )
+        frame = columns.to_dataframe()
+        self.assertTrue(pd.isna(frame.loc[0, "date"]))
+        self.assertTrue(pd.isna(frame.loc[0, "score"]))
+        self.assertTrue(pd.isna(frame.loc[0, "rank"]))
+        self.assertEqual(columns[0]["rank"], None)
+
+        with TemporaryDirectory() as directory:
+            output = Path(directory) / "data.xlsx"
+            self.assertTrue(export_to_excel(columns, output, "Subjects"))
+            loaded = pd.read_excel(output, engine="openpyxl")
+        self.assertEqual(loaded.loc[0, "id"], 7)
+
+    def test_excel_export_writes_formatted_dates_in_one_pass(self):
+        records = [{"id": 1, "name": "A", "name_cn": "A", "date": "2024-02-03"}]
+        with TemporaryDirectory() as directory:
+            output = Path(directory) / "data.xlsx"
+            self.assertTrue(export_to_excel(records, output, "Subjects"))
+            sheet = load_workbook(output)["Subjects"]
+            self.assertEqual(sheet["D2"].number_format, "yyyy-mm-dd")
+            self.assertEqual(sheet["D2"].value.strftime("%Y-%m-%d"), "2024-02-03")
+
+    def test_columnar_sidecar_is_used_only_while_fresh(self):
+        columns = SubjectColumns()
+        columns.append_subject(
+            {"id": 5, "name": "A", "date": "2024-02-03", "score": 8.5, "rank": 3}
+        )
+        with TemporaryDirectory() as directory:
+            workbook = Path(directory) / "anime_cleaned.xlsx"
+            frame = columns.to_dataframe()
+            self.assertTrue(export_to_excel(frame, workbook, "Subjects"))
+            self.assertTrue(export_columnar(frame, workbook))
+            self.assertEqual(columnar_path(workbook).name, "anime_cleaned.parquet")
+
+            cached = read_columnar(workbook)
+            self.assertIsNotNone(cached)
+            self.assertEqual(cached.loc[0, "date"], pd.Timestamp("2024-02-03"))
+            self.assertEqual(str(cached["rank"].dtype), "int64")
+
+            self.assertTrue(export_to_excel(frame.assign(score=9.0), workbook, "Subjects"))
+            self.assertIsNone(read_columnar(workbook))
+
     def test_excel_export_and_date_format_round_trip(self):
         records = [
             {
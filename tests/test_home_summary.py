@@ -0,0 +1,89 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+import warnings
+
+import pandas as pd
+
+from home_summary import (
+    CATEGORY,
+    HIGHLIGHT_COUNT,
+    highlight_frame,
+    highlight_table,
+    read_home_summary,
+    write_home_summary,
+)
+from ranking_data import NAME_CN, SCORE, SCORE_TOTAL, SUBJECT_ID, load_from_dataframe
+
+
+def _ranking(offset: int, rows: int) -> pd.DataFrame:
+    source = pd.DataFrame(
+        {
+            "id": range(offset, offset + rows),
+            "name": [f"作品{offset + row}" for row in range(rows)],
+            "name_cn": None,
+            "date": "2024-01-01",
+            "score": [5 + (row * 7 % 50) / 10 for row in range(rows)],
+            "score_total": [(row * 7919) % 80_000 for row in range(rows)],
+            "rank": range(1, rows + 1),
+        }
+    )
+    return load_from_dataframe(source, "日期")
+
+
+class HomeSummaryTests(unittest.TestCase):
+    def setUp(self):
+        self.datasets = {"动画": _ranking(0, 200), "游戏": _ranking(1000, 150)}
+
+    def test_highlights_match_scoring_every_row(self):
+        candidates = []
+        for category, data in self.datasets.items():
+            qualified = data[data[SCORE_TOTAL] >= 1_000].copy()
+            qualified[CATEGORY] = category
+            qualified["口碑指数"] = qualified[SCORE] * (
+                1 + qualified[SCORE_TOTAL].map(lambda value: min(value, 50_000) / 50_000)
+            )
+            candidates.append(qualified)
+        expected = (
+            pd.concat(candidates, ignore_index=True)
+            .sort_values(["口碑指数", SCORE_TOTAL], ascending=False)
+            .head(HIGHLIGHT_COUNT)
+        )
+
+        highlights = highlight_table(self.datasets)
+        self.assertEqual(highlights[SUBJECT_ID].tolist(), expected[SUBJECT_ID].tolist())
+        self.assertEqual(highlights[CATEGORY].tolist(), expected[CATEGORY].tolist())
+
+    def test_categories_without_candidates_are_skipped(self):
+        datasets = {"冷门": _ranking(5000, 1), "动画": self.datasets["动画"]}
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            highlights = highlight_table(datasets)
+            empty = highlight_table({"冷门": datasets["冷门"]})
+        self.assertNotIn("冷门", highlights[CATEGORY].tolist())
+        self.assertTrue(empty.empty)
+        self.assertEqual(empty.columns.tolist(), highlights.columns.tolist())
+
+    def test_summary_is_used_only_while_workbooks_are_unchanged(self):
+        with TemporaryDirectory() as directory:
+            root = Path(directory)
+            workbooks = {"动画": root / "anime.xlsx", "游戏": root / "game.xlsx"}
+            for path in workbooks.values():
+                path.write_bytes(path.name.encode("ascii"))
+            path = write_home_summary(root / "home_summary.json", self.datasets, workbooks)
+
+            summary = read_home_summary(path, workbooks)
+            self.assertEqual(summary["counts"], {"动画": 200, "游戏": 150})
+            self.assertEqual(
+                highlight_frame(summary)[NAME_CN].tolist(),
+                highlight_table(self.datasets)[NAME_CN].astype(str).tolist(),
+            )
+
+            self.assertIsNone(read_home_summary(path, {"动画": workbooks["动画"]}))
+            workbooks["游戏"].write_bytes(b"changed")
+            self.assertIsNone(read_home_summary(path, workbooks))
+            self.assertIsNone(read_home_summary(root / "missing.json", workbooks))
+
+
+if __name__ == "__main__":
+    unittest.main()
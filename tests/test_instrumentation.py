@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+import unittest
+
+from get_source import export_to_excel, process_subject_data
+from instrumentation import annotate, instrumented, recording, resource
+
+
+@instrumented("sample")
+def sample(fail=False):
+    annotate(bytes=4096, lines=8)
+    if fail:
+        raise ValueError("boom")
+    return "done"
+
+
+class InstrumentationTests(unittest.TestCase):
+    def test_records_only_inside_recording(self):
+        self.assertEqual(sample(), "done")
+        with TemporaryDirectory() as directory:
+            log = Path(directory) / "events.jsonl"
+            with recording(log) as stats:
+                sample()
+                with self.assertRaises(ValueError):
+                    sample(fail=True)
+            self.assertEqual(sample(), "done")
+            events = [json.loads(line) for line in log.read_text(encoding="utf-8").splitlines()]
+
+        self.assertEqual(len(stats.events), 2)
+        self.assertEqual(events[1]["error"], "ValueError")
+        self.assertEqual(events[0]["run_started_at"], stats.started_at)
+        summary = stats.summary()["calls"]["sample"]
+        self.assertEqual((summary["count"], summary["bytes"], summary["lines"]), (2, 8192, 16))
+        for key in (
+            "wall_seconds",
+            "cpu_seconds",
+            "bytes_per_second",
+            "peak_rss_bytes",
+            "peak_child_rss_bytes",
+        ):
+            self.assertIn(key, summary)
+
+    @unittest.skipIf(resource is None, "平台没有 resource 模块")
+    def test_child_process_peak_is_recorded_separately(self):
+        @instrumented("child")
+        def run_child():
+            subprocess.run(
+                [sys.executable, "-c", "block = bytearray(96 * 1024 * 1024)"], check=True
+            )
+
+        with recording() as stats:
+            run_child()
+        event = stats.events[0]
+        self.assertGreaterEqual(event["peak_child_rss_bytes"], 96 * 1024 * 1024)
+        self.assertIn("peak_child_rss_bytes", stats.summary())
+
+    def test_pipeline_functions_report_lines_and_bytes(self):
+        content = (
+            '{"id": 1, "type": 2, "date": "2024-01-01", "score": 8}\n'
+            '{"id": 2, "type": 3, "date": "2024-01-01"}\n'
+        )
+        with TemporaryDirectory() as directory:
+            root = Path(directory)
+            path = root / "subject.jsonlines"
+            path.write_text(content, encoding="utf-8")
+            with recording() as stats:
+                anime, _ = process_subject_data(path)
+                export_to_excel(anime, root / "anime.xlsx", "Anime")
+            workbook_size = (root / "anime.xlsx").stat().st_size
+
+        calls = stats.summary()["calls"]
+        self.assertEqual(calls["process_subject_data"]["lines"], 2)
+        self.assertEqual(calls["process_subject_data"]["bytes"], len(content.encode()))
+        self.assertEqual(calls["export_to_excel"]["lines"], 1)
+        self.assertEqual(calls["export_to_excel"]["bytes"], workbook_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
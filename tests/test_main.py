@@ -1,8 +1,14 @@
+from contextlib import redirect_stderr
+from io import StringIO
 from pathlib import Path
+import subprocess
+import sys
 from tempfile import TemporaryDirectory
 import unittest
+from unittest.mock import patch
 
-from main import build_parser, run
+from get_source import SubjectColumns
+from main import build_parser, export_datasets, run, validate_workbook
 
 
 class PipelineCliTests(unittest.TestCase):
@@ -10,9 +16,54 @@ class PipelineCliTests(unittest.TestCase):
         args = build_parser().parse_args([])
         self.assertFalse(args.publish)
 
+    def test_pipeline_does_not_import_streamlit(self):
+        modules = "main, update_data, benchmark, home_summary"
+        code = f"import sys, {modules}; print('streamlit' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=Path(__file__).resolve().parents[1],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "False")
+
+    def test_workers_must_be_positive(self):
+        self.assertEqual(build_parser().parse_args(["--workers", "4"]).workers, 4)
+        with self.assertRaises(SystemExit), redirect_stderr(StringIO()):
+            build_parser().parse_args(["--workers", "0"])
+
+    def test_export_validates_in_memory_unless_paranoid(self):
+        anime, games = SubjectColumns(), SubjectColumns()
+        subject = {"id": 1, "name": "A", "date": "2024-01-01", "score": 8, "rank": 1}
+        anime.append_subject(subject)
+        games.append_subject(subject)
+        with TemporaryDirectory() as directory:
+            output = Path(directory)
+            with patch("main.validate_workbook") as reread:
+                generated = export_datasets(anime, games, [output])
+            reread.assert_not_called()
+            self.assertEqual(
+                [path.name for path in generated],
+                [
+                    "anime_cleaned.xlsx",
+                    "anime_cleaned.parquet",
+                    "anime_cleaned.ranking",
+                    "game_cleaned.xlsx",
+                    "game_cleaned.parquet",
+                    "game_cleaned.ranking",
+                    "home_summary.json",
+                ],
+            )
+
+            export_datasets(anime, games, [output], paranoid_validate=True)
+            with self.assertRaisesRegex(ValueError, "行数不一致"):
+                validate_workbook(output / "anime_cleaned.xlsx", expected_rows=2)
+
     def test_missing_archive_returns_failure(self):
         with TemporaryDirectory() as directory:
-            result = run(["--dump-dir", str(Path(directory))])
+            root = Path(directory)
+            result = run(["--dump-dir", str(root), "--archive-cache", str(root / "cache")])
         self.assertEqual(result, 1)
 
 
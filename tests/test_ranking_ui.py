@@ -1,16 +1,35 @@
 from datetime import date
+import io
+import json
+import mmap
+from pathlib import Path
+from tempfile import TemporaryDirectory
 import unittest
+from unittest.mock import patch
 
+import numpy as np
 import pandas as pd
 
 from ranking_ui import (
+    DATASET_VERSION_ATTR,
+    LINK,
+    NAME,
     NAME_CN,
     RANK,
     SCORE,
+    RESULT_KEY_ATTR,
     TAGS,
     available_tags,
+    cached_filter_dataframe,
+    export_bytes,
     filter_dataframe,
+    insight_counts,
     load_from_dataframe,
+    load_from_path,
+    table_page,
+    tag_frequencies,
+    with_links,
+    write_ranking_store,
 )
 
 
@@ -50,11 +69,19 @@ class RankingDataTests(unittest.TestCase):
                 },
             ]
         )
+        self.source = source
         self.data = load_from_dataframe(source, "开播日期")
 
     def test_normalizes_names_and_links(self):
         self.assertEqual(self.data.loc[1, NAME_CN], "Beta")
-        self.assertEqual(self.data.loc[0, "Bangumi链接"], "https://bgm.tv/subject/1")
+        self.assertNotIn(LINK, self.data.columns)
+        self.assertEqual(with_links(self.data).loc[0, LINK], "https://bgm.tv/subject/1")
+
+    def test_compact_dtypes_keep_inclusive_score_bounds(self):
+        self.assertEqual(str(self.data[SCORE].dtype), "float32")
+        self.assertEqual(str(self.data[RANK].dtype), "int32")
+        result = filter_dataframe(self.data, date_column="开播日期", score_range=(7.6, 8.4))
+        self.assertEqual(result[NAME_CN].tolist(), ["阿尔法", "Beta"])
 
     def test_missing_required_column_has_clear_error(self):
         with self.assertRaisesRegex(ValueError, "score_total"):
@@ -94,6 +121,151 @@ class RankingDataTests(unittest.TestCase):
         self.assertIn("原创", available_tags(self.data))
         self.assertIn(TAGS, self.data.columns)
 
+    def test_filters_leave_input_untouched_and_keep_columns_when_empty(self):
+        before = self.data.copy()
+        result = filter_dataframe(
+            self.data,
+            date_column="开播日期",
+            minimum_votes=10**6,
+            tags=["原创"],
+            sort_by=RANK,
+        )
+        self.assertTrue(result.empty)
+        self.assertEqual(result.columns.tolist(), self.data.columns.tolist())
+        pd.testing.assert_frame_equal(self.data, before)
+
+    def test_tag_index_matches_plain_strings_on_subsets(self):
+        indexed = self.data.iloc[[2, 0]].reset_index(drop=True)
+        plain = indexed.assign(**{TAGS: indexed[TAGS].astype(str)})
+        self.assertEqual(dict(tag_frequencies(indexed)), dict(tag_frequencies(plain)))
+        for tags in (["原创"], ["原创", "硬科幻"], ["科幻", "奇幻"], ["不存在"]):
+            pd.testing.assert_frame_equal(
+                filter_dataframe(indexed, date_column="开播日期", tags=tags),
+                filter_dataframe(plain, date_column="开播日期", tags=tags),
+                check_categorical=False,
+                check_dtype=False,
+            )
+
+    def test_name_index_matches_case_insensitive_substring_scan(self):
+        indexed = self.data.iloc[[2, 1, 0]].reset_index(drop=True)
+        plain = indexed.astype({NAME_CN: object, NAME: object})
+        for query in ("a", "ALPHA", "[tv", "科幻", "硬科", "eta", "nan", "不存在"):
+            self.assertEqual(
+                filter_dataframe(indexed, date_column="开播日期", search_term=query)[
+                    NAME_CN
+                ].tolist(),
+                filter_dataframe(plain, date_column="开播日期", search_term=query)[
+                    NAME_CN
+                ].tolist(),
+                query,
+            )
+
+    def test_presorted_index_matches_fresh_sort_and_ignores_reordered_frames(self):
+        reordered = self.data.iloc[[1, 2, 0]].reset_index(drop=True)
+        plain = self.data.copy()
+        plain.attrs = {}
+        for frame in (self.data, reordered):
+            for sort_by, ascending in ((SCORE, False), (RANK, True), ("开播日期", False)):
+                pd.testing.assert_frame_equal(
+                    filter_dataframe(
+                        frame,
+                        date_column="开播日期",
+                        start_date=date(2024, 1, 15),
+                        score_range=(7.0, 9.0),
+                        sort_by=sort_by,
+                        ascending=ascending,
+                    ),
+                    filter_dataframe(
+                        plain,
+                        date_column="开播日期",
+                        start_date=date(2024, 1, 15),
+                        score_range=(7.0, 9.0),
+                        sort_by=sort_by,
+                        ascending=ascending,
+                    ),
+                )
+
+    def test_insight_counts_match_row_by_row_counts(self):
+        plain = self.data.copy()
+        plain.attrs = {}
+        for options in (
+            {},
+            {"start_date": date(2024, 1, 1), "score_range": (8.4, 9.0)},
+            {"end_date": date(2024, 6, 30)},
+            {"search_term": "a"},
+            {"tags": ["原创"], "minimum_votes": 1000},
+        ):
+            for frame in (self.data, plain):
+                filtered = filter_dataframe(frame, date_column="开播日期", **options)
+                yearly, tags = insight_counts(filtered, "开播日期")
+                expected = filtered["开播日期"].dt.year.value_counts().sort_index()
+                self.assertEqual(yearly["年份"].tolist(), expected.index.tolist())
+                self.assertEqual(yearly["作品数"].tolist(), expected.tolist())
+                self.assertEqual(dict(tags), dict(tag_frequencies(filtered)))
+
+        subset = self.data.iloc[[0]]
+        self.assertEqual(insight_counts(subset, "开播日期")[0]["作品数"].tolist(), [1])
+
+    def test_table_page_formats_only_the_requested_rows(self):
+        page = table_page(self.data, "开播日期", 1, 5)
+
+        self.assertEqual(page[NAME_CN].tolist(), ["Beta", "硬科幻"])
+        self.assertEqual(page["开播日期"].tolist(), ["2023-06-01", "2024-12-31"])
+        self.assertEqual(page[LINK].iloc[0], "https://bgm.tv/subject/2")
+        self.assertEqual(page.attrs, {})
+        self.assertNotIn(LINK, self.data.columns)
+
+    def test_exports_are_written_in_chunks_with_links(self):
+        expected = with_links(self.data)
+        expected["开播日期"] = expected["开播日期"].dt.strftime("%Y-%m-%d")
+        with patch("ranking_ui._EXPORT_CHUNK_ROWS", 2):
+            csv = export_bytes(self.data, "开播日期", "csv")
+            lines = export_bytes(self.data, "开播日期", "jsonl").decode("utf-8").splitlines()
+            workbook = pd.read_excel(io.BytesIO(export_bytes(self.data, "开播日期", "xlsx")))
+
+        self.assertEqual(csv, expected.to_csv(index=False).encode("utf-8-sig"))
+        self.assertEqual([json.loads(line)[NAME_CN] for line in lines], ["阿尔法", "Beta", "硬科幻"])
+        self.assertEqual(json.loads(lines[1])["开播日期"], "2023-06-01")
+        self.assertIn('"评分":8.4,', lines[0])
+        self.assertIn('"Bangumi链接":"https://bgm.tv/subject/1"', lines[0])
+        self.assertEqual(workbook[SCORE].tolist()[0], 8.4)
+        self.assertEqual(workbook[LINK].tolist(), expected[LINK].tolist())
+        self.assertEqual(
+            workbook["开播日期"].dt.strftime("%Y-%m-%d").tolist(), expected["开播日期"].tolist()
+        )
+        with self.assertRaises(ValueError):
+            export_bytes(self.data, "开播日期", "pdf")
+
+    def test_result_key_describes_only_the_cached_result(self):
+        data = self.data.copy()
+        data.attrs[DATASET_VERSION_ATTR] = ("anime.xlsx", "result-key-test")
+        result = cached_filter_dataframe(data, date_column="开播日期", minimum_votes=100)
+        key = result.attrs[RESULT_KEY_ATTR]
+
+        self.assertTrue(key.describes(result))
+        self.assertFalse(key.describes(result.iloc[::-1]))
+        self.assertFalse(key.describes(with_links(result)))
+
+    def test_mapped_store_matches_dataframe_and_shares_memory(self):
+        with TemporaryDirectory() as directory:
+            workbook = Path(directory) / "anime_cleaned.xlsx"
+            workbook.write_bytes(b"workbook")
+            self.assertTrue(write_ranking_store(self.data, "开播日期", workbook))
+            mapped = load_from_path(str(workbook), "开播日期")
+
+            pd.testing.assert_frame_equal(mapped, self.data)
+            scores = mapped[SCORE].to_numpy()
+            self.assertFalse(scores.flags.writeable)
+            while isinstance(scores, np.ndarray):
+                scores = scores.base
+            self.assertIsInstance(scores, mmap.mmap)
+            self.assertEqual(available_tags(mapped), available_tags(self.data))
+            pd.testing.assert_frame_equal(
+                filter_dataframe(mapped, date_column="开播日期", search_term="a", tags=["原创"]),
+                filter_dataframe(self.data, date_column="开播日期", search_term="a", tags=["原创"]),
+            )
+            del mapped, scores
+
 
 if __name__ == "__main__":
     unittest.main()
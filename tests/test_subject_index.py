@@ -0,0 +1,62 @@
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from get_source import process_subject_data
+from subject_index import SubjectIndex, build_index, index_path_for, run
+
+
+class SubjectIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name) / "subject.jsonlines"
+        rows = [
+            {"id": index * 3, "type": 1 + index % 4, "rank": index, "date": "2024-01-01",
+             "tags": [{"name": "x", "count": 1}], "name": f"条目 {index}"}
+            for index in range(1, 30)
+        ]
+        lines = [json.dumps(row, ensure_ascii=False) for row in rows]
+        lines.insert(5, "{invalid")
+        self.path.write_bytes(b"\xef\xbb\xbf" + "\n".join(lines).encode("utf-8") + b"\n")
+
+    def test_ingestion_builds_index_for_every_subject(self):
+        for workers in (1, 3):
+            index_path = index_path_for(self.path)
+            index_path.unlink(missing_ok=True)
+            process_subject_data(self.path, workers=workers, index_path=index_path)
+            index = SubjectIndex(self.path)
+            self.assertEqual(len(index), 29)
+            found = index.lookup_many([87, 3, 4, 42])
+            self.assertEqual(sorted(found), [3, 42, 87])
+            self.assertEqual(found[3]["name"], "条目 1")
+            self.assertEqual(found[87]["name"], "条目 29")
+            self.assertIsNone(index.lookup(5))
+
+    def test_standalone_build_and_stale_detection(self):
+        build_index(self.path)
+        self.assertEqual(SubjectIndex(self.path).lookup(30)["name"], "条目 10")
+        self.assertEqual(run(["--jsonl", str(self.path), "30", "33"]), 0)
+
+        self.path.write_text('{"id": 999}\n' + self.path.read_text(encoding="utf-8-sig"))
+        with self.assertRaisesRegex(RuntimeError, "索引已过期"):
+            SubjectIndex(self.path).lookup(30)
+
+    def test_corrupt_line_is_reported_next_to_valid_ids(self):
+        corrupt = b'{"id": 12, "type": 3, "rank": 4, "name": "\xe6\x9d'
+        lines = self.path.read_bytes().split(b"\n")
+        lines[3] = corrupt
+        self.path.write_bytes(b"\n".join(lines))
+        process_subject_data(self.path, index_path=index_path_for(self.path))
+
+        found = SubjectIndex(self.path).lookup_many([9, 12, 15])
+        self.assertEqual(found[9]["name"], "条目 3")
+        self.assertEqual(found[12], corrupt + b"\n")
+        self.assertEqual(found[15]["name"], "条目 5")
+        self.assertEqual(run(["--jsonl", str(self.path), "9"]), 0)
+        self.assertEqual(run(["--jsonl", str(self.path), "9", "12"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
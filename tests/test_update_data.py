@@ -1,19 +1,257 @@
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import json
 from pathlib import Path
 from tempfile import TemporaryDirectory
+import threading
 import unittest
 from unittest.mock import patch
 from zipfile import ZipFile
 
+from archive_cache import ArchiveCache
+from dataset_store import read_store, store_path
+from get_source import (
+    columnar_path,
+    columnar_source_sha256,
+    export_to_excel,
+    file_sha256,
+    process_subject_data,
+)
+import update_data
 from update_data import (
+    ApiCache,
     ArchiveAsset,
+    UpdateCheckpoint,
+    download_asset,
     extract_subject_jsonl,
     fetch_latest_asset,
+    open_subject_jsonl,
     select_latest_asset,
+    summarize_changes,
     update_latest_data,
+    _JsonResponse,
 )
 
 
+class _ArchiveHandler(BaseHTTPRequestHandler):
+    """支持 Range 的本地下载服务；``failures`` 次请求只发送一半内容后断开。"""
+
+    payload = b""
+    supports_range = True
+    failures = 0
+    requests: list[str | None] = []
+
+    def do_GET(self):
+        server = type(self)
+        requested = self.headers.get("Range")
+        with server.lock:
+            server.requests.append(requested)
+            fail = server.failures > 0
+            server.failures -= fail
+        start, end = 0, len(server.payload) - 1
+        status = 200
+        if requested and server.supports_range:
+            first, last = requested.removeprefix("bytes=").split("-")
+            start, end = int(first), int(last) if last else end
+            status = 206
+        body = server.payload[start : end + 1]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(server.payload)}")
+        self.end_headers()
+        if fail:
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RangedDownloadTests(unittest.TestCase):
+    def serve(self, payload, *, supports_range=True, failures=0):
+        handler = type(
+            "Handler",
+            (_ArchiveHandler,),
+            {
+                "payload": payload,
+                "supports_range": supports_range,
+                "failures": failures,
+                "requests": [],
+                "lock": threading.Lock(),
+            },
+        )
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}/dump.zip"
+        return handler, ArchiveAsset(1, "dump-2026-07-28.210449Z.zip", url, len(payload))
+
+    @contextmanager
+    def track_progress(self):
+        progresses = []
+
+        def create():
+            progresses.append(real())
+            return progresses[-1]
+
+        real = update_data._DownloadProgress
+        with patch("update_data._DownloadProgress", side_effect=create):
+            yield progresses
+
+    @patch("update_data.time.sleep")
+    @patch("update_data.MIN_SEGMENT_SIZE", 1024)
+    def test_segments_resume_after_interrupted_transfers(self, sleep):
+        payload = bytes(range(256)) * 64
+        handler, asset = self.serve(payload, failures=2)
+        with TemporaryDirectory() as directory:
+            destination = Path(directory) / asset.name
+            with self.track_progress() as progresses:
+                download_asset(asset, destination, segments=4)
+            self.assertEqual(progresses[-1].downloaded, len(payload))
+            self.assertEqual(destination.read_bytes(), payload)
+            self.assertFalse(destination.with_suffix(".zip.part").exists())
+        starts_by_segment: dict[int, list[int]] = {}
+        for value in handler.requests:
+            start, end = map(int, value.removeprefix("bytes=").split("-"))
+            starts_by_segment.setdefault(end, []).append(start)
+        self.assertEqual(len(handler.requests), 6)
+        # 每段 4096 字节；续传请求必须从已写入的位置继续，而不是回到段首。
+        for end, starts in starts_by_segment.items():
+            self.assertEqual(starts[0], end + 1 - 4096)
+            self.assertEqual(starts, sorted(set(starts)))
+
+    @patch("update_data.time.sleep")
+    @patch("update_data.MIN_SEGMENT_SIZE", 1024)
+    def test_falls_back_to_single_connection_without_range_support(self, sleep):
+        payload = b"z" * 8192
+        handler, asset = self.serve(payload, supports_range=False)
+        with TemporaryDirectory() as directory:
+            destination = Path(directory) / asset.name
+            download_asset(asset, destination)
+            self.assertEqual(destination.read_bytes(), payload)
+
+    @patch("update_data.time.sleep")
+    @patch("update_data.MIN_SEGMENT_SIZE", 1024)
+    def test_restarted_download_does_not_double_count_progress(self, sleep):
+        payload = b"r" * 8192
+        handler, asset = self.serve(payload, supports_range=False, failures=1)
+        with TemporaryDirectory() as directory:
+            destination = Path(directory) / asset.name
+            with self.track_progress() as progresses:
+                download_asset(asset, destination)
+            self.assertEqual(destination.read_bytes(), payload)
+        self.assertEqual(progresses[-1].downloaded, len(payload))
+
+    @patch("update_data.time.sleep")
+    def test_size_mismatch_fails_and_removes_partial_file(self, sleep):
+        handler, asset = self.serve(b"short")
+        asset = ArchiveAsset(1, asset.name, asset.url, 10)
+        with TemporaryDirectory() as directory:
+            destination = Path(directory) / asset.name
+            with self.assertRaisesRegex(RuntimeError, "下载大小不一致"):
+                download_asset(asset, destination)
+            self.assertEqual(list(Path(directory).iterdir()), [])
+
+
+class _ReleaseHandler(BaseHTTPRequestHandler):
+    """模拟 GitHub release API：带 ETag、分页 ``Link`` 头，条件请求命中时返回 304。"""
+
+    pages = 3
+    requests: list[tuple[str, bool]] = []
+
+    def do_GET(self):
+        server = type(self)
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        path, _, query = self.path.partition("?")
+        etag = f'"{self.path}"'
+        conditional = self.headers.get("If-None-Match") == etag
+        with server.lock:
+            server.requests.append((path, conditional))
+        if conditional:
+            self.send_response(304)
+            self.end_headers()
+            return
+        if path == "/latest":
+            body = {"assets_url": f"{base}/assets"}
+            link = None
+        else:
+            page = int(dict(item.split("=") for item in query.split("&"))["page"])
+            body = [
+                {
+                    "id": page * 10 + offset,
+                    "name": f"dump-2026-07-{page:02d}.21044{offset}Z.zip",
+                    "browser_download_url": f"{base}/{page}-{offset}.zip",
+                    "size": 1,
+                }
+                for offset in range(2)
+            ]
+            link = None
+            if page < server.pages:
+                link = f'<{base}/assets?per_page=2&page={server.pages}>; rel="last"'
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        if link:
+            self.send_header("Link", link)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@patch("update_data.ASSET_PAGE_SIZE", 2)
+class ReleasePollingTests(unittest.TestCase):
+    def setUp(self):
+        self.handler = type(
+            "Handler", (_ReleaseHandler,), {"requests": [], "lock": threading.Lock()}
+        )
+        server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.api_url = f"http://127.0.0.1:{server.server_port}/latest"
+
+    def test_fetches_all_asset_pages(self):
+        selected = fetch_latest_asset(self.api_url)
+        self.assertEqual(selected.asset_id, 31)
+        self.assertEqual(
+            sorted(path for path, _ in self.handler.requests),
+            ["/assets", "/assets", "/assets", "/latest"],
+        )
+
+    def test_unchanged_release_reuses_cached_pages(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "cache.json"
+            cache = ApiCache(path)
+            first = fetch_latest_asset(self.api_url, cache=cache)
+            cache.save()
+            self.handler.requests.clear()
+            second = fetch_latest_asset(self.api_url, cache=ApiCache(path))
+        self.assertEqual(first, second)
+        self.assertEqual(self.handler.requests, [("/latest", True)])
+
+    def test_changed_release_revalidates_pages(self):
+        cache = ApiCache()
+        fetch_latest_asset(self.api_url, cache=cache)
+        cache.store(self.api_url, {**cache.get(self.api_url), "etag": '"stale"'})
+        self.handler.requests.clear()
+        fetch_latest_asset(self.api_url, cache=cache)
+        self.assertEqual(
+            sorted(self.handler.requests),
+            [("/assets", True)] * 3 + [("/latest", False)],
+        )
+
+
 class DataUpdaterTests(unittest.TestCase):
     def test_selects_latest_timestamped_zip(self):
         assets = [
@@ -39,22 +277,24 @@ class DataUpdaterTests(unittest.TestCase):
         selected = select_latest_asset(assets)
         self.assertEqual(selected.asset_id, 1)
 
-    @patch("update_data.request_json")
-    def test_fetches_paginated_release_assets(self, request_json):
-        request_json.side_effect = [
-            {"assets_url": "https://api.example.test/assets"},
-            [
-                {
-                    "id": 9,
-                    "name": "dump-2026-07-28.210449Z.zip",
-                    "browser_download_url": "https://example.test/archive.zip",
-                    "size": 123,
-                }
-            ],
+    @patch("update_data._fetch_json")
+    def test_fetches_paginated_release_assets(self, fetch_json):
+        fetch_json.side_effect = [
+            _JsonResponse({"assets_url": "https://api.example.test/assets"}),
+            _JsonResponse(
+                [
+                    {
+                        "id": 9,
+                        "name": "dump-2026-07-28.210449Z.zip",
+                        "browser_download_url": "https://example.test/archive.zip",
+                        "size": 123,
+                    }
+                ]
+            ),
         ]
         selected = fetch_latest_asset("https://api.example.test/latest")
         self.assertEqual(selected.asset_id, 9)
-        self.assertEqual(request_json.call_count, 2)
+        self.assertEqual(fetch_json.call_count, 2)
 
     def test_extracts_nested_subject_file_only(self):
         with TemporaryDirectory() as directory:
@@ -67,6 +307,273 @@ class DataUpdaterTests(unittest.TestCase):
             extract_subject_jsonl(archive, output)
             self.assertEqual(output.read_text(encoding="utf-8"), '{"id": 1}\n')
 
+    def test_streams_subject_file_from_zip_without_extracting(self):
+        rows = [
+            {"id": 1, "type": 2, "rank": 5, "name": "A", "date": "2024-01-01", "score": 8},
+            {"id": 2, "type": 4, "rank": 6, "name": "G", "date": "2023-05-01", "score": 7},
+            {"id": 3, "type": 1, "rank": 7, "name": "Book", "date": "2022-01-01"},
+        ]
+        content = "\n".join(json.dumps(row) for row in rows) + "\n"
+        with TemporaryDirectory() as directory:
+            root = Path(directory)
+            archive = root / "archive.zip"
+            with ZipFile(archive, "w") as target:
+                target.writestr("dump/subject.jsonlines", content)
+            with open_subject_jsonl(archive) as source:
+                anime, games = process_subject_data(source)
+            with open_subject_jsonl(archive) as source, patch(
+                "get_source.STREAM_BATCH_LINES", 1
+            ):
+                parallel = process_subject_data(source, workers=2)
+            self.assertEqual(sorted(path.name for path in root.iterdir()), ["archive.zip"])
+        self.assertEqual([row["id"] for row in anime], [1])
+        self.assertEqual([row["id"] for row in games], [2])
+        self.assertEqual(parallel, (anime, games))
+
+    @patch("update_data.download_asset")
+    @patch("update_data.fetch_latest_asset")
+    def test_reuses_unchanged_datasets_between_archives(self, fetch_latest_asset, download_asset):
+        rows = [
+            {"id": 1, "type": 2, "rank": 5, "name": "A", "date": "2024-01-01", "score": 8},
+            {"id": 2, "type": 4, "rank": 6, "name": "G", "date": "2023-05-01", "score": 7},
+        ]
+
+        def write_archive(asset, destination, token=None):
+            with ZipFile(destination, "w") as target:
+                target.writestr(
+                    "subject.jsonlines", "\n".join(json.dumps(row) for row in rows) + "\n"
+                )
+
+        download_asset.side_effect = write_archive
+        with TemporaryDirectory() as directory:
+            root = Path(directory)
+            fetch_latest_asset.return_value = ArchiveAsset(
+                1, "dump-2026-07-21.210441Z.zip", "https://example.test/1.zip", 0
+            )
+            self.assertTrue(update_latest_data(root))
+            anime_file = root / "anime_cleaned.xlsx"
+            first_anime = anime_file.read_bytes()
+
+            rows[1]["score"] = 7.5
+            fetch_latest_asset.return_value = ArchiveAsset(
+                2, "dump-2026-07-28.210449Z.zip", "https://example.test/2.zip", 0
+            )
+            with patch("main.export_to_excel", wraps=export_to_excel) as export:
+                self.assertTrue(update_latest_data(root))
+            metadata = json.loads((root / "data_metadata.json").read_text(encoding="utf-8"))
+            self.assertEqual(anime_file.read_bytes(), first_anime)
+            self.assertTrue((root / "data_fingerprints.json").is_file())
+
+        self.assertEqual(export.call_count, 1)
+        self.assertTrue(metadata["changes"]["anime_cleaned.xlsx"]["reused"])
+        self.assertEqual(metadata["changes"]["game_cleaned.xlsx"]["changed"], 1)
+
+    @patch("update_data.download_asset")
+    @patch("update_data.fetch_latest_asset")
+    def test_reused_workbook_regenerates_missing_sidecars(self, fetch_latest_asset, download_asset):
+        def write_archive(asset, destination, token=None):
+            with ZipFile(destination, "w") as target:
+                target.writestr(
+                    "subject.jsonlines",
+                    '{"id": 1, "type": 2, "rank": 5, "name": "A", "date": "2024-01-01", "score": 8}\n'
+                    '{"id": 2, "type": 4, "rank": 6, "name": "G", "date": "2023-05-01", "score": 7}\n',
+                )
+
+        download_asset.side_effect = write_archive
+        with TemporaryDirectory() as directory:
+            root = Path(directory)
+            fetch_latest_asset.return_value = ArchiveAsset(
+                1, "dump-2026-07-21.210441Z.zip", "https://example.test/1.zip", 0
+            )
+            self.assertTrue(update_latest_data(root))
+            anime_file = root / "anime_cleaned.xlsx"
+            first_anime = anime_file.read_bytes()
+            columnar_path(anime_file).unlink()
+            store_path(anime_file).unlink()
+
+            fetch_latest_asset.return_value = ArchiveAsset(
+                2, "dump-2026-07-28.210449Z.zip", "https://example.test/2.zip", 0
+            )
+            with patch("main.export_to_excel", wraps=export_to_excel) as export:
+                self.assertTrue(update_latest_data(root))
+            digest = file_sha256(anime_file)
+            self.assertEqual(anime_file.read_bytes(), first_anime)
+            self.assertEqual(columnar_source_sha256(anime_file), digest)
+            self.assertIsNotNone(read_store(store_path(anime_file), digest))
+
+        self.assertEqual(export.call_count, 0)
+
+    @patch("update_data.download_asset")
+    @patch("update_data.fetch_latest_asset")
+    def test_rewrites_workbook_changed_since_last_run(self, fetch_latest_asset, download_asset):
+        def write_archive(asset, destination, token=None):
+            with ZipFile(destination, "w") as target:
+                target.writestr(
+                    "subject.jsonlines",
+                    '{"id": 1, "type": 2, "rank": 5, "name": "A", "date": "2024-01-01", "score": 8}\n'
+                    '{"id": 2, "type": 4, "rank": 6, "name": "G", "date": "2023-05-01", "score": 7}\n',
+                )
+
+        download_asset.side_effect = write_archive
+        with TemporaryDirectory() as directory:
+            root = Path(directory)
+            fetch_latest_asset.return_value = ArchiveAsset(
+                1, "dump-2026-07-21.210441Z.zip", "https://example.test/1.zip", 0
+            )
+            self.assertTrue(update_latest_data(root))
+            anime_file = root / "anime_cleaned.xlsx"
+            anime_file.write_bytes(b"stale")
+
+            fetch_latest_asset.return_value = ArchiveAsset(
+                2, "dump-2026-07-28.210449Z.zip", "https://example.test/2.zip", 0
+            )
+            with patch("main.export_to_excel", wraps=export_to_excel) as export:
+                self.assertTrue(update_latest_data(root))
+            self.assertNotEqual(anime_file.read_bytes(), b"stale")
+
+        self.assertEqual(export.call_count, 1)
+
+    @patch("update_data.download_asset")
+    @patch("update_data.fetch_latest_asset")
+    def test_forced_rebuild_reuses_cached_archive(self, fetch_latest_asset, download_asset):
+        def write_archive(asset, destination, token=None):
+            with ZipFile(destination, "w") as target:
+                target.writestr(
+                    "subject.jsonlines",
+                    '{"id": 1, "type": 2, "date": "2024-01-01", "score": 8}\n'
+                    '{"id": 2, "type": 4, "date": "2023-05-01", "score": 7}\n',
+                )
+
+        download_asset.side_effect = write_archive
+        fetch_latest_asset.return_value = ArchiveAsset(
+            1, "dump-2026-07-21.210441Z.zip", "https://example.test/1.zip", 0
+        )
+        with TemporaryDirectory() as directory:
+            root = Path(directory)
+            cache = ArchiveCache(root / "cache", max_bytes=10**6)
+            self.assertTrue(update_latest_data(root / "out", archive_cache=cache))
+            self.assertTrue(update_latest_data(root / "out", force=True, archive_cache=cache))
+            self.assertTrue((cache.directory / "1-dump-2026-07-21.210441Z.zip").is_file())
+        self.assertEqual(download_asset.call_count, 1)
+
+    @patch("update_data.download_asset")
+    @patch("update_data.fetch_latest_asset")
+    def test_failed_update_resumes_from_completed_stages(
+        self, fetch_latest_asset, download_asset
+    ):
+        def write_archive(asset, destination, token=None):
+            with ZipFile(destination, "w") as target:
+                target.writestr(
+                    "subject.jsonlines",
+                    '{"id": 1, "type": 2, "date": "2024-01-01", "score": 8}\n'
+                    '{"id": 2, "type": 4, "date": "2023-05-01", "score": 7}\n',
+                )
+
+        download_asset.side_effect = write_archive
+        fetch_latest_asset.return_value = ArchiveAsset(
+            7, "dump-2026-07-21.210441Z.zip", "https://example.test/7.zip", 0
+        )
+        with TemporaryDirectory() as directory:
+            root = Path(directory)
+            with patch("update_data.export_datasets", side_effect=RuntimeError("磁盘已满")):
+                with self.assertRaisesRegex(RuntimeError, "磁盘已满"):
+                    update_latest_data(root)
+            self.assertTrue((root / ".bangumi-update-7" / "state.json").is_file())
+
+            with patch(
+                "update_data.process_subject_data", wraps=process_subject_data
+            ) as parse:
+                self.assertTrue(update_latest_data(root))
+            metadata = json.loads((root / "data_metadata.json").read_text(encoding="utf-8"))
+            self.assertFalse((root / ".bangumi-update-7").exists())
+            self.assertTrue((root / "anime_cleaned.xlsx").is_file())
+
+        self.assertEqual(download_asset.call_count, 1)
+        self.assertEqual(parse.call_count, 0)
+        self.assertTrue(metadata["stages"]["download"]["resumed"])
+        self.assertTrue(metadata["stages"]["parse"]["resumed"])
+        self.assertFalse(metadata["stages"]["export"]["resumed"])
+        self.assertEqual(
+            list(metadata["stages"]), ["fetch", "download", "parse", "export", "validate", "swap"]
+        )
+        self.assertEqual(metadata["anime_records"], 1)
+        self.assertEqual(metadata["run_stats"]["calls"]["export_to_excel"]["count"], 2)
+        self.assertNotIn("process_subject_data", metadata["run_stats"]["calls"])
+
+    @patch("update_data.download_asset")
+    @patch("update_data.fetch_latest_asset")
+    def test_paranoid_retry_keeps_downloaded_archive(self, fetch_latest_asset, download_asset):
+        def write_archive(asset, destination, token=None):
+            with ZipFile(destination, "w") as target:
+                target.writestr(
+                    "subject.jsonlines",
+                    '{"id": 1, "type": 2, "date": "2024-01-01", "score": 8}\n'
+                    '{"id": 2, "type": 4, "date": "2023-05-01", "score": 7}\n',
+                )
+
+        download_asset.side_effect = write_archive
+        fetch_latest_asset.return_value = ArchiveAsset(
+            7, "dump-2026-07-21.210441Z.zip", "https://example.test/7.zip", 0
+        )
+        with TemporaryDirectory() as directory:
+            root = Path(directory)
+            with patch("update_data.validate_workbook", side_effect=ValueError("字段缺失")):
+                with self.assertRaisesRegex(ValueError, "字段缺失"):
+                    update_latest_data(root, paranoid_validate=True)
+                self.assertTrue(update_latest_data(root))
+            metadata = json.loads((root / "data_metadata.json").read_text(encoding="utf-8"))
+
+        self.assertEqual(download_asset.call_count, 1)
+        self.assertEqual(
+            {name: timing["resumed"] for name, timing in metadata["stages"].items()},
+            {
+                "fetch": False,
+                "download": True,
+                "parse": True,
+                "export": True,
+                "validate": False,
+                "swap": False,
+            },
+        )
+
+    def test_rerun_stage_invalidates_later_stages(self):
+        with TemporaryDirectory() as directory:
+            work_dir = Path(directory) / "work"
+            artifact = Path(directory) / "archive.zip"
+
+            def download():
+                artifact.touch()
+                return {"files": [str(artifact)]}
+
+            checkpoint = UpdateCheckpoint(work_dir, {"asset_id": 1})
+            for name, action in (("download", download), ("parse", dict), ("export", dict)):
+                checkpoint.run(name, action)
+            artifact.unlink()
+
+            checkpoint = UpdateCheckpoint(work_dir, {"asset_id": 1})
+            for name, action in (("download", download), ("parse", dict), ("export", dict)):
+                checkpoint.run(name, action)
+            self.assertFalse(any(timing["resumed"] for timing in checkpoint.timings.values()))
+
+            checkpoint = UpdateCheckpoint(work_dir, {"asset_id": 1})
+            checkpoint.run("download", download)
+            checkpoint.run("parse", dict)
+            checkpoint.run("export", dict, {"paranoid_validate": True})
+            self.assertEqual(
+                {name: timing["resumed"] for name, timing in checkpoint.timings.items()},
+                {"download": True, "parse": True, "export": False},
+            )
+
+            checkpoint = UpdateCheckpoint(work_dir, {"asset_id": 2})
+            self.assertFalse(checkpoint.state_path.exists())
+
+    def test_summarizes_fingerprint_changes(self):
+        summary = summarize_changes({"1": 10, "2": 20, "3": 30}, {"1": 10, "2": 21, "4": 40})
+        self.assertEqual((summary.added, summary.changed, summary.removed), (1, 1, 1))
+        self.assertEqual(summary.unchanged, 1)
+        self.assertTrue(summarize_changes({"1": 1, "2": 2}, {"2": 2, "1": 1}).reordered)
+        self.assertFalse(summarize_changes({"1": 1}, {"1": 1}).has_changes)
+
     @patch("update_data.fetch_latest_asset")
     def test_skips_already_processed_asset(self, fetch_latest_asset):
         asset = ArchiveAsset(
@@ -3,31 +3,40 @@
 from __future__ import annotations
 
 import argparse
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
+from http.client import HTTPException
 import json
 import os
-from pathlib import Path, PurePosixPath
+from pathlib import Path
+import pickle
 import re
 import shutil
-import tempfile
+import threading
 import time
-from typing import Any, Sequence
+from typing import Any, Callable, Sequence
 from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
+from urllib.parse import parse_qs, urlencode, urlsplit
 from urllib.request import Request, urlopen
-from zipfile import BadZipFile, ZipFile
 
 import pandas as pd
 
+from archive_cache import ArchiveCache, cache_budget, open_subject_jsonl
 from config import (
     ANIME_CLEANED_FILE,
+    ARCHIVE_CACHE_MAX_BYTES,
     BANGUMI_APP_DATA_DIR,
+    BANGUMI_ARCHIVE_CACHE_DIR,
+    DATA_FINGERPRINTS_FILE,
     DATA_METADATA_FILE,
     GAME_CLEANED_FILE,
+    GITHUB_API_CACHE_FILE,
     JSONL_FILE_NAME,
 )
-from main import generate_files
+from get_source import as_dataframe, file_sha256, process_subject_data
+from instrumentation import annotate, instrumented, recording
+from main import export_datasets, validate_workbook, worker_count
 
 
 ARCHIVE_RELEASE_API = "https://api.github.com/repos/bangumi/Archive/releases/latest"
@@ -35,7 +44,18 @@ ARCHIVE_NAME_PATTERN = re.compile(
     r"^dump-(?P<timestamp>\d{4}-\d{2}-\d{2}\.\d{6}Z)\.zip$"
 )
 DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_SEGMENTS = 4
+DOWNLOAD_ATTEMPTS = 3
+MIN_SEGMENT_SIZE = 8 * DOWNLOAD_CHUNK_SIZE
+PROGRESS_REPORT_BYTES = 64 * DOWNLOAD_CHUNK_SIZE
 USER_AGENT = "bangumi-anime-dashboard-data-updater/1.0"
+FINGERPRINT_STORE_VERSION = 1
+API_CACHE_VERSION = 1
+ASSET_PAGE_SIZE = 100
+ASSET_PAGE_WORKERS = 4
+CHECKPOINT_VERSION = 2
+WORK_DIR_PREFIX = ".bangumi-update-"
+_LAST_PAGE_LINK = re.compile(r'<([^>]*)>\s*;\s*rel="last"')
 
 
 @dataclass(frozen=True)
@@ -46,6 +66,13 @@ class ArchiveAsset:
     size: int
     created_at: str = ""
     updated_at: str = ""
+    digest: str = ""
+
+    @property
+    def sha256(self) -> str:
+        """GitHub 提供的 ``sha256:<hex>`` 摘要；旧资源没有该字段时为空。"""
+        algorithm, _, value = self.digest.partition(":")
+        return value if algorithm == "sha256" else ""
 
     @property
     def timestamp(self) -> datetime:
@@ -68,13 +95,86 @@ def _headers(token: str | None = None) -> dict[str, str]:
     return headers
 
 
-def request_json(url: str, token: str | None = None) -> Any:
-    request = Request(url, headers=_headers(token))
+class ApiCache:
+    """GitHub API 响应的磁盘缓存。
+
+    记录每个 URL 的 ETag / Last-Modified 和响应体，下次请求时发送条件请求；
+    服务器返回 304 时直接使用缓存内容，这类请求不计入 GitHub 的速率限制。
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        content = read_metadata(path) if path is not None else {}
+        entries = content.get("entries") if content.get("version") == API_CACHE_VERSION else None
+        self._entries: dict[str, dict[str, Any]] = entries if isinstance(entries, dict) else {}
+
+    def get(self, url: str) -> dict[str, Any] | None:
+        with self._lock:
+            return self._entries.get(url)
+
+    def store(self, url: str, entry: dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[url] = entry
+            self._dirty = True
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        with self._lock:
+            content = {"version": API_CACHE_VERSION, "entries": self._entries}
+            _write_json_atomic(self.path, content, separators=(",", ":"))
+            self._dirty = False
+
+
+@dataclass(frozen=True)
+class _JsonResponse:
+    data: Any
+    not_modified: bool = False
+    last_page: int | None = None
+
+
+def _last_page(link: str | None) -> int | None:
+    """从 ``Link`` 响应头中读取 ``rel="last"`` 的页码；最后一页本身不带该链接。"""
+    match = _LAST_PAGE_LINK.search(link or "")
+    if match is None:
+        return None
+    pages = parse_qs(urlsplit(match.group(1)).query).get("page", [])
+    return int(pages[0]) if pages and pages[0].isdigit() else None
+
+
+def _fetch_json(
+    url: str, token: str | None = None, cache: ApiCache | None = None
+) -> _JsonResponse:
+    headers = _headers(token)
+    cached = cache.get(url) if cache is not None else None
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
     try:
-        with urlopen(request, timeout=60) as response:
-            return json.load(response)
-    except (HTTPError, URLError, TimeoutError, json.JSONDecodeError) as exc:
+        with urlopen(Request(url, headers=headers), timeout=60) as response:
+            data = json.load(response)
+            link = response.headers.get("Link")
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except HTTPError as exc:
+        if exc.code == 304 and cached is not None:
+            return _JsonResponse(cached.get("data"), True, _last_page(cached.get("link")))
+        raise RuntimeError(f"GitHub API 请求失败：{url} ({exc})") from exc
+    except (URLError, TimeoutError, json.JSONDecodeError) as exc:
         raise RuntimeError(f"GitHub API 请求失败：{url} ({exc})") from exc
+    if cache is not None and (etag or last_modified):
+        cache.store(
+            url, {"etag": etag, "last_modified": last_modified, "link": link, "data": data}
+        )
+    return _JsonResponse(data, last_page=_last_page(link))
+
+
+def request_json(url: str, token: str | None = None, *, cache: ApiCache | None = None) -> Any:
+    return _fetch_json(url, token, cache).data
 
 
 def select_latest_asset(assets: Sequence[dict[str, Any]]) -> ArchiveAsset:
@@ -95,6 +195,7 @@ def select_latest_asset(assets: Sequence[dict[str, Any]]) -> ArchiveAsset:
                 size=int(raw.get("size", 0)),
                 created_at=str(raw.get("created_at", "")),
                 updated_at=str(raw.get("updated_at", "")),
+                digest=str(raw.get("digest") or ""),
             )
         )
     if not candidates:
@@ -102,77 +203,241 @@ def select_latest_asset(assets: Sequence[dict[str, Any]]) -> ArchiveAsset:
     return max(candidates, key=lambda asset: asset.timestamp)
 
 
-def fetch_latest_asset(
-    api_url: str = ARCHIVE_RELEASE_API, token: str | None = None
-) -> ArchiveAsset:
-    release = request_json(api_url, token)
-    assets_url = release.get("assets_url") if isinstance(release, dict) else None
-    if not assets_url:
-        assets = release.get("assets", []) if isinstance(release, dict) else []
-        return select_latest_asset(assets)
+def _asset_page_url(assets_url: str, page: int) -> str:
+    return f"{assets_url}?{urlencode({'per_page': ASSET_PAGE_SIZE, 'page': page})}"
+
 
+def _asset_batch(data: Any) -> list[dict[str, Any]]:
+    if not isinstance(data, list):
+        raise RuntimeError("GitHub release assets 响应格式无效")
+    return data
+
+
+def _cached_asset_pages(assets_url: str, cache: ApiCache) -> list[dict[str, Any]] | None:
+    """release 未变化时资源分页也不会变化；缓存缺页时返回 None。"""
     assets: list[dict[str, Any]] = []
+    last_page: int | None = None
     page = 1
     while True:
-        query = urlencode({"per_page": 100, "page": page})
-        batch = request_json(f"{assets_url}?{query}", token)
-        if not isinstance(batch, list):
-            raise RuntimeError("GitHub release assets 响应格式无效")
-        assets.extend(batch)
-        if len(batch) < 100:
-            break
+        entry = cache.get(_asset_page_url(assets_url, page))
+        if entry is None or not isinstance(entry.get("data"), list):
+            return None
+        assets.extend(entry["data"])
+        if page == 1:
+            last_page = _last_page(entry.get("link"))
+        if last_page is None and len(entry["data"]) < ASSET_PAGE_SIZE:
+            return assets
+        if last_page is not None and page >= last_page:
+            return assets
         page += 1
-    return select_latest_asset(assets)
 
 
-def download_asset(asset: ArchiveAsset, destination: Path, token: str | None = None) -> None:
-    """流式下载归档，校验字节数，并在网络失败时有限重试。"""
-    partial = destination.with_suffix(destination.suffix + ".part")
-    for attempt in range(1, 4):
-        downloaded = 0
+def _fetch_asset_pages(
+    assets_url: str, token: str | None, cache: ApiCache | None
+) -> list[dict[str, Any]]:
+    """先取第一页；``Link`` 头给出总页数时并发请求其余页面，否则逐页请求。"""
+    first = _fetch_json(_asset_page_url(assets_url, 1), token, cache)
+    batches = [_asset_batch(first.data)]
+    if first.last_page is not None and first.last_page > 1:
+        urls = [_asset_page_url(assets_url, page) for page in range(2, first.last_page + 1)]
+        with ThreadPoolExecutor(max_workers=min(ASSET_PAGE_WORKERS, len(urls))) as executor:
+            responses = executor.map(lambda url: _fetch_json(url, token, cache), urls)
+            batches.extend(_asset_batch(response.data) for response in responses)
+    else:
+        page = 1
+        while len(batches[-1]) == ASSET_PAGE_SIZE:
+            page += 1
+            response = _fetch_json(_asset_page_url(assets_url, page), token, cache)
+            batches.append(_asset_batch(response.data))
+    return [asset for batch in batches for asset in batch]
+
+
+def fetch_latest_asset(
+    api_url: str = ARCHIVE_RELEASE_API,
+    token: str | None = None,
+    *,
+    cache: ApiCache | None = None,
+) -> ArchiveAsset:
+    """查询最新归档。
+
+    传入 ``cache`` 时发送条件请求；release 返回 304 时直接使用缓存的资源分页，
+    不再逐页请求。
+    """
+    release = _fetch_json(api_url, token, cache)
+    content = release.data if isinstance(release.data, dict) else {}
+    assets_url = content.get("assets_url")
+    if not assets_url:
+        return select_latest_asset(content.get("assets", []))
+
+    if release.not_modified and cache is not None:
+        assets = _cached_asset_pages(assets_url, cache)
+        if assets is not None:
+            print("GitHub release 未变化，沿用缓存的资源列表")
+            return select_latest_asset(assets)
+    return select_latest_asset(_fetch_asset_pages(assets_url, token, cache))
+
+
+class _RangeNotSupported(RuntimeError):
+    """服务器忽略 Range 请求头，返回了完整内容。"""
+
+
+class _DownloadProgress:
+    """多个分段线程共享的下载进度。
+
+    每段报告自己从段首起已写入的字节数而不是增量，重试续传或从头重新下载时
+    已计入的字节不会重复累加。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._received: dict[int, int] = {}
+        self.downloaded = 0
+
+    def update(self, segment: int, received: int) -> None:
+        with self._lock:
+            before = self.downloaded
+            self.downloaded += received - self._received.get(segment, 0)
+            self._received[segment] = received
+            step = PROGRESS_REPORT_BYTES
+            if self.downloaded // step > before // step:
+                print(f"已下载 {self.downloaded / 1024 / 1024:.0f} MiB")
+
+
+def _download_segment(
+    asset: ArchiveAsset,
+    partial: Path,
+    token: str | None,
+    start: int,
+    end: int,
+    progress: _DownloadProgress,
+) -> None:
+    """下载 ``[start, end]`` 字节区间；失败重试时从已写入的位置继续。"""
+    position = start
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        try:
+            headers = {**_headers(token), "Range": f"bytes={position}-{end}"}
+            with urlopen(Request(asset.url, headers=headers), timeout=120) as response:
+                if response.status != 206:
+                    raise _RangeNotSupported("服务器不支持 Range 请求")
+                with partial.open("r+b") as target:
+                    target.seek(position)
+                    while position <= end:
+                        chunk = response.read(min(DOWNLOAD_CHUNK_SIZE, end - position + 1))
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        position += len(chunk)
+                        progress.update(start, position - start)
+            if position <= end:
+                raise RuntimeError(f"分段 {start}-{end} 提前结束于 {position}")
+            return
+        except _RangeNotSupported:
+            raise
+        except (HTTPError, URLError, HTTPException, TimeoutError, OSError, RuntimeError) as exc:
+            if attempt == DOWNLOAD_ATTEMPTS:
+                raise RuntimeError(
+                    f"分段 {start}-{end} 下载失败（已重试 {DOWNLOAD_ATTEMPTS} 次）：{exc}"
+                ) from exc
+            print(f"[WARN] 分段 {start}-{end} 中断，第 {attempt} 次续传：{exc}")
+            time.sleep(2**attempt)
+
+
+def _download_ranged(
+    asset: ArchiveAsset, partial: Path, token: str | None, segments: int
+) -> None:
+    with partial.open("wb") as target:
+        target.truncate(asset.size)
+    bounds = [asset.size * index // segments for index in range(segments + 1)]
+    progress = _DownloadProgress()
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        futures = [
+            executor.submit(
+                _download_segment, asset, partial, token, start, end - 1, progress
+            )
+            for start, end in zip(bounds, bounds[1:])
+        ]
+        for future in futures:
+            future.result()
+
+
+def _download_single(asset: ArchiveAsset, partial: Path, token: str | None) -> None:
+    """单连接下载；服务器支持 Range 时重试从断点续传，否则从头开始。"""
+    position = 0
+    progress = _DownloadProgress()
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
         try:
-            request = Request(asset.url, headers=_headers(token))
-            with urlopen(request, timeout=120) as response, partial.open("wb") as target:
-                while chunk := response.read(DOWNLOAD_CHUNK_SIZE):
-                    target.write(chunk)
-                    downloaded += len(chunk)
-                    if downloaded % (64 * DOWNLOAD_CHUNK_SIZE) < DOWNLOAD_CHUNK_SIZE:
-                        print(f"已下载 {downloaded / 1024 / 1024:.0f} MiB")
-            if asset.size and downloaded != asset.size:
+            headers = _headers(token)
+            if position:
+                headers["Range"] = f"bytes={position}-"
+            with urlopen(Request(asset.url, headers=headers), timeout=120) as response:
+                if position and response.status != 206:
+                    position = 0
+                with partial.open("r+b" if position else "wb") as target:
+                    target.seek(position)
+                    target.truncate()
+                    while chunk := response.read(DOWNLOAD_CHUNK_SIZE):
+                        target.write(chunk)
+                        position += len(chunk)
+                        progress.update(0, position)
+            if asset.size and position != asset.size:
                 raise RuntimeError(
-                    f"下载大小不一致：预期 {asset.size} 字节，实际 {downloaded} 字节"
+                    f"下载大小不一致：预期 {asset.size} 字节，实际 {position} 字节"
                 )
-            partial.replace(destination)
             return
-        except (HTTPError, URLError, TimeoutError, OSError, RuntimeError) as exc:
-            partial.unlink(missing_ok=True)
-            if attempt == 3:
-                raise RuntimeError(f"归档下载失败（已重试 3 次）：{exc}") from exc
+        except (HTTPError, URLError, HTTPException, TimeoutError, OSError, RuntimeError) as exc:
+            if asset.size and position > asset.size:
+                position = 0
+            if attempt == DOWNLOAD_ATTEMPTS:
+                raise RuntimeError(
+                    f"归档下载失败（已重试 {DOWNLOAD_ATTEMPTS} 次）：{exc}"
+                ) from exc
             print(f"[WARN] 下载失败，第 {attempt} 次重试：{exc}")
             time.sleep(2**attempt)
 
 
+@instrumented()
+def download_asset(
+    asset: ArchiveAsset,
+    destination: Path,
+    token: str | None = None,
+    *,
+    segments: int = DOWNLOAD_SEGMENTS,
+) -> None:
+    """下载归档并校验字节数。
+
+    大小已知时用 HTTP Range 把文件切成 ``segments`` 段并发下载，每段失败后
+    从已写入的位置续传；服务器不支持 Range 时退回单连接下载。
+    """
+    partial = destination.with_suffix(destination.suffix + ".part")
+    try:
+        if segments > 1 and asset.size >= 2 * MIN_SEGMENT_SIZE:
+            segments = min(segments, asset.size // MIN_SEGMENT_SIZE)
+            try:
+                _download_ranged(asset, partial, token, segments)
+            except _RangeNotSupported:
+                print("[WARN] 服务器不支持分段下载，改为单连接下载")
+                _download_single(asset, partial, token)
+        else:
+            _download_single(asset, partial, token)
+        size = partial.stat().st_size
+        annotate(bytes=size)
+        if asset.size and size != asset.size:
+            raise RuntimeError(f"下载大小不一致：预期 {asset.size} 字节，实际 {size} 字节")
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    partial.replace(destination)
+
+
+@instrumented()
 def extract_subject_jsonl(archive_path: Path, output_path: Path) -> None:
     """只从 zip 中提取 subject.jsonlines，避免解压不需要的大文件。"""
-    try:
-        with ZipFile(archive_path) as archive:
-            matches = [
-                item
-                for item in archive.infolist()
-                if not item.is_dir()
-                and PurePosixPath(item.filename).name == JSONL_FILE_NAME
-            ]
-            if len(matches) != 1:
-                raise RuntimeError(
-                    f"归档内应有且仅有一个 {JSONL_FILE_NAME}，实际找到 {len(matches)} 个"
-                )
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            with archive.open(matches[0]) as source, output_path.open("wb") as target:
-                shutil.copyfileobj(source, target, length=DOWNLOAD_CHUNK_SIZE)
-    except BadZipFile as exc:
-        raise RuntimeError(f"下载文件不是有效 ZIP：{archive_path}") from exc
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open_subject_jsonl(archive_path) as source, output_path.open("wb") as target:
+        shutil.copyfileobj(source, target, length=DOWNLOAD_CHUNK_SIZE)
     if not output_path.is_file() or output_path.stat().st_size == 0:
         raise RuntimeError(f"提取后的 {JSONL_FILE_NAME} 为空")
+    annotate(bytes=output_path.stat().st_size)
 
 
 def read_metadata(path: Path) -> dict[str, Any]:
@@ -184,8 +449,141 @@ def read_metadata(path: Path) -> dict[str, Any]:
         return {}
 
 
-def _record_count(path: Path) -> int:
-    return len(pd.read_excel(path, engine="openpyxl", usecols=["id"]))
+@dataclass(frozen=True)
+class ChangeSummary:
+    added: int
+    changed: int
+    removed: int
+    unchanged: int
+    reordered: bool = False
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed or self.reordered)
+
+    def describe(self) -> str:
+        text = (
+            f"新增 {self.added:,}，变更 {self.changed:,}，"
+            f"移除 {self.removed:,}，未变 {self.unchanged:,}"
+        )
+        return text + "（顺序变化）" if self.reordered else text
+
+
+def dataset_fingerprints(data: pd.DataFrame) -> dict[str, int]:
+    """按文件顺序返回 ``id → 导出字段哈希``；哈希由 pandas 以固定密钥计算，跨运行稳定。"""
+    hashes = pd.util.hash_pandas_object(data, index=False)
+    return dict(zip(data["id"].astype(str), hashes.tolist()))
+
+
+def summarize_changes(previous: dict[str, int], current: dict[str, int]) -> ChangeSummary:
+    added = sum(1 for key in current if key not in previous)
+    removed = sum(1 for key in previous if key not in current)
+    changed = sum(
+        1 for key, value in current.items() if key in previous and previous[key] != value
+    )
+    return ChangeSummary(
+        added=added,
+        changed=changed,
+        removed=removed,
+        unchanged=len(current) - added - changed,
+        reordered=not (added or removed) and list(previous) != list(current),
+    )
+
+
+def read_fingerprints(path: Path) -> dict[str, dict[str, int]]:
+    content = read_metadata(path)
+    if content.get("version") != FINGERPRINT_STORE_VERSION:
+        return {}
+    datasets = content.get("datasets")
+    return datasets if isinstance(datasets, dict) else {}
+
+
+def read_workbook_digests(path: Path) -> dict[str, str]:
+    """返回指纹文件记录的 ``工作簿文件名 → SHA-256``，即上次写入的工作簿内容。"""
+    content = read_metadata(path)
+    if content.get("version") != FINGERPRINT_STORE_VERSION:
+        return {}
+    workbooks = content.get("workbooks")
+    return workbooks if isinstance(workbooks, dict) else {}
+
+
+def _write_json_atomic(path: Path, content: Any, **dump_options: Any) -> None:
+    temporary = path.with_suffix(path.suffix + ".tmp")
+    temporary.write_text(
+        json.dumps(content, ensure_ascii=False, **dump_options) + "\n", encoding="utf-8"
+    )
+    temporary.replace(path)
+
+
+class UpdateCheckpoint:
+    """一次更新的阶段检查点。
+
+    每个阶段完成后把结果、耗时和它依赖的选项 ``inputs`` 写入工作目录中的
+    ``state.json``；同一归档的下一次运行会跳过已完成、选项未变且产物仍然存在的
+    阶段。``key`` 标识归档本身，不一致时清空整个工作目录；某个阶段的选项变化
+    或结果中 ``files`` 列出的文件缺失时，只重新执行该阶段，其后各阶段的记录
+    随之作废。
+    """
+
+    def __init__(self, work_dir: Path, key: dict[str, Any]) -> None:
+        self.work_dir = work_dir
+        self.key = key
+        self.timings: dict[str, dict[str, Any]] = {}
+        state = read_metadata(self.state_path)
+        if state.get("version") != CHECKPOINT_VERSION or state.get("key") != key:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            state = {}
+        work_dir.mkdir(parents=True, exist_ok=True)
+        self._stages: dict[str, dict[str, Any]] = state.get("stages", {})
+
+    @property
+    def state_path(self) -> Path:
+        return self.work_dir / "state.json"
+
+    def record(self, name: str, seconds: float, *, resumed: bool = False) -> None:
+        self.timings[name] = {"seconds": round(seconds, 3), "resumed": resumed}
+
+    def run(
+        self,
+        name: str,
+        action: Callable[[], dict[str, Any]],
+        inputs: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        inputs = inputs or {}
+        done = self._stages.get(name)
+        files = done["result"].get("files", []) if done is not None else []
+        if (
+            done is not None
+            and done.get("inputs") == inputs
+            and all(Path(path).exists() for path in files)
+        ):
+            print(f"沿用已完成的阶段：{name}")
+            self.record(name, done["seconds"], resumed=True)
+            return done["result"]
+
+        # 后续阶段依赖本阶段的产物，重新执行后不能再沿用它们的结果。
+        names = list(self._stages)
+        if name in names:
+            for later in names[names.index(name) + 1 :]:
+                del self._stages[later]
+        started = time.perf_counter()
+        result = action()
+        self.record(name, time.perf_counter() - started)
+        self._stages[name] = {
+            "result": result,
+            "inputs": inputs,
+            "seconds": self.timings[name]["seconds"],
+            "completed_at": datetime.now(timezone.utc).isoformat(),
+        }
+        _write_json_atomic(
+            self.state_path,
+            {"version": CHECKPOINT_VERSION, "key": self.key, "stages": self._stages},
+            indent=2,
+        )
+        return result
+
+    def discard(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
 
 
 def update_latest_data(
@@ -194,12 +592,45 @@ def update_latest_data(
     force: bool = False,
     api_url: str = ARCHIVE_RELEASE_API,
     token: str | None = None,
+    workers: int = 1,
+    extract_dir: Path | None = None,
+    paranoid_validate: bool = False,
+    archive_cache: ArchiveCache | None = None,
+    event_log: Path | None = None,
 ) -> bool:
-    """更新数据；已经处理过同一资源时返回 False。"""
+    """更新数据；已经处理过同一资源时返回 False。
+
+    流程分为获取元数据、下载、解压、解析、导出、校验和替换几个阶段，每个阶段
+    的结果保存在输出目录下的 ``.bangumi-update-<asset_id>``。某个阶段失败后
+    再次运行会从失败的阶段继续，全部完成后删除工作目录；各阶段耗时写入
+    ``data_metadata.json`` 的 ``stages``。
+
+    默认直接从 zip 流式解析 subject.jsonlines，解压与解析合为一个阶段；传入
+    ``extract_dir`` 时先把它解压到该目录并保留，便于调试。
+
+    每个条目导出字段的指纹保存在 ``DATA_FINGERPRINTS_FILE``。归档没有变更
+    记录，因此仍需完整扫描；与上次指纹完全一致、且现有工作簿与上次写入的
+    SHA-256 相同的榜单会沿用现有工作簿，不再重写，缺失或过期的 Parquet 与
+    内存映射副本仍会重新生成。``force`` 为真时总是完整重建。
+
+    release 查询结果缓存在 ``GITHUB_API_CACHE_FILE``，未变化时 GitHub 返回
+    304，直接进入“已是最新”的判断。
+
+    传入 ``archive_cache`` 时优先使用缓存中校验通过的归档，新下载的归档也会
+    存入缓存，``--force`` 重建时无需重新下载。
+
+    下载、解压、解析、导出和校验的耗时、吞吐量与内存峰值写入元数据的
+    ``run_stats``；传入 ``event_log`` 时每次调用另外追加一行 JSON 事件。
+    """
     output_dir = output_dir.expanduser().resolve()
     output_dir.mkdir(parents=True, exist_ok=True)
     metadata_path = output_dir / DATA_METADATA_FILE
-    latest = fetch_latest_asset(api_url, token)
+    fingerprints_path = output_dir / DATA_FINGERPRINTS_FILE
+    started = time.perf_counter()
+    api_cache = ApiCache(output_dir / GITHUB_API_CACHE_FILE)
+    latest = fetch_latest_asset(api_url, token, cache=api_cache)
+    api_cache.save()
+    fetch_seconds = time.perf_counter() - started
     current = read_metadata(metadata_path)
     required_files = [
         output_dir / ANIME_CLEANED_FILE,
@@ -214,18 +645,155 @@ def update_latest_data(
         print(f"数据已经来自最新归档：{latest.name}")
         return False
 
-    print(f"发现归档：{latest.name}（{latest.size / 1024 / 1024:.1f} MiB）")
-    with tempfile.TemporaryDirectory(prefix=".bangumi-update-", dir=output_dir) as temp:
-        work_dir = Path(temp)
-        archive_path = work_dir / latest.name
-        dump_dir = work_dir / "dump"
+    with recording(event_log) as run_stats:
+        print(f"发现归档：{latest.name}（{latest.size / 1024 / 1024:.1f} MiB）")
+        jsonl_path = None
+        if extract_dir is not None:
+            jsonl_path = extract_dir.expanduser().resolve() / JSONL_FILE_NAME
+        work_dir = output_dir / f"{WORK_DIR_PREFIX}{latest.asset_id}"
+        for stale in output_dir.glob(f"{WORK_DIR_PREFIX}*"):
+            if stale != work_dir and stale.is_dir():
+                shutil.rmtree(stale, ignore_errors=True)
+        checkpoint = UpdateCheckpoint(
+            work_dir, {"asset_id": latest.asset_id, "archive_name": latest.name}
+        )
+        source = {"extract_dir": str(jsonl_path.parent) if jsonl_path is not None else None}
+        checkpoint.record("fetch", fetch_seconds)
+        parsed_path = work_dir / "parsed.pickle"
         staged_output = work_dir / "output"
-        download_asset(latest, archive_path, token)
-        extract_subject_jsonl(archive_path, dump_dir / JSONL_FILE_NAME)
-        generated = generate_files(dump_dir, staged_output)
-        generated_by_name = {path.name: path for path in generated}
-        for name in (ANIME_CLEANED_FILE, GAME_CLEANED_FILE):
-            generated_by_name[name].replace(output_dir / name)
+        staged_fingerprints = work_dir / DATA_FINGERPRINTS_FILE
+
+        def download() -> dict[str, Any]:
+            archive_path = None
+            if archive_cache is not None:
+                archive_path = archive_cache.get(
+                    latest.asset_id,
+                    latest.name,
+                    latest.size,
+                    latest.sha256,
+                    verify=paranoid_validate,
+                )
+            if archive_path is not None:
+                print(f"使用缓存归档：{archive_path}")
+            else:
+                archive_path = work_dir / latest.name
+                download_asset(latest, archive_path, token)
+                if archive_cache is not None:
+                    archive_path = archive_cache.store(
+                        archive_path, latest.asset_id, latest.name, latest.sha256
+                    )
+            return {"archive": str(archive_path), "files": [str(archive_path)]}
+
+        archive_path = Path(checkpoint.run("download", download)["archive"])
+
+        if jsonl_path is not None:
+
+            def extract() -> dict[str, Any]:
+                extract_subject_jsonl(archive_path, jsonl_path)
+                return {"files": [str(jsonl_path)]}
+
+            checkpoint.run("extract", extract, source)
+
+        def parse() -> dict[str, Any]:
+            if jsonl_path is not None:
+                anime_data, game_data = process_subject_data(jsonl_path, workers=workers)
+            else:
+                with open_subject_jsonl(archive_path) as source:
+                    anime_data, game_data = process_subject_data(source, workers=workers)
+            if anime_data is None or game_data is None:
+                raise RuntimeError("归档读取失败")
+            temporary = parsed_path.with_suffix(".tmp")
+            with temporary.open("wb") as target:
+                pickle.dump((anime_data, game_data), target, protocol=pickle.HIGHEST_PROTOCOL)
+            temporary.replace(parsed_path)
+            return {
+                "anime_records": len(anime_data),
+                "game_records": len(game_data),
+                "files": [str(parsed_path)],
+            }
+
+        parsed = checkpoint.run("parse", parse, source)
+
+        def export() -> dict[str, Any]:
+            with parsed_path.open("rb") as source:
+                anime_data, game_data = pickle.load(source)
+            datasets = {
+                ANIME_CLEANED_FILE: as_dataframe(anime_data),
+                GAME_CLEANED_FILE: as_dataframe(game_data),
+            }
+            fingerprints = {name: dataset_fingerprints(data) for name, data in datasets.items()}
+            previous = {} if force else read_fingerprints(fingerprints_path)
+            digests = {} if force else read_workbook_digests(fingerprints_path)
+            changes = {
+                name: summarize_changes(previous.get(name, {}), fingerprints[name])
+                for name in datasets
+            }
+            reused = {
+                name
+                for name, summary in changes.items()
+                if name in previous
+                and not summary.has_changes
+                and name in digests
+                and (output_dir / name).is_file()
+                and file_sha256(output_dir / name) == digests[name]
+            }
+            for name, summary in changes.items():
+                note = "，沿用现有文件" if name in reused else ""
+                print(f"{name}：{summary.describe()}{note}")
+            generated = export_datasets(
+                datasets[ANIME_CLEANED_FILE],
+                datasets[GAME_CLEANED_FILE],
+                [staged_output],
+                skip=reused,
+                reused_dir=output_dir,
+            )
+            workbooks = {
+                name: file_sha256((output_dir if name in reused else staged_output) / name)
+                for name in datasets
+            }
+            _write_json_atomic(
+                staged_fingerprints,
+                {
+                    "version": FINGERPRINT_STORE_VERSION,
+                    "datasets": fingerprints,
+                    "workbooks": workbooks,
+                },
+                separators=(",", ":"),
+            )
+            return {
+                "generated": [str(path) for path in generated],
+                "rows": {name: len(data) for name, data in datasets.items()},
+                "changes": {
+                    name: {**asdict(summary), "reused": name in reused}
+                    for name, summary in changes.items()
+                },
+                "files": [str(path) for path in generated] + [str(staged_fingerprints)],
+            }
+
+        exported = checkpoint.run("export", export, {"force": force})
+        generated = [Path(path) for path in exported["generated"]]
+
+        def validate() -> dict[str, Any]:
+            for path in generated:
+                if path.suffix != ".xlsx":
+                    continue
+                if paranoid_validate:
+                    validate_workbook(path, expected_rows=exported["rows"][path.name])
+                    print(f"[OK] 已重新读取并验证：{path}")
+                elif path.stat().st_size == 0:
+                    raise RuntimeError(f"生成的工作簿为空：{path}")
+            return {"paranoid": paranoid_validate}
+
+        checkpoint.run("validate", validate, {"paranoid_validate": paranoid_validate})
+
+        def swap() -> dict[str, Any]:
+            # 先替换工作簿再替换 Parquet 和内存映射副本，副本始终对应已就位的工作簿。
+            for path in generated:
+                path.replace(output_dir / path.name)
+            staged_fingerprints.replace(fingerprints_path)
+            return {}
+
+        checkpoint.run("swap", swap)
 
     metadata = {
         "archive_asset_id": latest.asset_id,
@@ -234,14 +802,14 @@ def update_latest_data(
         "archive_created_at": latest.created_at,
         "archive_updated_at": latest.updated_at,
         "generated_at": datetime.now(timezone.utc).isoformat(),
-        "anime_records": _record_count(output_dir / ANIME_CLEANED_FILE),
-        "game_records": _record_count(output_dir / GAME_CLEANED_FILE),
+        "anime_records": parsed["anime_records"],
+        "game_records": parsed["game_records"],
+        "changes": exported["changes"],
+        "stages": checkpoint.timings,
+        "run_stats": run_stats.summary(),
     }
-    temporary_metadata = metadata_path.with_suffix(".json.tmp")
-    temporary_metadata.write_text(
-        json.dumps(metadata, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
-    )
-    temporary_metadata.replace(metadata_path)
+    _write_json_atomic(metadata_path, metadata, indent=2)
+    checkpoint.discard()
     print(
         f"[OK] 更新完成：动画 {metadata['anime_records']:,} 条，"
         f"游戏 {metadata['game_records']:,} 条"
@@ -254,10 +822,45 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--output-dir", type=Path, default=BANGUMI_APP_DATA_DIR, help="数据输出目录"
     )
-    parser.add_argument("--force", action="store_true", help="即使归档未变化也重新生成")
+    parser.add_argument(
+        "--force", action="store_true", help="即使归档未变化也完整重新生成，不沿用现有文件"
+    )
     parser.add_argument(
         "--api-url", default=ARCHIVE_RELEASE_API, help="用于测试或镜像的 release API"
     )
+    parser.add_argument(
+        "--workers",
+        type=worker_count,
+        default=1,
+        help="并行解析 subject.jsonlines 的进程数（默认 1，即串行）",
+    )
+    parser.add_argument(
+        "--extract-dir",
+        type=Path,
+        help="调试用：先把 subject.jsonlines 解压到该目录并保留，再从文件解析",
+    )
+    parser.add_argument(
+        "--paranoid-validate",
+        action="store_true",
+        help="写入后重新读取每个工作簿核对字段和行数，并重新计算缓存归档的校验和（较慢）",
+    )
+    parser.add_argument(
+        "--archive-cache",
+        type=Path,
+        default=BANGUMI_ARCHIVE_CACHE_DIR,
+        help="缓存已下载归档的目录（默认读取 BANGUMI_ARCHIVE_CACHE_DIR）",
+    )
+    parser.add_argument(
+        "--archive-cache-bytes",
+        type=cache_budget,
+        default=ARCHIVE_CACHE_MAX_BYTES,
+        help="归档缓存的字节预算，超出时淘汰最久未用的归档；0 表示不缓存",
+    )
+    parser.add_argument(
+        "--event-log",
+        type=Path,
+        help="把每个处理步骤的耗时、吞吐量和内存峰值追加到该 JSON Lines 文件",
+    )
     return parser
 
 
@@ -269,6 +872,11 @@ def run(argv: Sequence[str] | None = None) -> int:
             force=args.force,
             api_url=args.api_url,
             token=os.environ.get("GITHUB_TOKEN"),
+            workers=args.workers,
+            extract_dir=args.extract_dir,
+            paranoid_validate=args.paranoid_validate,
+            archive_cache=ArchiveCache(args.archive_cache, args.archive_cache_bytes),
+            event_log=args.event_log,
         )
     except (RuntimeError, OSError, ValueError) as exc:
         print(f"[ERROR] {exc}")